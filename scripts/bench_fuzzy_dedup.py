@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the fuzzy de-duplication in generate_2500_Indian_dishes.py.
+
+What it does
+- Builds --rows synthetic raw titles from the tokens of real dish names (2-3 token
+  combinations), then injects known near-duplicates of --dup_rate of them:
+    * reorder   tokens shuffled ("Aloo gobi" -> "Gobi aloo")
+    * typo      one character substituted/inserted/deleted in a token of 5+ chars
+    * translit  aa<->a / ee<->i / oo<->u spelling swap
+    * format    case change and hyphen/parentheses punctuation
+- Runs the previous fuzzy_collapse (sorted order, sliding window of the last 400 kept
+  titles, one token_set_ratio call per pair) and the blocked cdist engine, and reports
+  wall time, titles kept and recall per variant kind. An injected pair counts as caught
+  when at most one of its two titles is kept.
+- On a --check_rows sample, compares the blocked engine with an all-pairs run
+  (blocking=False) to show what the blocking misses.
+
+Usage
+  python bench_fuzzy_dedup.py
+  python bench_fuzzy_dedup.py --rows 200000 --names ../src/assets/data/gi_gl_master.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import re
+import time
+from typing import Dict, List, Tuple
+
+import pandas as pd
+from rapidfuzz import fuzz
+
+import generate_2500_Indian_dishes as gen
+
+DEFAULT_NAMES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "assets", "data", "gi_gl_master.csv")
+VARIANT_KINDS = ["reorder", "typo", "translit", "format"]
+
+
+def _legacy_fuzzy_collapse(titles: List[str], threshold: int = 95, window: int = 400) -> List[str]:
+    """Previous fuzzy_collapse (kept for comparison)."""
+    kept: List[str] = []
+    seen_norm: List[str] = []
+
+    for t in sorted(set(titles), key=lambda x: gen.norm(x)):
+        n = gen.norm(t)
+        duplicate = False
+        # Compare against recent kept to bound runtime
+        for prev in seen_norm[-window:]:
+            if fuzz.token_set_ratio(n, prev) >= threshold:
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append(t)
+            seen_norm.append(n)
+    return kept
+
+
+def _variant(title: str, kind: str, rng: random.Random) -> str:
+    words = title.split()
+    if kind == "reorder" and len(words) > 1:
+        while True:
+            shuffled = rng.sample(words, len(words))
+            if shuffled != words:
+                return " ".join(shuffled).capitalize()
+    if kind == "typo":
+        long = [i for i, w in enumerate(words) if len(w) >= 5]
+        if long:
+            i = rng.choice(long)
+            w = words[i]
+            p = rng.randrange(1, len(w) - 1)
+            op = rng.randrange(3)
+            c = rng.choice("aeiourn")
+            words[i] = w[:p] + c + w[p + 1:] if op == 0 else w[:p] + c + w[p:] if op == 1 else w[:p] + w[p + 1:]
+            return " ".join(words)
+    if kind == "translit":
+        for a, b in (("aa", "a"), ("ee", "i"), ("oo", "u"), ("a", "aa"), ("i", "ee"), ("u", "oo")):
+            if a in title.lower():
+                return re.sub(a, b, title, count=1, flags=re.IGNORECASE)
+    if kind == "format":
+        return (words[0].upper() + ("-" + "-".join(words[1:]) if len(words) > 1 else " (dish)")).lower().title()
+    return title + " "  # not applicable: an exact duplicate after norm()
+
+
+def make_titles(names: List[str], rows: int, dup_rate: float, seed: int = 0) -> Tuple[List[str], List[Tuple[str, str, str]]]:
+    """(raw titles, injected (kind, original, variant) pairs)."""
+    rng = random.Random(seed)
+    vocab = sorted({w.lower() for n in names for w in re.findall(r"[A-Za-z]{3,}", n)})
+    n_bases = int(rows / (1 + dup_rate))
+    bases = set()
+    while len(bases) < n_bases:
+        bases.add(" ".join(rng.sample(vocab, rng.choice((2, 2, 3)))).capitalize())
+    titles = sorted(bases)
+    pairs = []
+    for t in rng.sample(titles, rows - n_bases):
+        kind = rng.choice(VARIANT_KINDS)
+        v = _variant(t, kind, rng)
+        if v != t:
+            pairs.append((kind, t, v))
+    titles += [v for _, _, v in pairs]
+    rng.shuffle(titles)
+    return titles, pairs
+
+
+def _recall(kept: List[str], pairs: List[Tuple[str, str, str]]) -> Dict[str, float]:
+    keep = set(kept)
+    caught: Dict[str, List[int]] = {k: [0, 0] for k in VARIANT_KINDS}
+    for kind, a, b in pairs:
+        caught[kind][0] += (a in keep) + (b in keep) <= 1
+        caught[kind][1] += 1
+    out = {k: c / n for k, (c, n) in caught.items() if n}
+    out["all"] = sum(c for c, _ in caught.values()) / max(1, len(pairs))
+    return out
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Compare the sliding-window and blocked fuzzy de-duplication.")
+    p.add_argument("--names", default=DEFAULT_NAMES, help="CSV with a canonical_name column (token source).")
+    p.add_argument("--rows", type=int, default=100000, help="Raw titles to generate.")
+    p.add_argument("--dup_rate", type=float, default=0.15, help="Injected near-duplicates per base title.")
+    p.add_argument("--threshold", type=float, default=95, help="token_set_ratio threshold.")
+    p.add_argument("--check_rows", type=int, default=3000, help="Sample size for the blocked vs all-pairs check.")
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    names = pd.read_csv(args.names)["canonical_name"].dropna().astype(str).tolist()
+    titles, pairs = make_titles(names, args.rows, args.dup_rate, args.seed)
+    print(f"{len(titles)} raw titles, {len(pairs)} injected near-duplicates")
+
+    t0 = time.perf_counter()
+    legacy = _legacy_fuzzy_collapse(titles, threshold=int(args.threshold))
+    t_legacy = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    clusters = gen.dedup_clusters(titles, threshold=args.threshold)
+    t_new = time.perf_counter() - t0
+    blocked = [c.representative for c in clusters]
+
+    for name, seconds, kept in (("window (old)", t_legacy, legacy), ("blocked cdist", t_new, blocked)):
+        r = _recall(kept, pairs)
+        kinds = " ".join(f"{k}={r[k]:.3f}" for k in VARIANT_KINDS if k in r)
+        print(f"{name:>14}: {seconds:7.2f}s  kept {len(kept)}  recall {r['all']:.3f} ({kinds})")
+    print(f"speedup {t_legacy / t_new:.1f}x; largest cluster {max(len(c.members) for c in clusters)} titles")
+
+    sample = random.Random(args.seed).sample(titles, min(args.check_rows, len(titles)))
+    t0 = time.perf_counter()
+    exact = {c.representative for c in gen.dedup_clusters(sample, threshold=args.threshold, blocking=False)}
+    t_exact = time.perf_counter() - t0
+    sampled = {c.representative for c in gen.dedup_clusters(sample, threshold=args.threshold)}
+    print(f"all-pairs check on {len(sample)} titles ({t_exact:.2f}s): kept {len(exact)} all-pairs vs "
+          f"{len(sampled)} blocked, {len(sampled ^ exact)} representatives differ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark for MasterIndex (candidate vs existing-master matching) in generate_2500_Indian_dishes.py.
+
+What it does
+- Builds a synthetic master of --master_rows distinct names (2-3 tokens drawn from the
+  vocabulary of real dish names) and --candidates candidate titles: --pos_rate of them are
+  variants of master names (reorder / typo / transliteration / formatting, see
+  bench_fuzzy_dedup.py), the rest are new names.
+- Times index build and match, and reports how many variants find their source row at
+  or above --threshold and how many new names are wrongly matched at or above it.
+- On a --check_rows sample, compares each candidate's best score with a brute-force
+  process.extractOne over every master name, to show what the shortlist misses.
+
+Usage
+  python bench_master_match.py
+  python bench_master_match.py --master_rows 100000 --candidates 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import time
+
+import numpy as np
+import pandas as pd
+from rapidfuzz import fuzz, process
+
+import generate_2500_Indian_dishes as gen
+from bench_fuzzy_dedup import DEFAULT_NAMES, VARIANT_KINDS, _variant
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Time and check MasterIndex matching on a synthetic master.")
+    p.add_argument("--names", default=DEFAULT_NAMES, help="CSV with a canonical_name column (token source).")
+    p.add_argument("--master_rows", type=int, default=100000)
+    p.add_argument("--candidates", type=int, default=100000)
+    p.add_argument("--pos_rate", type=float, default=0.3, help="Share of candidates that are master variants.")
+    p.add_argument("--threshold", type=float, default=gen.DEFAULT_MASTER_THRESHOLD)
+    p.add_argument("--check_rows", type=int, default=300, help="Sample size for the brute-force check.")
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    rng = random.Random(args.seed)
+    names = pd.read_csv(args.names)["canonical_name"].dropna().astype(str).tolist()
+    vocab = sorted({w.lower() for n in names for w in re.findall(r"[A-Za-z]{3,}", n)})
+    pool = set()
+    n_new = args.candidates - int(args.candidates * args.pos_rate)
+    while len(pool) < args.master_rows + n_new:
+        pool.add(" ".join(rng.sample(vocab, rng.choice((2, 2, 3)))).capitalize())
+    pool = sorted(pool)
+    rng.shuffle(pool)
+    master_names, new_names = pool[:args.master_rows], pool[args.master_rows:]
+    sources = [rng.randrange(len(master_names)) for _ in range(args.candidates - n_new)]
+    variants = [_variant(master_names[r], rng.choice(VARIANT_KINDS), rng) for r in sources]
+    titles = variants + new_names
+    print(f"master {len(master_names)} names, {len(titles)} candidates ({len(variants)} variants, {len(new_names)} new)")
+
+    master = pd.DataFrame({"canonical_name": master_names})
+    t0 = time.perf_counter()
+    index = gen.MasterIndex.from_frame(master)
+    t_build = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    res = index.match(titles)
+    t_match = time.perf_counter() - t0
+    print(f"build {t_build:.2f}s, match {t_match:.2f}s ({len(titles) / t_match:,.0f} candidates/s)")
+
+    pos = res.iloc[:len(variants)]
+    hit = (pos["master_row"].to_numpy() == np.asarray(sources)) & (pos["score"].to_numpy() >= args.threshold)
+    false_pos = (res.iloc[len(variants):]["score"] >= args.threshold).mean()
+    print(f"variants matched to their source at >= {args.threshold:g}: {hit.mean():.3f}; "
+          f"new names matched at >= {args.threshold:g}: {false_pos:.4f}")
+
+    sample = rng.sample(range(len(titles)), min(args.check_rows, len(titles)))
+    texts = [gen._dedup_text(gen.norm(t)) for t in titles]
+    t0 = time.perf_counter()
+    brute = [process.extractOne(texts[i], index.texts, scorer=fuzz.token_sort_ratio)[1] for i in sample]
+    t_brute = (time.perf_counter() - t0) / len(sample)
+    got = res["score"].to_numpy()[sample]
+    same = np.isclose(got, brute)
+    above = np.asarray(brute) >= args.threshold
+    print(f"brute force on {len(sample)} candidates ({t_brute * 1e3:.1f} ms each, ~{t_brute * len(titles):.0f}s for all): "
+          f"best score equal for {same.mean():.3f}; "
+          f"of those >= {args.threshold:g} by brute force, index found {(same & above).sum()}/{above.sum()}")
+
+
+if __name__ == "__main__":
+    main()
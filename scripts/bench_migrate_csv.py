@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Benchmark for migrate_csv.py.
+
+What it does
+- Builds a synthetic master CSV by tiling a real master up to --rows rows with unique
+  food_ids, then mixes in the cases the migrator has to handle: repeated food_ids
+  (dedupe), blank food_ids and shifted gl_category rows (repair).
+- Runs the previous implementation (DictReader, per-row header matching, all rows
+  buffered before writing) and the streaming migrator in fresh processes, and
+  reports wall time, rows/s and peak RSS.
+- Checks that both outputs are byte-identical (sha256).
+
+Usage
+  python bench_migrate_csv.py --csv <master.csv>
+  python bench_migrate_csv.py --csv <master.csv> --rows 1000000 --workdir /tmp/migrate_bench
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from typing import List
+
+import migrate_csv as mc
+
+
+def _legacy_migrate(source_path: str, dest_path: str) -> None:
+    """Previous migrate_csv() body, parameterized on paths (kept for comparison)."""
+    with open(source_path, 'r', encoding='utf-8') as source_file:
+        reader = csv.DictReader(source_file)
+        rows_to_write = []
+        seen_ids = set()
+        for i, row in enumerate(reader):
+            f_id = row.get("food_id")
+            if f_id in seen_ids:
+                continue
+            if f_id:
+                seen_ids.add(f_id)
+
+            new_row = {}
+            for src_key, dest_key in mc.HEADER_MAPPING.items():
+                if src_key in row:
+                    new_row[dest_key] = row[src_key]
+                else:
+                    found = False
+                    for k in row.keys():
+                        if k.strip() == src_key.strip():
+                            new_row[dest_key] = row[k]
+                            found = True
+                            break
+                    if not found:
+                        new_row[dest_key] = ""
+
+            gl_cat = new_row.get("gl_category", "")
+            if gl_cat and gl_cat.replace('.', '', 1).isdigit() and "Low" not in gl_cat and "Medium" not in gl_cat and "High" not in gl_cat:
+                new_row["gl_category"] = new_row.get("confidence_score")
+                new_row["confidence_score"] = new_row.get("available_carbs_g")
+                try:
+                    gl_median = float(new_row.get("gl_median", 0))
+                    gi = float(new_row.get("gi", 0))
+                    if gi > 0:
+                        new_row["available_carbs_g"] = round((gl_median * 100) / gi, 2)
+                    else:
+                        new_row["available_carbs_g"] = 0
+                except Exception:
+                    pass
+            rows_to_write.append(new_row)
+
+    with open(dest_path, 'w', encoding='utf-8', newline='') as dest_file:
+        writer = csv.DictWriter(dest_file, fieldnames=list(mc.HEADER_MAPPING.values()))
+        writer.writeheader()
+        writer.writerows(rows_to_write)
+
+
+def build_synthetic(template_csv: str, out_csv: str, n_rows: int) -> None:
+    with open(template_csv, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        template: List[List[str]] = [r for r in reader if r]
+
+    i_id = header.index("food_id")
+    i_cat = header.index("gl_category")
+    i_conf = header.index("confidence_score")
+    i_carbs = header.index("available_carbs_g")
+
+    with open(out_csv, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for n in range(n_rows):
+            row = list(template[n % len(template)])
+            row[i_id] = f"{row[i_id]}_{n // len(template)}"
+            if n % 997 == 0 and n:
+                row[i_id] = f"{template[0][i_id]}_0"  # repeated id
+            elif n % 1009 == 0:
+                row[i_id] = ""  # blank id, never deduped
+            if n % 10007 == 0:
+                # shifted row: numeric gl_category, category in confidence_score
+                row[i_carbs], row[i_conf], row[i_cat] = row[i_conf], row[i_cat] or "Low", "8.28"
+            writer.writerow(row)
+
+
+# Peak RSS comes from VmHWM (reset on exec).
+_RUN_SNIPPET = """
+import json, os, sys, time
+sys.stdout = open(os.devnull, "w")
+t0 = time.perf_counter()
+{body}
+seconds = time.perf_counter() - t0
+hwm_kb = [int(line.split()[1]) for line in open("/proc/self/status") if line.startswith("VmHWM:")][0]
+sys.stderr.write(json.dumps({{"seconds": seconds, "max_rss_mb": hwm_kb / 1024.0}}) + "\\n")
+"""
+
+
+def _run(body: str) -> dict:
+    here = os.path.dirname(os.path.abspath(__file__))
+    out = subprocess.run(
+        [sys.executable, "-c", _RUN_SNIPPET.format(body=body)], cwd=here, check=True, capture_output=True, text=True
+    )
+    return json.loads(out.stderr.strip().splitlines()[-1])
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def bench(template_csv: str, n_rows: int, workdir: str) -> None:
+    os.makedirs(workdir, exist_ok=True)
+    src = os.path.abspath(os.path.join(workdir, f"synthetic_{n_rows}.csv"))
+    out_old = os.path.abspath(os.path.join(workdir, "legacy_out.csv"))
+    out_new = os.path.abspath(os.path.join(workdir, "stream_out.csv"))
+    if not os.path.exists(src):
+        build_synthetic(template_csv, src, n_rows)
+
+    old = _run(f"import bench_migrate_csv as b\nb._legacy_migrate({src!r}, {out_old!r})")
+    new = _run(f"import migrate_csv as m\nm.migrate_csv({src!r}, {out_new!r}, write_assets=False)")
+
+    print(f"source rows: {n_rows}  ({os.path.getsize(src) / 1e6:.0f} MB)")
+    print(f"{'impl':<10} {'seconds':>8} {'rows/s':>10} {'peak RSS (MB)':>14}")
+    for name, r in (("legacy", old), ("streaming", new)):
+        print(f"{name:<10} {r['seconds']:>8.2f} {n_rows / r['seconds']:>10.0f} {r['max_rss_mb']:>14.1f}")
+    print(f"byte-identical: {_sha256(out_old) == _sha256(out_new)}")
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Legacy vs streaming migrate_csv on a synthetic master.")
+    p.add_argument("--csv", required=True, help="Master CSV used as the row template.")
+    p.add_argument("--rows", type=int, default=1000000, help="Synthetic master size.")
+    p.add_argument("--workdir", default="migrate_bench", help="Where the synthetic input and outputs are written.")
+    return p
+
+
+def main() -> None:
+    args = _build_arg_parser().parse_args()
+    bench(args.csv, args.rows, args.workdir)
+
+
+if __name__ == "__main__":
+    main()
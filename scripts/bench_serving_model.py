@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for serving_model.py.
+
+What it does
+- text_all: row-wise DataFrame.apply builder (previous implementation) vs the
+  column-wise builder used by serving_model.py, at several frame sizes.
+  Also checks that both produce byte-identical strings.
+- tfidf: text stage of train/apply with three independent TfidfVectorizers
+  (previous layout) vs the single shared vectorizer.
+- postprocess: label forcing + per-type clipping of (min, g, max), Python loop
+  (previous implementation) vs the vectorized engine, reported per row.
+- coldstart: fresh-process import + load time and peak RSS for the joblib bundle
+  (serving_model.load_models) vs the exported .npz (serving_scorer.load_scorer).
+- knn: Ridge vs KnnIndex serving sizes. Accuracy is k-fold CV on the master (MAE of
+  min/g/max overall and for primary_categories with fewer than --sparse_rows rows, same
+  fold bundles and predicted types for both paths); latency is batched ms/row for
+  --query_rows queries against an index of --index_rows rows (the master tiled, each
+  copy with a random name token appended so rows differ).
+
+Synthetic frames are built by tiling a real master CSV up to the requested
+number of rows, so string lengths / NaN patterns match production data.
+
+Usage
+  python bench_serving_model.py text_all --csv <master.csv>
+  python bench_serving_model.py text_all --csv <master.csv> --rows 2000 50000 500000
+  python bench_serving_model.py tfidf --csv <master.csv> --rows 2000 50000
+  python bench_serving_model.py postprocess --csv <master.csv> --rows 1000000
+  python bench_serving_model.py coldstart --model_dir <dir>   (run `serving_model.py export` first)
+  python bench_serving_model.py knn --csv <master.csv> --index_rows 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Callable, List
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.model_selection import KFold
+
+import serving_model as sm
+
+
+def _tile_frame(df: pd.DataFrame, n_rows: int) -> pd.DataFrame:
+    reps = int(np.ceil(n_rows / max(1, len(df))))
+    return pd.concat([df] * reps, ignore_index=True).iloc[:n_rows].reset_index(drop=True)
+
+
+def _timeit(fn: Callable[[], object], repeat: int = 1) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _legacy_text_all_row(row: pd.Series, text_cols: List[str]) -> str:
+    parts: List[str] = []
+    for c in text_cols:
+        if c in row and pd.notna(row[c]):
+            v = str(row[c]).strip()
+            if v:
+                parts.append(v)
+    return " | ".join(parts)
+
+
+def bench_text_all(df: pd.DataFrame, rows: List[int]) -> None:
+    text_cols = sm._infer_text_cols(df)
+    print(f"text columns: {text_cols}")
+    print(f"{'rows':>9} {'apply (s)':>10} {'vector (s)':>11} {'speedup':>8}  identical")
+    for n in rows:
+        big = _tile_frame(df, n)
+        legacy: List[pd.Series] = []
+        vec: List[pd.Series] = []
+        t_old = _timeit(lambda: legacy.append(big.apply(lambda r: _legacy_text_all_row(r, text_cols), axis=1)))
+        t_new = _timeit(lambda: vec.append(sm._build_text_all(big, text_cols)))
+        same = legacy[0].tolist() == vec[0].tolist()
+        print(f"{n:>9} {t_old:>10.3f} {t_new:>11.3f} {t_old / t_new:>7.1f}x  {same}")
+
+
+def bench_tfidf(df: pd.DataFrame, rows: List[int]) -> None:
+    text_cols = sm._infer_text_cols(df)
+    print(f"{'rows':>9} {'fit x3 (s)':>11} {'fit x1 (s)':>11} {'transform x3 (s)':>17} {'transform x1 (s)':>17}")
+    for n in rows:
+        text = sm._build_text_all(_tile_frame(df, n), text_cols)
+
+        def _new() -> TfidfVectorizer:
+            return TfidfVectorizer(ngram_range=(1, 1), min_df=2, max_features=6000)
+
+        vecs = [_new() for _ in range(3)]
+        t_fit3 = _timeit(lambda: [v.fit(text) for v in vecs])
+        shared = _new()
+        t_fit1 = _timeit(lambda: shared.fit(text))
+        t_tr3 = _timeit(lambda: [v.transform(text) for v in vecs])
+        t_tr1 = _timeit(lambda: shared.transform(text))
+        print(f"{n:>9} {t_fit3:>11.3f} {t_fit1:>11.3f} {t_tr3:>17.3f} {t_tr1:>17.3f}")
+
+
+def _legacy_postprocess(pred_type: np.ndarray, sz_pred: np.ndarray, labels: List[str], clip_by_type: dict) -> np.ndarray:
+    pred_type = np.array([p if p in set(labels) else "portion" for p in pred_type], dtype=object)
+    min_pred = np.maximum(0.0, sz_pred[:, 0])
+    g_pred = np.maximum(0.0, sz_pred[:, 1])
+    max_pred = np.maximum(0.0, sz_pred[:, 2])
+    for i, st in enumerate(pred_type):
+        clip = clip_by_type.get(st)
+        if not clip:
+            continue
+        lo, hi = clip[sm.COL_MIN]
+        min_pred[i] = float(np.clip(min_pred[i], lo, hi))
+        lo, hi = clip[sm.COL_G]
+        g_pred[i] = float(np.clip(g_pred[i], lo, hi))
+        lo, hi = clip[sm.COL_MAX]
+        max_pred[i] = float(np.clip(max_pred[i], lo, hi))
+    return np.column_stack([min_pred, g_pred, max_pred])
+
+
+def _vector_postprocess(pred_type: np.ndarray, sz_pred: np.ndarray, labels: List[str], clip_by_type: dict) -> np.ndarray:
+    known = pd.Series(pred_type).isin(labels).values
+    pred_type = np.where(known, pred_type, "portion").astype(object)
+    return sm._clip_sizes_by_type(pred_type, np.maximum(0.0, sz_pred), clip_by_type)
+
+
+def bench_postprocess(df: pd.DataFrame, rows: List[int]) -> None:
+    df = df.dropna(subset=[sm.COL_SERVING_TYPE, sm.COL_MIN, sm.COL_G, sm.COL_MAX])
+    labels = sorted(df[sm.COL_SERVING_TYPE].unique().tolist())
+    clip_by_type = sm._compute_clip_ranges(df, labels)
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>9} {'loop (s)':>9} {'vector (s)':>11} {'loop ns/row':>12} {'vector ns/row':>14} {'speedup':>8}  identical")
+    for n in rows:
+        # include some labels outside the master set to exercise the "portion" fallback
+        pred_type = rng.choice(np.array(labels + ["unknown_type"], dtype=object), size=n)
+        sz_pred = rng.normal(150.0, 120.0, size=(n, 3))
+        old: List[np.ndarray] = []
+        new: List[np.ndarray] = []
+        t_old = _timeit(lambda: old.append(_legacy_postprocess(pred_type, sz_pred, labels, clip_by_type)))
+        t_new = _timeit(lambda: new.append(_vector_postprocess(pred_type, sz_pred, labels, clip_by_type)))
+        same = np.array_equal(old[0], new[0])
+        print(
+            f"{n:>9} {t_old:>9.3f} {t_new:>11.3f} {1e9 * t_old / n:>12.0f} {1e9 * t_new / n:>14.0f} "
+            f"{t_old / t_new:>7.0f}x  {same}"
+        )
+
+
+# Peak RSS comes from VmHWM (reset on exec, unlike ru_maxrss which a forked child inherits).
+_COLDSTART_SNIPPET = """
+import json, time
+t0 = time.perf_counter()
+{body}
+seconds = time.perf_counter() - t0
+hwm_kb = [int(line.split()[1]) for line in open("/proc/self/status") if line.startswith("VmHWM:")][0]
+print(json.dumps({{"seconds": seconds, "max_rss_mb": hwm_kb / 1024.0}}))
+"""
+
+
+def _run_coldstart(body: str, repeat: int) -> dict:
+    here = os.path.dirname(os.path.abspath(__file__))
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _COLDSTART_SNIPPET.format(body=body)],
+            cwd=here,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {"seconds": min(r["seconds"] for r in runs), "max_rss_mb": min(r["max_rss_mb"] for r in runs)}
+
+
+def bench_coldstart(model_dir: str, bundle_npz: str, repeat: int) -> None:
+    model_dir = os.path.abspath(model_dir)
+    bundle_npz = os.path.abspath(bundle_npz)
+    joblib_path = _run_coldstart(f"import serving_model\nserving_model.load_models({model_dir!r})", repeat)
+    npz_path = _run_coldstart(f"import serving_scorer\nserving_scorer.load_scorer({bundle_npz!r})", repeat)
+    print(f"{'path':<8} {'import+load (s)':>16} {'peak RSS (MB)':>14}")
+    print(f"{'joblib':<8} {joblib_path['seconds']:>16.3f} {joblib_path['max_rss_mb']:>14.1f}")
+    print(f"{'npz':<8} {npz_path['seconds']:>16.3f} {npz_path['max_rss_mb']:>14.1f}")
+
+
+def bench_knn(df: pd.DataFrame, folds: int, sparse_rows: int, index_rows: int, query_rows: int, clf_solver: str) -> None:
+    text_cols = sm._infer_text_cols(df)
+    df = sm._ensure_target_columns(df)
+    df["text_all"] = sm._build_text_all(df, text_cols)
+    df = df.dropna(subset=[sm.COL_SERVING_TYPE, sm.COL_MIN, sm.COL_G, sm.COL_MAX]).reset_index(drop=True)
+    size_cols = [sm.COL_MIN, sm.COL_G, sm.COL_MAX]
+    sizes = df[size_cols].astype(float).values
+    types = df[sm.COL_SERVING_TYPE].astype(str).values
+    ids = df["food_id"].astype(str).values if "food_id" in df.columns else np.arange(len(df)).astype(str)
+    counts = df["primary_category"].map(df["primary_category"].value_counts()) if "primary_category" in df else None
+    in_sparse = (counts < sparse_rows).values if counts is not None else np.zeros(len(df), dtype=bool)
+
+    config = sm.TrainConfig(clf_solver=clf_solver)
+    err = {"ridge": np.zeros_like(sizes), "knn": np.zeros_like(sizes)}
+    for tr, te in KFold(n_splits=folds, shuffle=True, random_state=42).split(df):
+        bundle = sm._fit_bundle(df.iloc[tr], config)
+        text = df["text_all"].iloc[te]
+        ridge = sm._predict_targets(bundle, text)
+        bundle.knn = sm.KnnIndex.build(df["text_all"].iloc[tr], types[tr], sizes[tr], ids[tr])
+        knn = sm._predict_targets(bundle, text)
+        for name, preds in (("ridge", ridge), ("knn", knn)):
+            err[name][te] = np.abs(np.column_stack([preds[c] for c in size_cols]) - sizes[te])
+    print(f"{len(df)} labeled rows, {folds}-fold CV; {in_sparse.sum()} rows in categories with < {sparse_rows} rows")
+    print(f"{'sizes':<6} {'MAE min':>8} {'MAE g':>8} {'MAE max':>8} {'sparse MAE g':>13} {'median |err| g':>15}")
+    for name, e in err.items():
+        print(
+            f"{name:<6} {e[:, 0].mean():>8.2f} {e[:, 1].mean():>8.2f} {e[:, 2].mean():>8.2f} "
+            f"{e[in_sparse, 1].mean() if in_sparse.any() else float('nan'):>13.2f} {np.median(e[:, 1]):>15.1f}"
+        )
+
+    rng = np.random.default_rng(0)
+    vocab = np.array(sorted({w for t in df["text_all"] for w in t.lower().split() if w.isalpha()}))
+    reps = int(np.ceil(index_rows / len(df)))
+    big_text = pd.Series(np.tile(df["text_all"].values, reps)[:index_rows] + " " + rng.choice(vocab, index_rows))
+    t0 = time.perf_counter()
+    index = sm.KnnIndex.build(
+        big_text, np.tile(types, reps)[:index_rows], np.tile(sizes, (reps, 1))[:index_rows], np.arange(index_rows).astype(str)
+    )
+    t_build = time.perf_counter() - t0
+    bundle = sm._fit_bundle(df, config)
+    queries = _tile_frame(df, query_rows)["text_all"]
+    t_ridge = _timeit(lambda: sm._predict_targets(bundle, queries))
+    pred_type = sm._predict_targets(bundle, queries)[sm.COL_SERVING_TYPE]
+    t_query = _timeit(lambda: index.query(queries, pred_type))
+    bundle.knn = index
+    t_knn = _timeit(lambda: sm._predict_targets(bundle, queries))
+    print(f"index {index_rows} rows built in {t_build:.1f}s; {query_rows} queries, ms/row:")
+    print(f"  ridge apply {1e3 * t_ridge / query_rows:.3f}  knn query {1e3 * t_query / query_rows:.3f}  "
+          f"knn apply {1e3 * t_knn / query_rows:.3f}")
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Benchmarks for serving_model.py.")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    p_text = sub.add_parser("text_all", help="Row-wise vs column-wise text_all construction.")
+    p_text.add_argument("--csv", required=True, help="Master CSV used as the row template.")
+    p_text.add_argument("--rows", type=int, nargs="+", default=[2000, 50000, 500000], help="Frame sizes to time.")
+
+    p_tfidf = sub.add_parser("tfidf", help="Three independent TF-IDF vectorizers vs one shared vectorizer.")
+    p_tfidf.add_argument("--csv", required=True, help="Master CSV used as the row template.")
+    p_tfidf.add_argument("--rows", type=int, nargs="+", default=[2000, 50000], help="Frame sizes to time.")
+
+    p_post = sub.add_parser("postprocess", help="Loop vs vectorized label forcing + per-type clipping.")
+    p_post.add_argument("--csv", required=True, help="Master CSV used to derive labels and clip ranges.")
+    p_post.add_argument("--rows", type=int, nargs="+", default=[1000000], help="Number of predictions to post-process.")
+
+    p_cold = sub.add_parser("coldstart", help="Cold-start time + RSS: joblib bundle vs exported .npz scorer.")
+    p_cold.add_argument("--model_dir", required=True, help="Directory with a trained bundle.")
+    p_cold.add_argument("--bundle", default=None, help="Exported .npz (default: <model_dir>/serving_bundle.npz).")
+    p_cold.add_argument("--repeat", type=int, default=3, help="Fresh processes per path (best is reported).")
+
+    p_knn = sub.add_parser("knn", help="Ridge vs kNN serving sizes: CV accuracy and batched query latency.")
+    p_knn.add_argument("--csv", required=True, help="Labeled master CSV.")
+    p_knn.add_argument("--folds", type=int, default=5, help="CV folds for the accuracy comparison.")
+    p_knn.add_argument("--sparse_rows", type=int, default=30, help="Categories below this many rows count as sparse.")
+    p_knn.add_argument("--index_rows", type=int, default=100000, help="Index size for the latency run.")
+    p_knn.add_argument("--query_rows", type=int, default=5000, help="Queries for the latency run.")
+    p_knn.add_argument("--clf_solver", default=sm.TrainConfig.clf_solver, help="serving_type classifier solver.")
+
+    return p
+
+
+def main() -> None:
+    args = _build_arg_parser().parse_args()
+
+    if args.cmd == "text_all":
+        bench_text_all(pd.read_csv(args.csv), args.rows)
+    elif args.cmd == "tfidf":
+        bench_tfidf(pd.read_csv(args.csv), args.rows)
+    elif args.cmd == "postprocess":
+        bench_postprocess(pd.read_csv(args.csv), args.rows)
+    elif args.cmd == "coldstart":
+        bundle = args.bundle or os.path.join(args.model_dir, sm.DEFAULT_EXPORT_FILE)
+        bench_coldstart(args.model_dir, bundle, args.repeat)
+    elif args.cmd == "knn":
+        bench_knn(pd.read_csv(args.csv), args.folds, args.sparse_rows, args.index_rows, args.query_rows, args.clf_solver)
+    else:
+        raise RuntimeError("Unknown command")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the fetch stage of generate_2500_Indian_dishes.py against a local stub server.
+
+What it does
+- Starts a threaded HTTP server on 127.0.0.1 that imitates:
+    * the MediaWiki categorymembers API: --pages pages per category, cmlimit titles per
+      page, cmcontinue pagination, --latency seconds per request
+    * the Wikidata SPARQL endpoint: one response after --sparql_latency seconds
+    * throttling: returns 429 if more than --server_rate requests arrive within one second
+- Runs fetch_sources() sequentially (--workers 1 --rate 0, the old behaviour) and
+  concurrently (--workers N --rate R). Reports wall time, request count and 429 count
+  for each run, and checks both runs return the same titles.
+- Then repeats the concurrent run with an HttpCache (fills it) and replays it offline with
+  the stub shut down, reporting the cached/replay wall time.
+
+Usage
+  python bench_wiki_fetch.py
+  python bench_wiki_fetch.py --pages 4 --latency 0.3 --sparql_latency 3 --workers 8 --rate 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+from urllib.parse import parse_qs, urlparse
+
+import generate_2500_Indian_dishes as gen
+
+
+class StubState:
+    def __init__(self, pages: int, per_page: int, latency: float, sparql_latency: float, server_rate: float):
+        self.pages = pages
+        self.per_page = per_page
+        self.latency = latency
+        self.sparql_latency = sparql_latency
+        self.server_rate = server_rate
+        self.lock = threading.Lock()
+        self.recent: deque = deque()
+        self.counts: Dict[str, int] = {"requests": 0, "throttled": 0}
+
+    def throttled(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.counts["requests"] += 1
+            while self.recent and now - self.recent[0] > 1.0:
+                self.recent.popleft()
+            if self.server_rate > 0 and len(self.recent) >= self.server_rate:
+                self.counts["throttled"] += 1
+                return True
+            self.recent.append(now)
+            return False
+
+    def reset(self) -> None:
+        with self.lock:
+            self.recent.clear()
+            self.counts = {"requests": 0, "throttled": 0}
+
+
+def _handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args) -> None:
+            pass
+
+        def _json(self, status: int, body: Dict) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            q = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if state.throttled():
+                self._json(429, {"error": "too many requests"})
+                return
+            if url.path == "/w/api.php":
+                time.sleep(state.latency)
+                category = q["cmtitle"].split(":", 1)[1]
+                page = int(q.get("cmcontinue", "0"))
+                titles = [f"{category} dish {page * state.per_page + i}" for i in range(state.per_page)]
+                body: Dict = {"query": {"categorymembers": [{"title": t} for t in titles]}}
+                if page + 1 < state.pages:
+                    body["continue"] = {"cmcontinue": str(page + 1), "continue": "-||"}
+                self._json(200, body)
+            elif url.path == "/sparql":
+                time.sleep(state.sparql_latency)
+                bindings = [{"itemLabel": {"value": f"Wikidata dish {i}"}} for i in range(1000)]
+                self._json(200, {"results": {"bindings": bindings}})
+            else:
+                self._json(404, {"error": "not found"})
+
+    return Handler
+
+
+def _run(base: str, state: StubState, workers: int, rate: float) -> tuple:
+    state.reset()
+    t0 = time.perf_counter()
+    wiki, wd = gen.fetch_sources(
+        gen.DEFAULT_WIKI_CATEGORIES,
+        workers=workers,
+        rate=rate,
+        wiki_url=f"{base}/w/api.php",
+        wikidata_url=f"{base}/sparql",
+    )
+    return time.perf_counter() - t0, wiki, wd, dict(state.counts)
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Time sequential vs concurrent category fetching against a stub server.")
+    p.add_argument("--pages", type=int, default=3, help="Pages per category.")
+    p.add_argument("--per_page", type=int, default=500, help="Titles per page (cmlimit).")
+    p.add_argument("--latency", type=float, default=0.25, help="Stub latency per MediaWiki request (s).")
+    p.add_argument("--sparql_latency", type=float, default=2.0, help="Stub latency of the SPARQL query (s).")
+    p.add_argument("--server_rate", type=float, default=10, help="Stub returns 429 above this many requests/s.")
+    p.add_argument("--workers", type=int, default=gen.DEFAULT_WORKERS, help="Workers for the concurrent run.")
+    p.add_argument("--rate", type=float, default=gen.DEFAULT_RATE, help="Client rate limit for the concurrent run.")
+    args = p.parse_args()
+
+    state = StubState(args.pages, args.per_page, args.latency, args.sparql_latency, args.server_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    cache_dir = tempfile.mkdtemp(prefix="wiki_cache_")
+    cache_path = os.path.join(cache_dir, gen.DEFAULT_HTTP_CACHE)
+    mb = 1024 * 1024
+    try:
+        seq = _run(base, state, workers=1, rate=0)
+        con = _run(base, state, workers=args.workers, rate=args.rate)
+        gen.HTTP_CACHE = gen.HttpCache(cache_path, ttl_seconds=3600, max_bytes=100 * mb)
+        fill = _run(base, state, workers=args.workers, rate=args.rate)
+        gen.HTTP_CACHE.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+    # Server is gone: every request must come from the cache
+    gen.HTTP_CACHE = gen.HttpCache(cache_path, ttl_seconds=3600, max_bytes=100 * mb, replay=True)
+    replay = _run(base, state, workers=args.workers, rate=args.rate)
+    hits = gen.HTTP_CACHE.hits
+    gen.HTTP_CACHE.close()
+    gen.HTTP_CACHE = None
+
+    runs = (
+        ("sequential", seq),
+        (f"concurrent x{args.workers} @{args.rate:g}/s", con),
+        ("concurrent, filling cache", fill),
+        ("replay from cache", replay),
+    )
+    for name, (seconds, wiki, wd, counts) in runs:
+        print(f"{name:>26}: {seconds:8.3f}s  {len(wiki)} wiki + {len(wd)} wikidata titles, "
+              f"{counts['requests']} requests, {counts['throttled']} throttled")
+    print(f"replay: {hits} cache hits, cache file {os.path.getsize(cache_path) / mb:.1f} MB")
+    same = all(r[1] == seq[1] and r[2] == seq[2] for _, r in runs)
+    print(f"speedup {seq[0] / con[0]:.1f}x (concurrent), {seq[0] / replay[0]:.0f}x (replay); identical titles: {same}")
+    if not same:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
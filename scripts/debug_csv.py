@@ -1,15 +1,21 @@
+import argparse
 import csv
 
-FILE = "/Users/ritwikmac/Cutmysugar/Database/Gi_gl_master_Final_with_search_text.csv"
+from migrate_csv import SOURCE_PATH
 
-with open(FILE, 'r') as f:
+parser = argparse.ArgumentParser(description="Print the header and the raw cells of rows containing a value.")
+parser.add_argument("file", nargs="?", default=SOURCE_PATH, help="CSV to inspect (default: the migration source).")
+parser.add_argument("--value", default="Masala omelette", help="Exact cell value identifying the rows to print.")
+args = parser.parse_args()
+
+with open(args.file, 'r') as f:
     reader = csv.reader(f)
     headers = next(reader)
     print(f"Header Count: {len(headers)}")
     print(f"Headers: {headers}")
     
     for row in reader:
-        if "Masala omelette" in row:
+        if args.value in row:
             print(f"\nRow Count: {len(row)}")
             print("Row Values:")
             for i, val in enumerate(row):
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Streaming ingestion of the USDA FoodData Central survey (FNDDS) download into the master schema.
+
+What it does
+- Reads the member CSVs straight out of the zip (zipfile + io.TextIOWrapper, nothing is
+  extracted to disk) and merge-joins food.csv, survey_fndds_food.csv, food_nutrient.csv and
+  food_portion.csv on fdc_id. All four are sorted by fdc_id in the FDC download, so only one
+  food's rows are held at a time; the small lookup tables (wweia_food_category.csv) are
+  loaded whole. An out-of-order member is an error rather than a silent mis-join.
+- Per food (FNDDS amounts are per 100 g):
+    * available_carbs_g = Carbohydrate, by difference (205) - Fiber, total dietary (291),
+      clipped at 0; empty when carbohydrate is missing
+    * Serving size G = the FNDDS default portion ("Quantity not specified") gram weight, or
+      the first natural portion with a weight; min/max = 0.7x / 1.3x, the master's convention
+    * serving_type from the natural portion closest in weight (cup, slice, piece, ...)
+    * primary_category = WWEIA category description
+  GI/GL columns are left empty for the GI model / curators to fill.
+- Writes rows in the source master schema (migrate_csv.HEADER_MAPPING keys, the columns of
+  Database/Gi_gl_master_Final_with_search_text.csv that serving_model.py reads too), with
+  food_id FDC_<fdc_id>. To merge them, add the output as a source in migrate_config.json, e.g.
+    {"name": "fdc", "path": "../Database/fdc_survey_master.csv", "adds_rows": true}
+- Reports rows/s, input MB/s and peak RSS. Stdlib only; runs offline.
+- `bench` tiles the zip's foods --scale times into a temporary zip and ingests 1x and the
+  tiled copy in fresh processes, to show time grows with the input and memory does not.
+
+Usage
+  python fdc_ingest.py ingest --zip ../Database/FoodData_Central_survey_food_csv_2024-10-31.zip --out <fdc.csv>
+  python fdc_ingest.py bench --zip ../Database/FoodData_Central_survey_food_csv_2024-10-31.zip --scale 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import itertools
+import json
+import operator
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from migrate_csv import HEADER_MAPPING, REPO_ROOT
+
+DEFAULT_ZIP = os.path.join(REPO_ROOT, "Database", "FoodData_Central_survey_food_csv_2024-10-31.zip")
+# HEADER_MAPPING's source columns in the order of the master CSV itself
+MASTER_HEADERS = [
+    "food_id", "canonical_name", "canonical_name_original", "primary_category", "serving_type",
+    "Serving size min ", "Serving size G", "Serving Size Max", "Serving size confidence",
+    "gi", "gi_evidence", "gl_median", "gl_min", "gl_max", "gl_category", "confidence_score",
+    "available_carbs_g", "notes", "aliases_compiled", "search_text",
+]
+assert sorted(MASTER_HEADERS) == sorted(HEADER_MAPPING)
+
+NUTRIENT_CARBS = "205"  # Carbohydrate, by difference (g / 100 g)
+NUTRIENT_FIBER = "291"  # Fiber, total dietary (g / 100 g)
+DEFAULT_PORTION_MODIFIER = "90000"  # "Quantity not specified"
+SERVING_MIN_FACTOR = 0.7
+SERVING_MAX_FACTOR = 1.3
+
+# portion_description word -> master serving_type (first match wins; plurals match too)
+SERVING_TYPES = [
+    ("tablespoon", "tablespoon"), ("tbsp", "tablespoon"), ("teaspoon", "teaspoon"), ("tsp", "teaspoon"),
+    ("slice", "slice"), ("scoop", "scoop"), ("packet", "packet"), ("bowl", "bowl"), ("can", "can"),
+    ("glass", "glass"), ("fl oz", "glass"), ("bottle", "glass"), ("cup", "cup"),
+    ("piece", "piece"), ("each", "piece"), ("patty", "piece"), ("stick", "piece"), ("bar", "piece"),
+    ("roll", "piece"), ("bun", "piece"), ("wing", "piece"), ("cookie", "piece"), ("nugget", "piece"),
+    ("small", "piece"), ("medium", "piece"), ("large", "piece"),
+]
+_SERVING_PATTERNS = [(re.compile(rf"\b{re.escape(k)}(e?s)?\b"), t) for k, t in SERVING_TYPES]
+
+
+def _member(z: zipfile.ZipFile, name: str) -> str:
+    for info in z.infolist():
+        if info.filename.rsplit("/", 1)[-1] == name:
+            return info.filename
+    raise FileNotFoundError(f"{name} not found in {z.filename}")
+
+
+def _rows(z: zipfile.ZipFile, name: str, counter: Dict[str, int], columns: Tuple[str, ...]) -> Iterator[Dict[str, str]]:
+    """Stream one member CSV as dicts of `columns`, counting uncompressed bytes read."""
+    info = z.getinfo(_member(z, name))
+    counter["bytes"] += info.file_size
+    with z.open(info) as raw:
+        reader = csv.reader(io.TextIOWrapper(raw, encoding="utf-8", newline=""))
+        header = next(reader)
+        pick = operator.itemgetter(*(header.index(c) for c in columns))
+        for row in reader:
+            if row:
+                yield dict(zip(columns, pick(row)))
+
+
+def _grouped(rows: Iterator[Dict[str, str]], key: str, name: str) -> Iterator[Tuple[int, List[Dict[str, str]]]]:
+    """(fdc_id, rows) groups of a member sorted by fdc_id; raises if it is not sorted."""
+    prev = -1
+    for fdc_id, group in itertools.groupby(rows, key=lambda r: int(r[key])):
+        if fdc_id <= prev:
+            raise ValueError(f"{name} is not sorted by {key} ({fdc_id} after {prev})")
+        prev = fdc_id
+        yield fdc_id, list(group)
+
+
+def _joined(z: zipfile.ZipFile, counter: Dict[str, int]) -> Iterator[Tuple[Dict, Optional[Dict], List, List]]:
+    """(food, survey row, nutrient rows, portion rows) per food, by merge join on fdc_id."""
+    members = {
+        "survey_fndds_food.csv": ("fdc_id", "food_code"),
+        "food_nutrient.csv": ("fdc_id", "nutrient_id", "amount"),
+        "food_portion.csv": ("fdc_id", "portion_description", "modifier", "gram_weight"),
+    }
+    sides = {name: _grouped(_rows(z, name, counter, cols), "fdc_id", name) for name, cols in members.items()}
+    heads: Dict[str, Optional[Tuple[int, List]]] = {n: next(it, None) for n, it in sides.items()}
+
+    def take(name: str, fdc_id: int) -> List[Dict[str, str]]:
+        while heads[name] is not None and heads[name][0] < fdc_id:
+            heads[name] = next(sides[name], None)  # rows for foods not in food.csv
+        if heads[name] is not None and heads[name][0] == fdc_id:
+            rows = heads[name][1]
+            heads[name] = next(sides[name], None)
+            return rows
+        return []
+
+    foods = _rows(z, "food.csv", counter, ("fdc_id", "description", "food_category_id"))
+    for fdc_id, (food,) in _grouped(foods, "fdc_id", "food.csv"):
+        survey = take("survey_fndds_food.csv", fdc_id)
+        yield food, (survey[0] if survey else None), take("food_nutrient.csv", fdc_id), take("food_portion.csv", fdc_id)
+
+
+def _fmt(v: Optional[float], digits: int = 2, missing: str = "") -> str:
+    if v is None:
+        return missing
+    return f"{round(v, digits):g}" if digits else str(int(round(v)))
+
+
+def _float(s: str) -> Optional[float]:
+    try:
+        return float(s)
+    except (TypeError, ValueError):
+        return None
+
+
+def serving_type(description: str) -> str:
+    d = description.lower()
+    return next((t for pattern, t in _SERVING_PATTERNS if pattern.search(d)), "portion")
+
+
+def choose_serving(portions: List[Dict[str, str]]) -> Tuple[Optional[float], str, str, str]:
+    """(grams, serving_type, portion description, confidence) for one food's portions."""
+    weighted = [(p, _float(p["gram_weight"])) for p in portions]
+    weighted = [(p, g) for p, g in weighted if g and g > 0]
+    natural = [(p, g) for p, g in weighted
+               if p["modifier"] != DEFAULT_PORTION_MODIFIER and not p["portion_description"].startswith("Guideline")]
+    default = [(p, g) for p, g in weighted if p["modifier"] == DEFAULT_PORTION_MODIFIER]
+    if default:
+        grams, confidence = default[0][1], "0.8"
+    elif natural:
+        grams, confidence = natural[0][1], "0.6"
+    else:
+        return None, "portion", "", ""
+    if not natural:
+        return grams, "portion", "", confidence
+    # nearest weight; on ties prefer a description that names a unit
+    closest = min(natural, key=lambda pg: (abs(pg[1] - grams), serving_type(pg[0]["portion_description"]) == "portion"))
+    description = closest[0]["portion_description"]
+    return grams, serving_type(description), description, confidence
+
+
+def food_row(food: Dict[str, str], survey: Optional[Dict[str, str]], nutrients: List[Dict[str, str]],
+             portions: List[Dict[str, str]], categories: Dict[str, str]) -> Dict[str, str]:
+    """One master-schema row (MASTER_HEADERS keys)."""
+    amounts = {n["nutrient_id"]: _float(n["amount"]) for n in nutrients
+               if n["nutrient_id"] in (NUTRIENT_CARBS, NUTRIENT_FIBER)}
+    carbs, fiber = amounts.get(NUTRIENT_CARBS), amounts.get(NUTRIENT_FIBER)
+    available = max(0.0, carbs - (fiber or 0.0)) if carbs is not None else None
+    grams, s_type, portion, s_conf = choose_serving(portions)
+    category = categories.get(food["food_category_id"], "")
+    name = food["description"]
+    food_code = survey["food_code"] if survey else ""
+
+    g_min = grams * SERVING_MIN_FACTOR if grams else None
+    g_max = grams * SERVING_MAX_FACTOR if grams else None
+    notes = f"USDA FNDDS (FDC {food['fdc_id']}, food code {food_code}); per 100 g: " \
+            f"carbohydrate {_fmt(carbs, missing='n/a')} g, fiber {_fmt(fiber, missing='n/a')} g"
+    if portion:
+        notes += f"; serving: {portion}"
+    search = [name, f"category: {category}", f"serving_type: {s_type}"]
+    if grams:
+        search.append(f"serving_g: {_fmt(grams, 0)}(min {_fmt(g_min, 0)} max {_fmt(g_max, 0)})")
+    if available is not None:
+        search.append(f"available_carbs_g: {_fmt(available)}")
+    search.append(f"notes: {notes}")
+
+    row = dict.fromkeys(MASTER_HEADERS, "")
+    row.update({
+        "food_id": f"FDC_{food['fdc_id']}",
+        "canonical_name": name,
+        "canonical_name_original": name,
+        "primary_category": category,
+        "serving_type": s_type,
+        "Serving size min ": _fmt(g_min, 0),
+        "Serving size G": _fmt(grams, 0),
+        "Serving Size Max": _fmt(g_max, 0),
+        "Serving size confidence": s_conf,
+        "available_carbs_g": _fmt(available),
+        "notes": notes,
+        "search_text": " | ".join(search),
+    })
+    return row
+
+
+def _peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmHWM:")) / 1024.0
+    except (OSError, StopIteration):
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def ingest(zip_path: str, out_path: str, limit: Optional[int] = None) -> Dict[str, float]:
+    """Write the master-schema CSV for every food in the zip. Returns rows, seconds, rows/s, MB/s, peak RSS."""
+    t0 = time.perf_counter()
+    counter = {"bytes": 0}
+    stats = {"rows": 0, "no_carbs": 0, "no_serving": 0}
+    tmp_path = out_path + ".tmp"
+    with zipfile.ZipFile(zip_path) as z:
+        categories = {r["wweia_food_category"]: r["wweia_food_category_description"]
+                      for r in _rows(z, "wweia_food_category.csv", counter,
+                                     ("wweia_food_category", "wweia_food_category_description"))}
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=MASTER_HEADERS)
+            writer.writeheader()
+            for food, survey, nutrients, portions in itertools.islice(_joined(z, counter), limit):
+                row = food_row(food, survey, nutrients, portions, categories)
+                stats["no_carbs"] += not row["available_carbs_g"]
+                stats["no_serving"] += not row["Serving size G"]
+                writer.writerow(row)
+                stats["rows"] += 1
+    os.replace(tmp_path, out_path)
+    seconds = time.perf_counter() - t0
+    return {**stats, "seconds": seconds, "rows_per_s": stats["rows"] / seconds,
+            "mb_per_s": counter["bytes"] / 1e6 / seconds, "input_mb": counter["bytes"] / 1e6,
+            "peak_rss_mb": _peak_rss_mb()}
+
+
+def _tile_zip(zip_path: str, out_zip: str, scale: int) -> None:
+    """Copy of the FDC zip with every food repeated `scale` times under new fdc_ids (still sorted)."""
+    with zipfile.ZipFile(zip_path) as z, zipfile.ZipFile(out_zip, "w", zipfile.ZIP_DEFLATED) as out:
+        for name in ("wweia_food_category.csv",):
+            out.writestr(name, z.read(_member(z, name)))
+        for name in ("food.csv", "survey_fndds_food.csv", "food_nutrient.csv", "food_portion.csv"):
+            with z.open(_member(z, name)) as raw:
+                lines = io.TextIOWrapper(raw, encoding="utf-8", newline="").read().splitlines(keepends=True)
+            header = next(csv.reader([lines[0]]))
+            i_id = header.index("fdc_id")
+            span = 10 ** 8
+            with out.open(name, "w") as dst:
+                text = io.TextIOWrapper(dst, encoding="utf-8", newline="")
+                writer = csv.writer(text, quoting=csv.QUOTE_ALL, lineterminator="\n")
+                writer.writerow(header)
+                for k in range(scale):
+                    for row in csv.reader(lines[1:]):
+                        row[i_id] = str(int(row[i_id]) + k * span)
+                        writer.writerow(row)
+                text.flush()
+                text.detach()
+
+
+def _ingest_subprocess(zip_path: str, out_path: str) -> Dict[str, float]:
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = f"import json, fdc_ingest; print(json.dumps(fdc_ingest.ingest({zip_path!r}, {out_path!r})))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=here, check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def bench(zip_path: str, scale: int) -> None:
+    with tempfile.TemporaryDirectory(prefix="fdc_bench_") as tmp:
+        tiled = os.path.join(tmp, f"fdc_x{scale}.zip")
+        _tile_zip(zip_path, tiled, scale)
+        print(f"{'input':<8} {'rows':>9} {'input MB':>9} {'seconds':>8} {'rows/s':>9} {'MB/s':>7} {'peak RSS MB':>12}")
+        for name, path in (("1x", zip_path), (f"{scale}x", tiled)):
+            r = _ingest_subprocess(path, os.path.join(tmp, "out.csv"))
+            print(f"{name:<8} {r['rows']:>9} {r['input_mb']:>9.1f} {r['seconds']:>8.2f} {r['rows_per_s']:>9.0f} "
+                  f"{r['mb_per_s']:>7.1f} {r['peak_rss_mb']:>12.1f}")
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Ingest the FoodData Central survey zip into the master schema.")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    i = sub.add_parser("ingest", help="Write master-schema rows for every food in the zip.")
+    i.add_argument("--zip", default=DEFAULT_ZIP, help="FoodData Central survey CSV zip.")
+    i.add_argument("--out", required=True, help="Output CSV (source master schema).")
+    i.add_argument("--limit", type=int, default=None, help="Stop after this many foods.")
+
+    b = sub.add_parser("bench", help="Ingest 1x and a tiled copy of the zip; report time and peak RSS.")
+    b.add_argument("--zip", default=DEFAULT_ZIP, help="FoodData Central survey CSV zip.")
+    b.add_argument("--scale", type=int, default=20, help="Times each food is repeated in the tiled copy.")
+    return p
+
+
+def main() -> None:
+    args = _build_arg_parser().parse_args()
+    if args.cmd == "ingest":
+        r = ingest(args.zip, args.out, args.limit)
+        print(f"Wrote {r['rows']} rows to: {args.out}")
+        print(f"{r['seconds']:.2f}s, {r['rows_per_s']:,.0f} rows/s, {r['mb_per_s']:.1f} MB/s of CSV, "
+              f"peak RSS {r['peak_rss_mb']:.1f} MB; {r['no_carbs']} without carbs, {r['no_serving']} without a serving")
+    else:
+        bench(args.zip, args.scale)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Precompiled binary food database asset (stdlib only).
+
+What it does
+- Converts the migrated master CSV (gi_gl_master.csv) into a pre-typed columnar file the
+  app can map without parsing CSV:
+    * numeric columns (gi, gl, serving sizes, carbs, confidences) as fixed-width float64,
+      empty cells stored as NaN
+    * text columns as uint32 indices into one deduplicated UTF-8 string table
+    * a food_id -> row table: row numbers sorted by the UTF-8 bytes of food_id, for
+      binary search
+- Reads it back (FoodDbAsset) and verifies a round trip against the CSV.
+
+File layout (little-endian)
+  [0:24)   magic b"CMSFOOD1", u32 format_version, u32 n_rows, u32 meta_len, u32 reserved
+  [24:..)  meta JSON (utf-8): columns [{name, type: "f64"|"str"}], n_strings and
+           sections {name: [byte_offset, byte_length]}
+  sections, each 8-byte aligned:
+    col:<name>        n_rows float64 (f64) or n_rows uint32 string ids (str)
+    string_offsets    (n_strings + 1) uint32 byte offsets into string_data
+    string_data       concatenated UTF-8 strings
+    id_index          uint32 row numbers, sorted by food_id (empty food_ids left out)
+
+Usage
+  Python:
+    from food_db_asset import load_asset
+    db = load_asset("src/assets/data/gi_gl_master.bin")
+    db.get("NONIND_0398")["gi"]
+
+  CLI:
+    python food_db_asset.py build  --csv <gi_gl_master.csv> --out <gi_gl_master.bin>
+    python food_db_asset.py verify --csv <gi_gl_master.csv> --asset <gi_gl_master.bin>
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import csv
+import json
+import math
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+MAGIC = b"CMSFOOD1"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<8sIII4x")
+
+# Columns typed like Papa.parse dynamicTyping would in FoodDatabaseService
+NUMERIC_COLUMNS = [
+    "serving_size_g",
+    "serving_size_min_g",
+    "serving_size_max_g",
+    "serving_size_confidence",
+    "gi",
+    "gl_median",
+    "gl_min",
+    "gl_max",
+    "confidence_score",
+    "available_carbs_g",
+]
+
+ID_COLUMN = "food_id"
+
+
+def _le(a: array) -> array:
+    if sys.byteorder != "little":
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a
+
+
+def _pad8(n: int) -> int:
+    return (8 - n % 8) % 8
+
+
+def _parse_float(v: str) -> Optional[float]:
+    """float(v), or None for an empty or non-numeric cell."""
+    if v == "":
+        return None
+    try:
+        return float(v)
+    except ValueError:
+        return None
+
+
+def warn_non_numeric(non_numeric: Dict[str, int]) -> None:
+    for name, n in non_numeric.items():
+        print(f"Warning: {n} non-numeric {name} value(s) stored as empty in the binary asset")
+
+
+def write_asset(csv_path: str, out_path: str) -> Dict[str, Any]:
+    """
+    Build the binary asset from a migrated master CSV. Returns {"rows", "strings", "bytes", "non_numeric"}.
+
+    Non-numeric cells in NUMERIC_COLUMNS (e.g. confidence_score="Low") are stored as NaN, like
+    empty ones; non_numeric counts them per column.
+    """
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            raise ValueError(f"Empty CSV: {csv_path}")
+        if ID_COLUMN not in header:
+            raise ValueError(f"'{ID_COLUMN}' column missing from {csv_path}")
+
+        numeric = set(NUMERIC_COLUMNS)
+        columns = [{"name": c, "type": "f64" if c in numeric else "str"} for c in header]
+        data = [array("d") if col["type"] == "f64" else array("I") for col in columns]
+
+        string_ids: Dict[str, int] = {}
+        strings: List[bytes] = []
+        non_numeric: Dict[str, int] = {}
+        n_rows = 0
+        for row in reader:
+            if not row:
+                continue
+            row = row + [""] * (len(header) - len(row))
+            for j, col in enumerate(columns):
+                v = row[j]
+                if col["type"] == "f64":
+                    x = _parse_float(v)
+                    if x is None:
+                        data[j].append(math.nan)
+                        if v != "":
+                            non_numeric[col["name"]] = non_numeric.get(col["name"], 0) + 1
+                    else:
+                        data[j].append(x)
+                else:
+                    sid = string_ids.get(v)
+                    if sid is None:
+                        sid = string_ids[v] = len(strings)
+                        strings.append(v.encode("utf-8"))
+                    data[j].append(sid)
+            n_rows += 1
+
+    id_col = data[header.index(ID_COLUMN)]
+    id_index = array("I", sorted((r for r in range(n_rows) if strings[id_col[r]]), key=lambda r: strings[id_col[r]]))
+
+    string_offsets = array("I", [0])
+    for s in strings:
+        string_offsets.append(string_offsets[-1] + len(s))
+
+    blobs = [(f"col:{c['name']}", _le(a).tobytes()) for c, a in zip(columns, data)]
+    blobs += [
+        ("string_offsets", _le(string_offsets).tobytes()),
+        ("string_data", b"".join(strings)),
+        ("id_index", _le(id_index).tobytes()),
+    ]
+    meta: Dict[str, Any] = {"columns": columns, "n_strings": len(strings), "id_column": ID_COLUMN}
+    size = write_container(out_path, MAGIC, FORMAT_VERSION, n_rows, meta, blobs)
+    return {"rows": n_rows, "strings": len(strings), "bytes": size, "non_numeric": non_numeric}
+
+
+def write_container(
+    out_path: str, magic: bytes, version: int, n_rows: int, meta: Dict[str, Any], blobs: List[Tuple[str, bytes]]
+) -> int:
+    """Header + meta JSON + 8-byte-aligned sections; meta["sections"] is filled in. Returns the file size."""
+    # Section offsets depend on the meta length, so lay out relative to the data start first
+    rel_sections: Dict[str, List[int]] = {}
+    pos = 0
+    for name, blob in blobs:
+        rel_sections[name] = [pos, len(blob)]
+        pos += len(blob) + _pad8(len(blob))
+
+    data_start = 0
+    while True:
+        meta["sections"] = {k: [off + data_start, n] for k, (off, n) in rel_sections.items()}
+        meta_bytes = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+        start = _HEADER.size + len(meta_bytes)
+        start += _pad8(start)
+        if start == data_start:
+            break
+        data_start = start
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(magic, version, n_rows, len(meta_bytes)))
+        f.write(meta_bytes)
+        f.write(b"\0" * (data_start - _HEADER.size - len(meta_bytes)))
+        for _, blob in blobs:
+            f.write(blob)
+            f.write(b"\0" * _pad8(len(blob)))
+    os.replace(tmp_path, out_path)
+    return os.path.getsize(out_path)
+
+
+def read_container(path: str, magic: bytes, version: int) -> Tuple[memoryview, int, Dict[str, Any]]:
+    """(buffer, n_rows, meta) of a file written by write_container."""
+    with open(path, "rb") as f:
+        buf = memoryview(f.read())
+    file_magic, file_version, n_rows, meta_len = _HEADER.unpack_from(buf, 0)
+    if file_magic != magic:
+        raise ValueError(f"Not a {magic.decode()} file: {path}")
+    if file_version != version:
+        raise ValueError(f"Unsupported {magic.decode()} format: {file_version}")
+    return buf, n_rows, json.loads(bytes(buf[_HEADER.size:_HEADER.size + meta_len]))
+
+
+def read_section(buf: memoryview, meta: Dict[str, Any], name: str, typecode: str):
+    """Zero-copy typed view of a section (a byteswapped copy on big-endian hosts)."""
+    off, n = meta["sections"][name]
+    view = buf[off:off + n]
+    if typecode == "B":
+        return view
+    if sys.byteorder == "little":
+        return view.cast(typecode)
+    a = array(typecode, view)
+    a.byteswap()
+    return a
+
+
+class FoodDbAsset:
+    """Read-only view over a binary asset; columns are decoded lazily from one buffer."""
+
+    def __init__(self, path: str) -> None:
+        self._buf, self.n_rows, self.meta = read_container(path, MAGIC, FORMAT_VERSION)
+        self.columns: List[str] = [c["name"] for c in self.meta["columns"]]
+        self._types: Dict[str, str] = {c["name"]: c["type"] for c in self.meta["columns"]}
+        self._string_offsets = self._section("string_offsets", "I")
+        off, _ = self.meta["sections"]["string_data"]
+        self._string_data = self._buf[off:]
+        self._id_index = self._section("id_index", "I")
+        self._id_col = self._section(f"col:{self.meta['id_column']}", "I")
+        self._cache: Dict[str, Any] = {}
+
+    def _section(self, name: str, typecode: str):
+        return read_section(self._buf, self.meta, name, typecode)
+
+    def string(self, sid: int) -> str:
+        return bytes(self._string_data[self._string_offsets[sid]:self._string_offsets[sid + 1]]).decode("utf-8")
+
+    def _id_bytes(self, row: int) -> bytes:
+        sid = self._id_col[row]
+        return bytes(self._string_data[self._string_offsets[sid]:self._string_offsets[sid + 1]])
+
+    def column(self, name: str) -> List[Any]:
+        """All values of a column: floats (None for empty) or str."""
+        if name not in self._cache:
+            raw = self._section(f"col:{name}", "d" if self._types[name] == "f64" else "I")
+            if self._types[name] == "f64":
+                self._cache[name] = [None if math.isnan(v) else v for v in raw]
+            else:
+                self._cache[name] = [self.string(sid) for sid in raw]
+        return self._cache[name]
+
+    def row(self, i: int) -> Dict[str, Any]:
+        return {name: self.column(name)[i] for name in self.columns}
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        cols = [self.column(name) for name in self.columns]
+        for values in zip(*cols):
+            yield dict(zip(self.columns, values))
+
+    def row_index(self, food_id: str) -> Optional[int]:
+        key = food_id.encode("utf-8")
+        idx = self._id_index
+        lo = bisect.bisect_left(range(len(idx)), key, key=lambda k: self._id_bytes(idx[k]))
+        if lo < len(idx) and self._id_bytes(idx[lo]) == key:
+            return idx[lo]
+        return None
+
+    def get(self, food_id: str) -> Optional[Dict[str, Any]]:
+        i = self.row_index(food_id)
+        return None if i is None else self.row(i)
+
+
+def load_asset(path: str) -> FoodDbAsset:
+    return FoodDbAsset(path)
+
+
+def _csv_typed_rows(csv_path: str) -> List[Dict[str, Any]]:
+    numeric = set(NUMERIC_COLUMNS)
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        return [
+            {k: (_parse_float(v) if k in numeric else v) for k, v in r.items()}
+            for r in csv.DictReader(f)
+        ]
+
+
+def verify(csv_path: str, asset_path: str) -> bool:
+    """Round-trip check against the CSV, plus size and load-time numbers."""
+    t0 = time.perf_counter()
+    expected = _csv_typed_rows(csv_path)
+    csv_seconds = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    db = load_asset(asset_path)
+    open_seconds = time.perf_counter() - t0
+    got = list(db.rows())
+    asset_seconds = time.perf_counter() - t0
+
+    ok = len(got) == len(expected) and got == expected
+    if ok:
+        # every food_id resolves back to its own row
+        ok = all(db.row_index(r[ID_COLUMN]) == i for i, r in enumerate(expected) if r[ID_COLUMN])
+
+    csv_bytes = os.path.getsize(csv_path)
+    asset_bytes = os.path.getsize(asset_path)
+    print(f"rows: {len(expected)}  strings: {db.meta['n_strings']}")
+    print(f"size: csv {csv_bytes / 1e3:.1f} kB  asset {asset_bytes / 1e3:.1f} kB ({asset_bytes / csv_bytes:.2f}x)")
+    print(f"load: csv parse+type {csv_seconds * 1e3:.1f} ms  asset open {open_seconds * 1e3:.2f} ms"
+          f"  asset all rows {asset_seconds * 1e3:.1f} ms")
+    print(f"round trip: {'OK' if ok else 'MISMATCH'}")
+    return ok
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Build or verify the binary food database asset.")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    b = sub.add_parser("build", help="Write the binary asset from a migrated master CSV.")
+    b.add_argument("--csv", required=True, help="Migrated master CSV (gi_gl_master.csv).")
+    b.add_argument("--out", required=True, help="Output asset path (.bin).")
+
+    v = sub.add_parser("verify", help="Round-trip the asset against its CSV and report size/load time.")
+    v.add_argument("--csv", required=True, help="Migrated master CSV (gi_gl_master.csv).")
+    v.add_argument("--asset", required=True, help="Asset written by `build`.")
+    return p
+
+
+def main() -> None:
+    args = _build_arg_parser().parse_args()
+    if args.cmd == "build":
+        info = write_asset(args.csv, args.out)
+        warn_non_numeric(info["non_numeric"])
+        print(f"Wrote {info['rows']} rows ({info['strings']} strings, {info['bytes']} bytes) to: {args.out}")
+    else:
+        if not verify(args.csv, args.asset):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Prebuilt search index for the migrated master (stdlib only).
+
+What it does
+- Builds a sidecar asset next to gi_gl_master.csv so the app can answer
+  FoodDatabaseService.search / getFoodById without scanning every item:
+    * normalized text per food: search_text, or canonical_name when search_text is empty,
+      lowercased (search_text already carries the aliases_compiled values)
+    * an n-gram inverted index over that text: every distinct 2-gram and 3-gram with the
+      ascending rows containing it. Grams found in more than --max_df of the foods are kept
+      in the gram table but flagged dense and get no posting list.
+    * a food_id hash index: open addressing over FNV-1a 32 of the UTF-8 food_id
+- Provides a query harness with the app's semantics: queries shorter than 2 characters
+  match nothing, otherwise a case-insensitive substring match, first 50 matches in file
+  order. The index only narrows candidates; every candidate is checked with the substring
+  test, so results are exactly the linear scan's.
+- Benchmarks index vs linear scan (result equality and per-query latency) on the master
+  or on a synthetic master tiled up to --rows foods.
+
+File layout: same container as food_db_asset.py (magic b"CMSSRCH1"), sections
+  gram_offsets     (n_grams + 1) uint32 byte offsets into gram_data
+  gram_data        grams as UTF-8, sorted by bytes
+  gram_dense       n_grams uint8, 1 = no posting list stored
+  posting_offsets  (n_grams + 1) uint32 offsets into postings
+  postings         uint32 row numbers, ascending per gram
+  id_hash          hash_size uint32 slots holding row + 1 (0 = empty), linear probing
+
+Usage
+  python food_search_index.py build --csv <gi_gl_master.csv> --out <gi_gl_master.search.bin>
+  python food_search_index.py bench --csv <gi_gl_master.csv> [--rows 100000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import csv
+import os
+import random
+import statistics
+import tempfile
+import time
+from array import array
+from typing import Dict, List, Optional, Sequence
+
+from food_db_asset import _le, read_container, read_section, write_container
+
+MAGIC = b"CMSSRCH1"
+FORMAT_VERSION = 1
+GRAM_SIZES = (2, 3)
+MIN_QUERY_LEN = 2
+RESULT_LIMIT = 50
+DEFAULT_MAX_DF = 0.25
+
+
+def item_text(row: Dict[str, str]) -> str:
+    """The string FoodDatabaseService.search matches against, lowercased."""
+    return (row.get("search_text") or row.get("canonical_name") or "").lower()
+
+
+def fnv1a32(data: bytes) -> int:
+    h = 0x811C9DC5
+    for b in data:
+        h = ((h ^ b) * 0x01000193) & 0xFFFFFFFF
+    return h
+
+
+def linear_search(texts: Sequence[str], query: str) -> List[int]:
+    """Reference: the app's filter(...).slice(0, 50) over every item."""
+    if not query or len(query) < MIN_QUERY_LEN:
+        return []
+    q = query.lower()
+    out: List[int] = []
+    for i, t in enumerate(texts):
+        if q in t:
+            out.append(i)
+            if len(out) == RESULT_LIMIT:
+                break
+    return out
+
+
+def linear_find(food_ids: Sequence[str], food_id: str) -> Optional[int]:
+    """Reference: the app's find(item => item.food_id === id)."""
+    for i, f_id in enumerate(food_ids):
+        if f_id == food_id:
+            return i
+    return None
+
+
+def build_index(texts: Sequence[str], food_ids: Sequence[str], max_df: float = DEFAULT_MAX_DF) -> tuple:
+    """(meta, blobs) for write_container."""
+    n = len(texts)
+    postings: Dict[str, array] = {}
+    for i, t in enumerate(texts):
+        grams = set()
+        for k in GRAM_SIZES:
+            grams.update(t[j:j + k] for j in range(len(t) - k + 1))
+        for g in grams:
+            p = postings.get(g)
+            if p is None:
+                p = postings[g] = array("I")
+            p.append(i)
+
+    max_rows = max_df * n
+    grams = sorted(postings, key=lambda g: g.encode("utf-8"))
+    gram_offsets = array("I", [0])
+    gram_data: List[bytes] = []
+    dense = array("B")
+    posting_offsets = array("I", [0])
+    posting_data = array("I")
+    for g in grams:
+        b = g.encode("utf-8")
+        gram_data.append(b)
+        gram_offsets.append(gram_offsets[-1] + len(b))
+        p = postings[g]
+        if len(p) > max_rows:
+            dense.append(1)
+        else:
+            dense.append(0)
+            posting_data.extend(p)
+        posting_offsets.append(len(posting_data))
+
+    hash_size = 1
+    while hash_size < 2 * max(n, 1):
+        hash_size *= 2
+    id_hash = array("I", bytes(4 * hash_size))
+    for i, f_id in enumerate(food_ids):
+        slot = fnv1a32(f_id.encode("utf-8")) & (hash_size - 1)
+        while id_hash[slot]:
+            if food_ids[id_hash[slot] - 1] == f_id:
+                break  # find() returns the first row with this id
+            slot = (slot + 1) & (hash_size - 1)
+        else:
+            id_hash[slot] = i + 1
+
+    meta = {
+        "n_grams": len(grams),
+        "gram_sizes": list(GRAM_SIZES),
+        "max_df": max_df,
+        "min_query_len": MIN_QUERY_LEN,
+        "result_limit": RESULT_LIMIT,
+        "hash": "fnv1a32",
+        "hash_size": hash_size,
+    }
+    blobs = [
+        ("gram_offsets", _le(gram_offsets).tobytes()),
+        ("gram_data", b"".join(gram_data)),
+        ("gram_dense", dense.tobytes()),
+        ("posting_offsets", _le(posting_offsets).tobytes()),
+        ("postings", _le(posting_data).tobytes()),
+        ("id_hash", _le(id_hash).tobytes()),
+    ]
+    return meta, blobs
+
+
+def _read_master(csv_path: str) -> List[Dict[str, str]]:
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def write_index(csv_path: str, out_path: str, max_df: float = DEFAULT_MAX_DF) -> Dict[str, int]:
+    """Build the sidecar index for a migrated master CSV. Returns {"rows", "grams", "bytes"}."""
+    rows = _read_master(csv_path)
+    meta, blobs = build_index([item_text(r) for r in rows], [r.get("food_id") or "" for r in rows], max_df)
+    size = write_container(out_path, MAGIC, FORMAT_VERSION, len(rows), meta, blobs)
+    return {"rows": len(rows), "grams": meta["n_grams"], "bytes": size}
+
+
+class SearchIndex:
+    """Query harness over a sidecar index and the rows it was built from."""
+
+    def __init__(self, path: str, texts: Sequence[str], food_ids: Sequence[str]) -> None:
+        buf, n_rows, self.meta = read_container(path, MAGIC, FORMAT_VERSION)
+        if n_rows != len(texts):
+            raise ValueError(f"Index built for {n_rows} rows, got {len(texts)}")
+        self.texts = texts
+        self.food_ids = food_ids
+        self._gram_offsets = read_section(buf, self.meta, "gram_offsets", "I")
+        self._gram_data = read_section(buf, self.meta, "gram_data", "B")
+        self._dense = read_section(buf, self.meta, "gram_dense", "B")
+        self._posting_offsets = read_section(buf, self.meta, "posting_offsets", "I")
+        self._postings = read_section(buf, self.meta, "postings", "I")
+        self._id_hash = read_section(buf, self.meta, "id_hash", "I")
+        self._hash_mask = self.meta["hash_size"] - 1
+
+    def _gram(self, k: int) -> bytes:
+        return bytes(self._gram_data[self._gram_offsets[k]:self._gram_offsets[k + 1]])
+
+    def _lookup(self, gram: str) -> Optional[int]:
+        key = gram.encode("utf-8")
+        n = self.meta["n_grams"]
+        k = bisect.bisect_left(range(n), key, key=self._gram)
+        return k if k < n and self._gram(k) == key else None
+
+    def candidates(self, q: str) -> Optional[Sequence[int]]:
+        """Ascending candidate rows for a lowercased query; None means every row is a candidate."""
+        if len(q) < GRAM_SIZES[0]:
+            return None
+        size = GRAM_SIZES[-1] if len(q) >= GRAM_SIZES[-1] else len(q)
+        lists = []
+        for gram in {q[j:j + size] for j in range(len(q) - size + 1)}:
+            k = self._lookup(gram)
+            if k is None:
+                return []  # no food contains this gram
+            if not self._dense[k]:
+                lists.append(self._postings[self._posting_offsets[k]:self._posting_offsets[k + 1]])
+        if not lists:
+            return None
+        lists.sort(key=len)
+        out: Sequence[int] = lists[0]
+        for other in lists[1:]:
+            keep = set(other)
+            out = [r for r in out if r in keep]
+            if not out:
+                break
+        return out
+
+    def search(self, query: str) -> List[int]:
+        if not query or len(query) < MIN_QUERY_LEN:
+            return []
+        q = query.lower()
+        rows = self.candidates(q)
+        if rows is None:
+            rows = range(len(self.texts))
+        texts = self.texts
+        out: List[int] = []
+        for i in rows:
+            if q in texts[i]:
+                out.append(i)
+                if len(out) == RESULT_LIMIT:
+                    break
+        return out
+
+    def get_row(self, food_id: str) -> Optional[int]:
+        slot = fnv1a32(food_id.encode("utf-8")) & self._hash_mask
+        while self._id_hash[slot]:
+            row = self._id_hash[slot] - 1
+            if self.food_ids[row] == food_id:
+                return row
+            slot = (slot + 1) & self._hash_mask
+        return None
+
+
+def load_index(path: str, rows: Sequence[Dict[str, str]]) -> SearchIndex:
+    return SearchIndex(path, [item_text(r) for r in rows], [r.get("food_id") or "" for r in rows])
+
+
+def _synthetic(rows: List[Dict[str, str]], n_rows: int) -> List[Dict[str, str]]:
+    """Tile the master up to n_rows with unique food_ids and per-tile name suffixes."""
+    out: List[Dict[str, str]] = []
+    for n in range(n_rows):
+        r = dict(rows[n % len(rows)])
+        tile = n // len(rows)
+        if tile:
+            r["food_id"] = f"{r['food_id']}_{tile}"
+            r["canonical_name"] = f"{r['canonical_name']} v{tile}"
+            r["search_text"] = f"{r['canonical_name']} | {r['search_text']}" if r.get("search_text") else ""
+        out.append(r)
+    return out
+
+
+def _queries(rows: List[Dict[str, str]], n: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    out = ["gi:", "category", "low", "xq", "zzzq", "a", "Dal", "paneer tikka", "roti", "ch"]
+    while len(out) < n:
+        name = (rows[rng.randrange(len(rows))].get("canonical_name") or "").lower()
+        if len(name) < 2:
+            continue
+        start = rng.randrange(len(name) - 1) if rng.random() < 0.3 else 0
+        length = rng.randint(2, 8)
+        out.append(name[start:start + length])
+    return out
+
+
+def _timed(fn, items) -> tuple:
+    results, seconds = [], []
+    for it in items:
+        t0 = time.perf_counter()
+        results.append(fn(it))
+        seconds.append(time.perf_counter() - t0)
+    return results, seconds
+
+
+def _describe(seconds: List[float]) -> str:
+    s = sorted(seconds)
+    p95 = s[int(0.95 * (len(s) - 1))]
+    return f"mean {statistics.fmean(s) * 1e3:7.3f} ms  p50 {statistics.median(s) * 1e3:7.3f} ms  p95 {p95 * 1e3:7.3f} ms"
+
+
+def bench(csv_path: str, n_rows: Optional[int], n_queries: int, max_df: float) -> bool:
+    rows = _read_master(csv_path)
+    if n_rows:
+        rows = _synthetic(rows, n_rows)
+    texts = [item_text(r) for r in rows]
+    food_ids = [r.get("food_id") or "" for r in rows]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index.search.bin")
+        t0 = time.perf_counter()
+        meta, blobs = build_index(texts, food_ids, max_df)
+        size = write_container(path, MAGIC, FORMAT_VERSION, len(rows), meta, blobs)
+        build_seconds = time.perf_counter() - t0
+        index = SearchIndex(path, texts, food_ids)
+
+        queries = _queries(rows, n_queries)
+        expected, lin_s = _timed(lambda q: linear_search(texts, q), queries)
+        got, idx_s = _timed(index.search, queries)
+
+        rng = random.Random(1)
+        ids = [food_ids[rng.randrange(len(rows))] for _ in range(200)] + ["NO_SUCH_ID"]
+        expected_ids, lin_id_s = _timed(lambda f: linear_find(food_ids, f), ids)
+        got_ids, idx_id_s = _timed(index.get_row, ids)
+
+    mismatches = sum(a != b for a, b in zip(expected, got)) + sum(a != b for a, b in zip(expected_ids, got_ids))
+    csv_bytes = sum(len(t) for t in texts)
+    print(f"foods: {len(rows)}  grams: {meta['n_grams']}  index: {size / 1e3:.1f} kB"
+          f" (search text {csv_bytes / 1e3:.1f} kB)  build: {build_seconds:.2f}s")
+    print(f"search  linear {_describe(lin_s)}")
+    print(f"search  index  {_describe(idx_s)}")
+    print(f"by id   linear {_describe(lin_id_s)}")
+    print(f"by id   hash   {_describe(idx_id_s)}")
+    print(f"queries: {len(queries)} + {len(ids)} ids  mismatches vs linear: {mismatches}")
+    return mismatches == 0
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Build or benchmark the food search index sidecar.")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    b = sub.add_parser("build", help="Write the search index for a migrated master CSV.")
+    b.add_argument("--csv", required=True, help="Migrated master CSV (gi_gl_master.csv).")
+    b.add_argument("--out", required=True, help="Output index path (.search.bin).")
+    b.add_argument("--max_df", type=float, default=DEFAULT_MAX_DF, help="Grams in more foods than this are dense.")
+
+    s = sub.add_parser("bench", help="Index vs linear scan: result equality and per-query latency.")
+    s.add_argument("--csv", required=True, help="Migrated master CSV (gi_gl_master.csv).")
+    s.add_argument("--rows", type=int, default=None, help="Tile the master up to this many foods.")
+    s.add_argument("--queries", type=int, default=500, help="Number of search queries.")
+    s.add_argument("--max_df", type=float, default=DEFAULT_MAX_DF, help="Grams in more foods than this are dense.")
+    return p
+
+
+def main() -> None:
+    args = _build_arg_parser().parse_args()
+    if args.cmd == "build":
+        info = write_index(args.csv, args.out, args.max_df)
+        print(f"Wrote search index for {info['rows']} rows ({info['grams']} grams, {info['bytes']} bytes) to: {args.out}")
+    else:
+        if not bench(args.csv, args.rows, args.queries, args.max_df):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
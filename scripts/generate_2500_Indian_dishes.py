@@ -6,31 +6,62 @@ Generates a candidate list of ~2500 unique Indian dish names by pulling from:
 1) Wikipedia category members (via MediaWiki API)
 2) Wikidata SPARQL (Indian-origin dishes)
 
+Categories and the Wikidata query are fetched concurrently (thread pool on the shared
+SESSION) under one token-bucket rate limit; a 429/5xx backoff also pauses the bucket so
+the other workers wait with it. --workers 1 --rate 0 is the old sequential behaviour.
+
+With --cache, successful JSON responses are kept in an SQLite file keyed by URL + params
+(TTL, size-bounded LRU eviction), so reruns that only tune --target, BAD_TERMS or the fuzzy
+threshold skip the network. --replay serves only from the cache (offline; a miss is an
+error), so a filled cache also works as a fixture.
+
 Then:
 - filters obvious non-dish pages
-- de-duplicates vs your existing master dataset (by canonical_name)
-- fuzzy-collapses near-duplicates (avoid minor spelling / formatting variants)
+- de-duplicates vs your existing master dataset: canonical_name, aliases_compiled and the
+  names in search_text go into a char 3-gram inverted index, each candidate's shortlist is
+  scored with rapidfuzz and candidates scoring >= --master-threshold are dropped; kept
+  ones carry their closest existing name and score (see MasterIndex)
+- fuzzy-collapses near-duplicates (avoid minor spelling / formatting / word-order variants):
+  titles are blocked by keys built from their rarest tokens and all candidate pairs are
+  scored in batched rapidfuzz.process.cpdist calls (all cores); see dedup_clusters()
 - writes next2500_indian_dishes_candidates.csv
 
 Usage:
   python3 generate_2500_Indian_dishes.py \
     --existing-master gi_gl_master_cleaned_v2_portionized_v2_more_mapped.csv \
     --out next2500_indian_dishes_candidates.csv \
-    --target 2500
+    --target 2500 \
+    --workers 4 --rate 5 --cache
+
+  python3 generate_2500_Indian_dishes.py --existing-master <master.csv> --replay   # offline rerun
+
+  bench_wiki_fetch.py times sequential vs concurrent fetching against a local stub server.
 
 Dependencies:
-  pip install pandas requests rapidfuzz
+  pip install pandas numpy scipy requests rapidfuzz
 """
 
 import argparse
+import hashlib
+import itertools
+import json
+import os
 import random
 import re
+import sqlite3
+import threading
 import time
-from typing import Dict, List, Optional, Set
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
+import numpy as np
 import pandas as pd
 import requests
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process
+from requests.adapters import HTTPAdapter
+from scipy import sparse
 
 # -----------------------------
 # Config
@@ -71,6 +102,16 @@ BAD_TERMS = [
 
 USER_AGENT = "CutMySugar/1.0 (contact: you@example.com) Python requests"
 
+WIKI_API_URL = "https://en.wikipedia.org/w/api.php"
+WIKIDATA_SPARQL_URL = "https://query.wikidata.org/sparql"
+
+DEFAULT_WORKERS = 4
+DEFAULT_RATE = 5.0  # requests/s shared by all workers
+
+DEFAULT_HTTP_CACHE = "wiki_http_cache.sqlite"
+DEFAULT_CACHE_TTL_HOURS = 24 * 7
+DEFAULT_CACHE_MAX_MB = 200
+
 SESSION = requests.Session()
 SESSION.headers.update({"User-Agent": USER_AGENT})
 
@@ -79,6 +120,37 @@ SESSION.headers.update({"User-Agent": USER_AGENT})
 # Helpers
 # -----------------------------
 
+class TokenBucket:
+    """
+    Thread-safe token bucket: on average at most `rate` requests/s, bursts of up to `burst`.
+    pause() blocks every caller for a while (used by the 429/5xx backoff).
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = float(rate)
+        self.capacity = float(max(1, burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
 def norm(s: str) -> str:
     s = (s or "").lower().strip().replace("&", "and")
     s = re.sub(r"\s+", " ", s)
@@ -86,17 +158,119 @@ def norm(s: str) -> str:
     return s
 
 
-def safe_get_json(url: str, params: Dict, timeout: int = 30, max_retries: int = 7) -> Dict:
+class CacheMiss(LookupError):
+    """Raised in replay mode when a request is not in the cache."""
+
+
+class HttpCache:
+    """
+    Persistent (SQLite) cache of JSON responses keyed by URL + sorted params + Accept header.
+    Entries older than ttl_seconds are not served (and pruned on open) unless in replay mode;
+    least recently used entries are evicted once the stored bodies exceed max_bytes.
+    Safe to share between the fetch threads.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, max_bytes: int, replay: bool = False) -> None:
+        self.path = path
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_bytes = int(max_bytes)
+        self.replay = replay
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if replay and not os.path.exists(path):
+            raise FileNotFoundError(f"--replay needs an existing cache file: {path}")
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, url TEXT NOT NULL, body TEXT NOT NULL, size INTEGER NOT NULL,"
+            " fetched_at REAL NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_used)")
+        if not replay:
+            self.conn.execute("DELETE FROM responses WHERE fetched_at < ?", (time.time() - self.ttl_seconds,))
+        self._evict()
+
+    @staticmethod
+    def key(url: str, params: Dict, headers: Optional[Dict] = None) -> str:
+        accept = (headers or {}).get("Accept", "")
+        raw = json.dumps([url, sorted((str(k), str(v)) for k, v in params.items()), accept])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self.lock:
+            row = self.conn.execute("SELECT body, fetched_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and (self.replay or time.time() - row[1] <= self.ttl_seconds):
+                self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time_ns(), key))
+                self.conn.commit()
+                self.hits += 1
+                return json.loads(row[0])
+            self.misses += 1
+        if self.replay:
+            raise CacheMiss(f"not in cache {self.path}: {key}")
+        return None
+
+    def put(self, key: str, url: str, data: Dict) -> None:
+        body = json.dumps(data, ensure_ascii=False)
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, url, body, len(body.encode("utf-8")), time.time(), time.time_ns()),
+            )
+            self._evict()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _evict(self) -> None:
+        (total,) = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if total > self.max_bytes:
+            rows = self.conn.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall()
+            drop = []
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                drop.append((key,))
+                total -= size
+            self.conn.executemany("DELETE FROM responses WHERE key = ?", drop)
+        self.conn.commit()
+
+
+# Set by main() from --cache/--replay; consulted by safe_get_json.
+HTTP_CACHE: Optional[HttpCache] = None
+
+
+def safe_get_json(
+    url: str,
+    params: Dict,
+    timeout: int = 30,
+    max_retries: int = 7,
+    headers: Optional[Dict] = None,
+    limiter: Optional[TokenBucket] = None,
+) -> Dict:
     """
     Fetch JSON robustly with retries + backoff and helpful debugging.
+    With a limiter, every attempt takes a token and a backoff pauses the whole bucket.
+    With HTTP_CACHE set, cached responses are returned without touching the network.
     """
+    cache_key = None
+    if HTTP_CACHE is not None:
+        cache_key = HttpCache.key(url, params, headers)
+        cached = HTTP_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+
     for attempt in range(max_retries):
-        r = SESSION.get(url, params=params, timeout=timeout)
+        if limiter is not None:
+            limiter.acquire()
+        r = SESSION.get(url, params=params, headers=headers, timeout=timeout)
 
         # Retry on common transient / rate-limit statuses
         if r.status_code in (429, 500, 502, 503, 504):
             sleep = (2 ** attempt) + random.random()
             print(f"[retry] status={r.status_code} attempt={attempt+1}/{max_retries} sleep={sleep:.1f}s")
+            if limiter is not None:
+                limiter.pause(sleep)
             time.sleep(sleep)
             continue
 
@@ -109,7 +283,7 @@ def safe_get_json(url: str, params: Dict, timeout: int = 30, max_retries: int =
 
         # Attempt JSON parse
         try:
-            return r.json()
+            data = r.json()
         except Exception:
             # Often HTML (e.g., block page) => preview and retry
             print(f"[error] Non-JSON response url={r.url}")
@@ -117,16 +291,25 @@ def safe_get_json(url: str, params: Dict, timeout: int = 30, max_retries: int =
             print("[error] preview:", r.text[:200])
             sleep = (2 ** attempt) + random.random()
             time.sleep(sleep)
+            continue
+
+        if cache_key is not None:
+            HTTP_CACHE.put(cache_key, r.url, data)
+        return data
 
     raise RuntimeError("Failed to fetch valid JSON after retries.")
 
 
-def get_wiki_category_members(category: str, limit: int = 8000) -> List[str]:
+def get_wiki_category_members(
+    category: str,
+    limit: int = 8000,
+    url: str = WIKI_API_URL,
+    limiter: Optional[TokenBucket] = None,
+) -> List[str]:
     """
     MediaWiki API: list of page titles in a category.
-    Handles pagination (cmcontinue) and adds polite delays.
+    Handles pagination (cmcontinue) and adds polite delays (the limiter's, if given).
     """
-    url = "https://en.wikipedia.org/w/api.php"
     members: List[str] = []
     cmcontinue: Optional[str] = None
 
@@ -141,7 +324,7 @@ def get_wiki_category_members(category: str, limit: int = 8000) -> List[str]:
         if cmcontinue:
             params["cmcontinue"] = cmcontinue
 
-        data = safe_get_json(url, params=params, timeout=30, max_retries=7)
+        data = safe_get_json(url, params=params, timeout=30, max_retries=7, limiter=limiter)
 
         members += [x["title"] for x in data.get("query", {}).get("categorymembers", [])]
         cmcontinue = data.get("continue", {}).get("cmcontinue")
@@ -149,19 +332,24 @@ def get_wiki_category_members(category: str, limit: int = 8000) -> List[str]:
         if not cmcontinue or len(members) >= limit:
             break
 
-        # Polite delay to reduce throttling
-        time.sleep(0.2 + random.random() * 0.3)
+        # Polite delay to reduce throttling (not needed when replaying from the cache)
+        if limiter is None and not (HTTP_CACHE is not None and HTTP_CACHE.replay):
+            time.sleep(0.2 + random.random() * 0.3)
 
     return members[:limit]
 
 
-def wikidata_indian_dishes(limit: int = 20000) -> List[str]:
+def wikidata_indian_dishes(
+    limit: int = 20000,
+    url: str = WIKIDATA_SPARQL_URL,
+    limiter: Optional[TokenBucket] = None,
+) -> List[str]:
     """
     Wikidata SPARQL:
       - instance/subclass of dish (Q746549)
       - country of origin India (Q668) via P495
 
-    Retries on rate limiting.
+    Retries on rate limiting (same backoff as the Wikipedia calls).
     """
     sparql = f"""
     SELECT ?itemLabel WHERE {{
@@ -171,38 +359,54 @@ def wikidata_indian_dishes(limit: int = 20000) -> List[str]:
     }} LIMIT {limit}
     """
 
-    url = "https://query.wikidata.org/sparql"
-    headers = {
-        "Accept": "application/sparql-results+json",
-        "User-Agent": USER_AGENT,
-    }
-
-    for attempt in range(7):
-        r = requests.get(url, params={"query": sparql}, headers=headers, timeout=60)
-
-        if r.status_code in (429, 500, 502, 503, 504):
-            sleep = (2 ** attempt) + random.random()
-            print(f"[wikidata retry] status={r.status_code} attempt={attempt+1}/7 sleep={sleep:.1f}s")
-            time.sleep(sleep)
-            continue
-
-        if r.status_code != 200:
-            print(f"[wikidata error] status={r.status_code}")
-            print(f"[wikidata] content-type={r.headers.get('content-type')}")
-            print("[wikidata] preview:", r.text[:200])
-            r.raise_for_status()
+    headers = {"Accept": "application/sparql-results+json"}
+    data = safe_get_json(url, params={"query": sparql}, timeout=60, max_retries=7, headers=headers, limiter=limiter)
+    return [b["itemLabel"]["value"] for b in data["results"]["bindings"]]
+
+
+def fetch_sources(
+    categories: List[str],
+    wiki_limit_per_cat: int = 8000,
+    wikidata_limit: int = 20000,
+    skip_wikipedia: bool = False,
+    workers: int = DEFAULT_WORKERS,
+    rate: float = DEFAULT_RATE,
+    wiki_url: str = WIKI_API_URL,
+    wikidata_url: str = WIKIDATA_SPARQL_URL,
+) -> Tuple[List[str], List[str]]:
+    """
+    Fetch all Wikipedia categories and the Wikidata query in parallel.
 
+    Returns (wiki titles in category order, wikidata titles), the same lists the sequential
+    fetch produced. A category that fails is skipped with a warning; a Wikidata failure raises.
+    rate <= 0 disables the shared limiter (per-page polite delays are used instead).
+    """
+    workers = max(1, workers)
+    limiter = TokenBucket(rate) if rate > 0 else None
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(10, workers))
+    SESSION.mount("http://", adapter)
+    SESSION.mount("https://", adapter)
+
+    def fetch_category(c: str) -> List[str]:
+        print(f"[wiki] fetching Category:{c}")
         try:
-            data = r.json()
-        except Exception:
-            print("[wikidata] Non-JSON preview:", r.text[:200])
-            sleep = (2 ** attempt) + random.random()
-            time.sleep(sleep)
-            continue
-
-        return [b["itemLabel"]["value"] for b in data["results"]["bindings"]]
-
-    raise RuntimeError("Wikidata failed after retries.")
+            return get_wiki_category_members(c, limit=wiki_limit_per_cat, url=wiki_url, limiter=limiter)
+        except CacheMiss:
+            raise
+        except Exception as e:
+            print(f"[wiki] failed for Category:{c} error={e}")
+            print("[wiki] continuing... (you can rerun with --skip-wikipedia)")
+            return []
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        # Wikidata is the slowest single request, so start it first
+        print("[wikidata] fetching Indian-origin dishes...")
+        wd_future = ex.submit(wikidata_indian_dishes, wikidata_limit, wikidata_url, limiter)
+        wiki_futures = [] if skip_wikipedia else [ex.submit(fetch_category, c) for c in categories]
+        wiki_titles: List[str] = []
+        for fut in wiki_futures:
+            wiki_titles += fut.result()
+        return wiki_titles, wd_future.result()
 
 
 def filter_titles(titles: List[str]) -> List[str]:
@@ -223,26 +427,285 @@ def filter_titles(titles: List[str]) -> List[str]:
     return out
 
 
-def fuzzy_collapse(titles: List[str], threshold: int = 95, window: int = 400) -> List[str]:
+@dataclass
+class TitleCluster:
+    representative: str
+    members: List[str] = field(default_factory=list)  # representative first
+
+
+DEDUP_KEYS_PER_TITLE = 3  # rarest tokens used for blocking keys
+DEDUP_AFFIX_LEN = 3
+DEDUP_SCORE_BATCH = 1_000_000  # candidate pairs per cpdist call
+
+
+def _dedup_text(n: str) -> str:
+    """norm() with hyphens/parentheses as spaces, so "aloo-gobi" scores like "aloo gobi"."""
+    return " ".join(re.split(r"[\s\-\(\)]+", n)).strip()
+
+
+def _block_keys(tokens: List[List[str]], keys_per_title: int) -> List[List[str]]:
+    """
+    Multi-pass blocking keys per title, built from its keys_per_title rarest tokens: every
+    pair of them, once by 3-char prefixes and once by 3-char suffixes, so a reordering or a
+    one-character edit inside one token still shares a key. One-word titles are keyed by
+    the word's prefix and suffix. Common words ("masala", "chicken") never form blocks on
+    their own.
+    """
+    df = Counter(w for ws in tokens for w in ws)
+    keys = []
+    for ws in tokens:
+        rare = sorted(ws, key=lambda w: (df[w], w))[:keys_per_title]
+        ks = set()
+        for a, b in itertools.combinations(sorted(rare), 2):
+            ks.add(f"p:{a[:DEDUP_AFFIX_LEN]}|{b[:DEDUP_AFFIX_LEN]}")
+            ks.add(f"s:{a[-DEDUP_AFFIX_LEN:]}|{b[-DEDUP_AFFIX_LEN:]}")
+        if len(ws) == 1:
+            ks.add(f"p1:{ws[0][:DEDUP_AFFIX_LEN]}")
+            ks.add(f"s1:{ws[0][-DEDUP_AFFIX_LEN:]}")
+        keys.append(sorted(ks) or [""])
+    return keys
+
+
+def _candidate_pairs(blocks: Dict[str, List[int]], tokens: List[List[str]]) -> np.ndarray:
+    """
+    Unique (earlier, later) index pairs that share a block, plus every one-word title
+    paired with each title containing that word (token_set_ratio scores such subsets 100).
+    """
+    n = len(tokens)
+    by_size: Dict[int, List[List[int]]] = {}
+    for members in blocks.values():
+        if len(members) > 1:
+            by_size.setdefault(len(members), []).append(members)
+    codes = []
+    for size, groups in by_size.items():
+        # all blocks of one size at once: (blocks, size) members -> upper-triangle pairs
+        idx = np.asarray(groups, dtype=np.int64)
+        i, j = np.triu_indices(size, 1)
+        codes.append((idx[:, i] * n + idx[:, j]).ravel())
+    one_word = {ws[0]: i for i, ws in enumerate(tokens) if len(ws) == 1}
+    star = [
+        min(i, j) * n + max(i, j)
+        for j, ws in enumerate(tokens) if len(ws) > 1
+        for i in (one_word.get(w) for w in ws) if i is not None
+    ]
+    codes.append(np.asarray(star, dtype=np.int64))
+    codes = np.unique(np.concatenate(codes))
+    return np.stack([codes // n, codes % n], axis=1) if len(codes) else np.empty((0, 2), dtype=np.int64)
+
+
+def _score_pairs(
+    pairs: np.ndarray, texts: List[str], scorer: Callable, threshold: float, workers: int
+) -> np.ndarray:
+    """The pairs scoring >= threshold, scored in batches with one cpdist call each."""
+    keep = []
+    for start in range(0, len(pairs), DEDUP_SCORE_BATCH):
+        batch = pairs[start:start + DEDUP_SCORE_BATCH]
+        scores = process.cpdist(
+            [texts[i] for i in batch[:, 0].tolist()],
+            [texts[j] for j in batch[:, 1].tolist()],
+            scorer=scorer, score_cutoff=threshold, dtype=np.uint8, workers=workers,
+        )
+        keep.append(batch[scores > 0])
+    return np.concatenate(keep) if keep else pairs
+
+
+def dedup_clusters(
+    titles: List[str],
+    threshold: float = 95,
+    scorer: Callable = fuzz.token_set_ratio,
+    keys_per_title: int = DEDUP_KEYS_PER_TITLE,
+    workers: int = -1,
+    blocking: bool = True,
+) -> List[TitleCluster]:
     """
-    Collapse near-duplicates using token_set_ratio in a sliding window.
-    Keeps the first occurrence.
+    Cluster near-duplicate titles.
+
+    Titles are ordered by norm() and each one joins the first earlier representative it
+    scores >= threshold against, else it becomes a representative itself. That is the
+    sliding-window rule of the old fuzzy_collapse without the window, so titles that sort
+    far apart ("Aloo gobi" / "Gobi aloo") are compared too, restricted to titles sharing a
+    blocking key (blocking=False scores all pairs, for checking the blocking on samples).
+    Clusters come back in representative order.
     """
-    kept: List[str] = []
-    seen_norm: List[str] = []
+    by_norm: Dict[str, List[str]] = {}
+    for n, t in sorted((norm(t), t) for t in set(titles)):
+        by_norm.setdefault(n, []).append(t)  # identical norms are exact duplicates
+    norms = list(by_norm)
+    texts = [_dedup_text(n) for n in norms]
+    tokens = [sorted(set(t.split())) for t in texts]
+
+    blocks: Dict[str, List[int]] = {}
+    keys = _block_keys(tokens, keys_per_title) if blocking else [[""]] * len(norms)
+    for i, ks in enumerate(keys):
+        for k in ks:
+            blocks.setdefault(k, []).append(i)
+
+    matches = _score_pairs(_candidate_pairs(blocks, tokens), texts, scorer, threshold, workers)
+    earlier: List[List[int]] = [[] for _ in norms]
+    for i, j in matches.tolist():
+        earlier[j].append(i)
+
+    leader = list(range(len(norms)))
+    for j, cands in enumerate(earlier):
+        leader[j] = min((i for i in cands if leader[i] == i), default=j)
+
+    clusters: Dict[int, TitleCluster] = {}
+    for j, n in enumerate(norms):
+        lead = leader[j]
+        if lead not in clusters:
+            clusters[lead] = TitleCluster(representative=by_norm[norms[lead]][0])
+        clusters[lead].members += by_norm[n]
+    return list(clusters.values())
+
+
+def fuzzy_collapse(titles: List[str], threshold: float = 95) -> List[str]:
+    """
+    Collapse near-duplicates (token_set_ratio >= threshold); keeps each cluster's first
+    title in norm() order.
+    """
+    return [c.representative for c in dedup_clusters(titles, threshold=threshold)]
 
-    for t in sorted(set(titles), key=lambda x: norm(x)):
-        n = norm(t)
-        duplicate = False
-        # Compare against recent kept to bound runtime
-        for prev in seen_norm[-window:]:
-            if fuzz.token_set_ratio(n, prev) >= threshold:
-                duplicate = True
-                break
-        if not duplicate:
-            kept.append(t)
-            seen_norm.append(n)
-    return kept
+
+DEFAULT_MASTER_THRESHOLD = 90
+MASTER_MAX_DF = 0.02  # 3-grams in more of the master's names than this are not indexed ...
+MASTER_MIN_POSTINGS = 1000  # ... unless they are in at most this many (small masters keep every gram)
+MASTER_SHORTLIST = 10  # names per candidate passed to rapidfuzz
+MASTER_MIN_DICE = 0.3  # names sharing fewer 3-grams than this are never shortlisted
+MASTER_CHUNK_ROWS = 2048  # candidates per sparse product
+
+
+def _grams(text: str) -> Set[str]:
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def master_names(row: Dict) -> List[str]:
+    """Names a master row is known by: canonical_name, aliases_compiled and the name/aka fields of search_text."""
+    names = [str(row.get("canonical_name") or "")]
+    names += str(row.get("aliases_compiled") or "").split("|")
+    fields = str(row.get("search_text") or "").split(" | ")
+    names += [fields[0]] + [f[4:] for f in fields[1:] if f.startswith("aka ")]
+    return [n.strip() for n in names if n and n.strip() and n.strip().lower() != "nan"]
+
+
+class MasterIndex:
+    """
+    Near-duplicate lookup of candidate titles against an existing master.
+
+    Every name of every row (master_names) is normalized like the dedup (_dedup_text) and
+    broken into character 3-grams; the name x gram incidence matrix is the inverted index.
+    Grams in more than max_df of the names are left out, so a batch of candidates joins
+    only on selective grams: one sparse product per MASTER_CHUNK_ROWS candidates gives the
+    shared-gram counts, the top `shortlist` names by Dice overlap (at least MASTER_MIN_DICE)
+    go to rapidfuzz, and the best scoring name wins. Exact normalized matches always score
+    100; titles with no name above the overlap floor come back unmatched.
+    """
+
+    def __init__(self, rows: List[List[str]], labels: List[str], max_df: float = MASTER_MAX_DF,
+                 shortlist: int = MASTER_SHORTLIST) -> None:
+        self.labels = labels
+        self.shortlist = shortlist
+        self.names: List[str] = []
+        self.texts: List[str] = []
+        name_rows: List[int] = []
+        self.exact: Dict[str, int] = {}
+        for r, names in enumerate(rows):
+            seen: Set[str] = set()
+            for name in names:
+                text = _dedup_text(norm(name))
+                if text and text not in seen:
+                    seen.add(text)
+                    self.exact.setdefault(text, len(self.texts))
+                    self.names.append(name)
+                    self.texts.append(text)
+                    name_rows.append(r)
+        self.name_rows = np.asarray(name_rows, dtype=np.int64)
+
+        self.vocab: Dict[str, int] = {}
+        indptr, indices = [0], []
+        for t in self.texts:
+            indices += [self.vocab.setdefault(g, len(self.vocab)) for g in _grams(t)]
+            indptr.append(len(indices))
+        incidence = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), indices, indptr), shape=(len(self.texts), len(self.vocab))
+        )
+        df = np.asarray(incidence.sum(axis=0)).ravel()
+        keep = np.flatnonzero(df <= max(MASTER_MIN_POSTINGS, max_df * len(self.texts)))
+        self.gram_cols = np.full(len(self.vocab), -1, dtype=np.int64)
+        self.gram_cols[keep] = np.arange(len(keep))
+        self.index_t = incidence[:, keep].T.tocsr()  # grams x names: the posting lists
+        self.name_len = np.asarray(self.index_t.sum(axis=0), dtype=np.float64).ravel()  # indexed grams per name
+
+    @classmethod
+    def from_frame(cls, master: pd.DataFrame, **kwargs) -> "MasterIndex":
+        records = master.to_dict("records")
+        return cls([master_names(r) for r in records], [str(r["canonical_name"]) for r in records], **kwargs)
+
+    def _shortlist(self, texts: List[str]) -> np.ndarray:
+        """(candidate, name) pairs: the top `shortlist` names per candidate by 3-gram Dice overlap."""
+        out = []
+        for start in range(0, len(texts), MASTER_CHUNK_ROWS):
+            chunk = texts[start:start + MASTER_CHUNK_ROWS]
+            indptr, indices, lengths = [0], [], []
+            for t in chunk:
+                # dense grams are ignored on both sides; grams the master has never seen
+                # still count towards the candidate's length
+                cols = [self.gram_cols[self.vocab[g]] if g in self.vocab else -2 for g in _grams(t)]
+                lengths.append(sum(c != -1 for c in cols))
+                indices += [c for c in cols if c >= 0]
+                indptr.append(len(indices))
+            query = sparse.csr_matrix(
+                (np.ones(len(indices), dtype=np.float32), indices, indptr), shape=(len(chunk), self.index_t.shape[0])
+            )
+            shared = (query @ self.index_t).tocsr()
+            rows = np.repeat(np.arange(len(chunk)), np.diff(shared.indptr))
+            dice = 2 * shared.data / (np.asarray(lengths, dtype=np.float64)[rows] + self.name_len[shared.indices])
+            near = np.flatnonzero(dice >= MASTER_MIN_DICE)
+            rows, names, dice = rows[near], shared.indices[near], dice[near]
+            order = np.lexsort((-dice, rows))
+            # rank within each candidate's run of the (row-sorted) entries
+            starts = np.searchsorted(rows[order], rows[order], side="left")
+            top = order[np.arange(len(order)) - starts < self.shortlist]
+            out.append(np.stack([rows[top] + start, names[top]], axis=1))
+        return np.concatenate(out) if out else np.empty((0, 2), dtype=np.int64)
+
+    def match(self, titles: List[str], scorer: Callable = fuzz.token_sort_ratio, workers: int = -1) -> pd.DataFrame:
+        """
+        One row per title: title, master_row (-1 if nothing shares a selective gram),
+        master_name (that row's canonical_name), matched_name (the name or alias that
+        matched) and score (0-100).
+        """
+        texts = [_dedup_text(norm(t)) for t in titles]
+        pairs = self._shortlist(texts)
+        exact = [(i, self.exact[t]) for i, t in enumerate(texts) if t in self.exact]
+        if exact:
+            pairs = np.unique(np.concatenate([pairs, np.asarray(exact, dtype=np.int64)]), axis=0)
+        scores = np.zeros(len(pairs), dtype=np.float64)
+        for start in range(0, len(pairs), DEDUP_SCORE_BATCH):
+            batch = pairs[start:start + DEDUP_SCORE_BATCH]
+            scores[start:start + len(batch)] = process.cpdist(
+                [texts[i] for i in batch[:, 0].tolist()],
+                [self.texts[j] for j in batch[:, 1].tolist()],
+                scorer=scorer, workers=workers,
+            )
+
+        # best name per title (first in shortlist order on ties)
+        best_name = np.full(len(titles), -1, dtype=np.int64)
+        best_score = np.zeros(len(titles), dtype=np.float64)
+        order = np.lexsort((-scores, pairs[:, 0]))
+        firsts = order[np.r_[True, pairs[order[1:], 0] != pairs[order[:-1], 0]]] if len(order) else order
+        best_name[pairs[firsts, 0]] = pairs[firsts, 1]
+        best_score[pairs[firsts, 0]] = scores[firsts]
+
+        found = best_name >= 0
+        master_row = np.where(found, self.name_rows[np.maximum(best_name, 0)], -1)
+        return pd.DataFrame({
+            "title": titles,
+            "master_row": master_row,
+            "master_name": [self.labels[r] if r >= 0 else "" for r in master_row.tolist()],
+            "matched_name": [self.names[n] if n >= 0 else "" for n in best_name.tolist()],
+            "score": best_score,
+        })
 
 
 # -----------------------------
@@ -251,62 +714,98 @@ def fuzzy_collapse(titles: List[str], threshold: int = 95, window: int = 400) ->
 
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--existing-master", required=True, help="CSV with canonical_name column to exclude existing items")
+    ap.add_argument("--existing-master", required=True,
+                    help="CSV with canonical_name (and optionally aliases_compiled/search_text) to exclude existing items")
     ap.add_argument("--out", default="next2500_indian_dishes_candidates.csv", help="Output CSV path")
     ap.add_argument("--target", type=int, default=2500, help="Target number of candidates")
     ap.add_argument("--max-pool", type=int, default=3000, help="Max candidates to keep before truncating to target")
     ap.add_argument("--skip-wikipedia", action="store_true", help="Only use Wikidata (use if Wikipedia blocks you)")
     ap.add_argument("--wiki-limit-per-cat", type=int, default=8000, help="Max items per Wikipedia category")
     ap.add_argument("--wikidata-limit", type=int, default=20000, help="Max items fetched from Wikidata")
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Concurrent fetches (1 = sequential)")
+    ap.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                    help="Max requests/s across all workers (0 = no shared limit, per-page polite delays)")
+    ap.add_argument("--master-threshold", type=float, default=DEFAULT_MASTER_THRESHOLD,
+                    help="token_sort_ratio vs the closest existing name at or above which a candidate is dropped")
+    ap.add_argument("--matches-out", default=None,
+                    help="Optional CSV with every filtered title, its closest existing name and score")
+    ap.add_argument("--fuzzy-threshold", type=float, default=95,
+                    help="token_set_ratio at or above which titles are collapsed as duplicates")
+    ap.add_argument("--cache", action="store_true", help=f"Cache API responses in {DEFAULT_HTTP_CACHE}")
+    ap.add_argument("--cache-path", default=None, help="Response cache file (implies --cache)")
+    ap.add_argument("--cache-ttl-hours", type=float, default=DEFAULT_CACHE_TTL_HOURS,
+                    help="Refetch cached responses older than this")
+    ap.add_argument("--cache-max-mb", type=float, default=DEFAULT_CACHE_MAX_MB,
+                    help="Evict least recently used responses beyond this size")
+    ap.add_argument("--replay", action="store_true",
+                    help="Offline: serve every request from the cache (implies --cache; misses are errors)")
+    ap.add_argument("--wiki-api-url", default=WIKI_API_URL, help="MediaWiki API endpoint")
+    ap.add_argument("--wikidata-url", default=WIKIDATA_SPARQL_URL, help="Wikidata SPARQL endpoint")
     args = ap.parse_args()
 
     # Load existing
     master = pd.read_csv(args.existing_master)
     if "canonical_name" not in master.columns:
         raise ValueError("existing-master CSV must contain a 'canonical_name' column.")
-    existing: Set[str] = set(master["canonical_name"].astype(str).map(norm))
-
-    pool: List[str] = []
-
-    # Wikipedia
-    if not args.skip_wikipedia:
-        wiki_titles: List[str] = []
-        for c in DEFAULT_WIKI_CATEGORIES:
-            print(f"[wiki] fetching Category:{c}")
-            try:
-                wiki_titles += get_wiki_category_members(c, limit=args.wiki_limit_per_cat)
-            except Exception as e:
-                print(f"[wiki] failed for Category:{c} error={e}")
-                print("[wiki] continuing... (you can rerun with --skip-wikipedia)")
-        pool += wiki_titles
-
-    # Wikidata
-    print("[wikidata] fetching Indian-origin dishes...")
-    wd_titles = wikidata_indian_dishes(limit=args.wikidata_limit)
-    pool += wd_titles
+    t0 = time.perf_counter()
+    master_index = MasterIndex.from_frame(master)
+    print(f"[master] indexed {len(master_index.names)} names of {len(master)} rows in {time.perf_counter() - t0:.2f}s")
+
+    global HTTP_CACHE
+    if args.cache or args.cache_path or args.replay:
+        HTTP_CACHE = HttpCache(
+            args.cache_path or DEFAULT_HTTP_CACHE,
+            ttl_seconds=args.cache_ttl_hours * 3600,
+            max_bytes=int(args.cache_max_mb * 1024 * 1024),
+            replay=args.replay,
+        )
+
+    # Wikipedia + Wikidata
+    t0 = time.perf_counter()
+    wiki_titles, wd_titles = fetch_sources(
+        DEFAULT_WIKI_CATEGORIES,
+        wiki_limit_per_cat=args.wiki_limit_per_cat,
+        wikidata_limit=args.wikidata_limit,
+        skip_wikipedia=args.skip_wikipedia,
+        workers=args.workers,
+        rate=args.rate,
+        wiki_url=args.wiki_api_url,
+        wikidata_url=args.wikidata_url,
+    )
+    print(f"[fetch] {len(wiki_titles)} wiki + {len(wd_titles)} wikidata titles in {time.perf_counter() - t0:.3f}s")
+    if HTTP_CACHE is not None:
+        print(f"[cache] {HTTP_CACHE.hits} hits, {HTTP_CACHE.misses} misses ({HTTP_CACHE.path})")
+        HTTP_CACHE.close()
+    pool: List[str] = wiki_titles + wd_titles
 
     # Filter
     pool = filter_titles(pool)
 
-    # Remove exact matches vs master
-    pool2: List[str] = []
-    for t in pool:
-        if norm(t) not in existing:
-            pool2.append(t)
+    # Remove exact and near matches vs master
+    t0 = time.perf_counter()
+    matches = master_index.match(pool)
+    print(f"[master] matched {len(pool)} titles in {time.perf_counter() - t0:.2f}s")
+    if args.matches_out:
+        matches.to_csv(args.matches_out, index=False)
+    pool2 = matches.loc[matches["score"] < args.master_threshold, "title"].tolist()
+    print(f"[master] dropped {len(pool) - len(pool2)} titles already in the master")
 
     # Fuzzy collapse
-    pool3 = fuzzy_collapse(pool2, threshold=95, window=400)
+    pool3 = fuzzy_collapse(pool2, threshold=args.fuzzy_threshold)
 
     # Truncate to max_pool then target
     pool3 = pool3[: args.max_pool]
     candidates = pool3[: args.target]
 
+    closest = matches.drop_duplicates("title").set_index("title")
     out = pd.DataFrame({
         "Suggested_item": candidates,
         "Category": "",
         "Region": "",
         "Meal_occasion": "",
         "Standardization_hint": "Add cooking method and key add-ons (oil/ghee/sugar) to reduce GI/GL ambiguity.",
+        "Closest_existing": closest["master_name"].reindex(candidates).tolist(),
+        "Closest_existing_score": closest["score"].reindex(candidates).round(1).tolist(),
     })
     out.to_csv(args.out, index=False)
 
@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+"""
+GI / gl_category model trainer + applier for rows without a GI.
+
+What it does
+- Trains on master rows with a numeric gi (rows this model filled earlier are skipped):
+  1) gi regressor: TF-IDF character n-grams of the text columns (canonical_name,
+     canonical_name_original, primary_category; a candidate list's Suggested_item /
+     Category are read as the first and last of these) + log available_carbs_g -> Ridge.
+     Missing carbs are imputed with the primary_category median (global median for
+     unknown categories).
+  2) prediction intervals: 5-fold out-of-fold absolute residuals of the regressor; the
+     --coverage quantile per primary_category (global for categories with fewer than
+     MIN_CATEGORY_ROWS rows) is the interval half-width. A second out-of-fold pass with
+     carbs hidden (imputed) calibrates the wider intervals of rows without carbs.
+  3) gl_category classifier (Low/Medium/High) on the same features, for rows without
+     available_carbs_g
+
+- Applies:
+  Fills ONLY these columns (creates them if missing), on rows without a gi (all rows with
+  --overwrite):
+    - gi, gi_low, gi_high        value and --coverage interval, clipped to [0, GI_MAX]
+    - gl_median                  gi * available_carbs_g / 100 (empty without carbs)
+    - gl_category                from gl_median with the gl_derive.py thresholds, or the
+                                 classifier without carbs
+    - gi_evidence                "Tier 4 model estimate: ..." with the interval
+    - confidence_score           CONF_MAX scaled by (global interval with carbs / row
+                                 interval), clipped to the Tier 4 band (CONF_MIN..CONF_MAX)
+                                 and snapped to the confidence levels seen in training
+  Scoring is vectorized over whole frames (one sparse transform + matrix product per
+  chunk); --chunksize streams large inputs in bounded memory.
+
+Usage
+  Train:
+    python gi_model.py train --train_csv <master.csv> --model_dir <dir> [--coverage 0.8]
+
+  Apply:
+    python gi_model.py apply --in_csv <candidates.csv> --out_csv <output.csv> --model_dir <dir>
+    python gi_model.py apply --in_csv <input.csv> --out_csv <output.csv> --model_dir <dir> --chunksize 50000
+    python gi_model.py apply --in_csv <input.csv> --out_csv <output.csv> --model_dir <dir> --derive_gl
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from joblib import dump, load
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression, Ridge
+from sklearn.model_selection import KFold
+
+import gl_derive
+from serving_model import _build_text_all, _scan_csv_dtypes, _snap_to_levels
+
+# ---------------------------
+# Column names (keep exact)
+# ---------------------------
+COL_GI = "gi"
+COL_GI_LOW = "gi_low"
+COL_GI_HIGH = "gi_high"
+COL_GL = "gl_median"
+COL_GL_CATEGORY = "gl_category"
+COL_EVIDENCE = "gi_evidence"
+COL_CONF = "confidence_score"
+COL_CARBS = "available_carbs_g"
+COL_CATEGORY = "primary_category"
+
+TARGET_COLS = [COL_GI, COL_GI_LOW, COL_GI_HIGH, COL_GL, COL_GL_CATEGORY, COL_EVIDENCE, COL_CONF]
+
+# Text columns a new candidate row actually has (notes/evidence are written by curators later)
+TEXT_COL_CANDIDATES = ["canonical_name", "canonical_name_original", "primary_category"]
+
+# Candidate-list spellings (next2500_indian_dishes_candidates.csv, expanded_missing_*.csv)
+COLUMN_ALIASES = {"Suggested_item": "canonical_name", "Category": "primary_category"}
+
+GL_CATEGORIES = ["Low", "Medium", "High"]
+GI_MAX = 110.0
+
+# Model estimates sit in the band of the curated "Tier 4 heuristic estimate" rows
+CONF_MIN = 0.40
+CONF_MAX = 0.58
+MODEL_EVIDENCE_PREFIX = "Tier 4 model estimate"
+
+MIN_CATEGORY_ROWS = 30
+CARBS_LOG_SCALE = 5.0  # log1p(100 g) ~ 4.6, keeps the carbs feature on the TF-IDF scale
+
+MODEL_FILES = ["gi_text_tfidf.joblib", "gi_reg.joblib", "gl_category_clf.joblib"]
+
+
+@dataclass
+class GITrainConfig:
+    """Hyperparameters for train_models (chosen by 5-fold CV MAE on the master)."""
+
+    ngram_min: int = 3
+    ngram_max: int = 5
+    min_df: int = 2
+    max_features: int = 50000
+    gi_alpha: float = 1.0
+    clf_C: float = 4.0
+    clf_max_iter: int = 1000
+    coverage: float = 0.8
+    cv_folds: int = 5
+
+
+@dataclass
+class GIModelBundle:
+    tfidf: TfidfVectorizer
+    gi_reg: Ridge
+    gl_clf: LogisticRegression
+    carbs_fill: Dict[str, Any]  # {"by_category": {primary_category: log carbs}, "global": log carbs}
+    intervals: Dict[str, Dict[str, Any]]  # {"carbs"|"no_carbs": {"by_category": {...}, "global": half-width}}
+    coverage: float
+    allowed_conf_levels: List[float]
+    text_cols: List[str]
+    bundle_hash: str = ""
+
+
+def _text_view(df: pd.DataFrame) -> pd.DataFrame:
+    """Columns under their master names: aliases fill in only where the master name is absent."""
+    view = {c: df[c] for c in TEXT_COL_CANDIDATES + [COL_CARBS] if c in df.columns}
+    for alias, name in COLUMN_ALIASES.items():
+        if name not in view and alias in df.columns:
+            view[name] = df[alias]
+    return pd.DataFrame(view, index=df.index)
+
+
+def _require_text_cols(df: pd.DataFrame) -> List[str]:
+    text_cols = [c for c in TEXT_COL_CANDIDATES if c in df.columns]
+    if not text_cols:
+        raise ValueError(
+            f"No usable text columns found to build features. "
+            f"Expected one of: {TEXT_COL_CANDIDATES + list(COLUMN_ALIASES)}. "
+            f"Found columns: {list(df.columns)[:50]}..."
+        )
+    return text_cols
+
+
+def _carbs(view: pd.DataFrame) -> np.ndarray:
+    if COL_CARBS not in view.columns:
+        return np.full(len(view), np.nan)
+    return gl_derive.to_float(view[COL_CARBS].tolist())
+
+
+def _log_carbs(carbs: np.ndarray, categories: np.ndarray, fill: Dict[str, Any]) -> np.ndarray:
+    """log1p(carbs) / CARBS_LOG_SCALE, missing values imputed from the training medians."""
+    imputed = pd.Series(categories).map(fill["by_category"]).fillna(fill["global"]).values
+    with np.errstate(invalid="ignore"):
+        log_carbs = np.log1p(np.maximum(carbs, 0.0)) / CARBS_LOG_SCALE
+    return np.where(np.isnan(carbs), imputed, log_carbs)
+
+
+def _carbs_fill(carbs: np.ndarray, categories: np.ndarray) -> Dict[str, Any]:
+    with np.errstate(invalid="ignore"):
+        log_carbs = pd.Series(np.log1p(np.maximum(carbs, 0.0)) / CARBS_LOG_SCALE)
+    by_cat = log_carbs.groupby(categories).median().dropna()
+    return {"by_category": {str(c): float(v) for c, v in by_cat.items() if c}, "global": float(log_carbs.median())}
+
+
+def _features(tfidf: TfidfVectorizer, text_all: pd.Series, log_carbs: np.ndarray) -> sparse.csr_matrix:
+    """TF-IDF(text_all) + the (imputed) log carbs column."""
+    return sparse.hstack([tfidf.transform(text_all), sparse.csr_matrix(log_carbs.reshape(-1, 1))], format="csr")
+
+
+def _categories(view: pd.DataFrame) -> np.ndarray:
+    if COL_CATEGORY not in view.columns:
+        return np.full(len(view), "", dtype=object)
+    return view[COL_CATEGORY].fillna("").astype(str).str.strip().values
+
+
+def _gl_category(gl: np.ndarray) -> np.ndarray:
+    return np.select(
+        [gl <= gl_derive.GL_LOW_MAX, gl < gl_derive.GL_HIGH_MIN, gl >= gl_derive.GL_HIGH_MIN],
+        GL_CATEGORIES,
+        default="",
+    )
+
+
+def _training_rows(df: pd.DataFrame) -> pd.DataFrame:
+    gi = pd.to_numeric(df[COL_GI], errors="coerce") if COL_GI in df.columns else pd.Series(np.nan, index=df.index)
+    keep = gi.notna() & (gi >= 0) & (gi <= GI_MAX)
+    if COL_EVIDENCE in df.columns:
+        keep &= ~df[COL_EVIDENCE].fillna("").astype(str).str.startswith(MODEL_EVIDENCE_PREFIX)
+    out = df[keep].copy()
+    out[COL_GI] = gi[keep].astype(float)
+    return out
+
+
+def _widths(table: Dict[str, Any], categories: np.ndarray) -> np.ndarray:
+    return pd.Series(categories).map(table["by_category"]).fillna(table["global"]).values
+
+
+def _interval_widths(residuals: np.ndarray, categories: np.ndarray, coverage: float) -> Dict[str, Any]:
+    """Per-category and global `coverage` quantiles of out-of-fold absolute residuals."""
+    global_w = float(np.quantile(residuals, coverage))
+    by_cat = (
+        pd.Series(residuals)
+        .groupby(categories)
+        .agg(["size", lambda r: float(np.quantile(r, coverage))])
+    )
+    by_cat.columns = ["n", "q"]
+    return {
+        "global": global_w,
+        "by_category": {str(c): float(q) for c, (n, q) in by_cat.iterrows() if n >= MIN_CATEGORY_ROWS and c},
+    }
+
+
+def _hash_bundle(model_dir: str, meta: Dict[str, Any]) -> str:
+    h = hashlib.sha256()
+    for name in MODEL_FILES:
+        with open(os.path.join(model_dir, name), "rb") as f:
+            h.update(f.read())
+    h.update(json.dumps({k: v for k, v in meta.items() if k != "bundle_hash"}, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+def train_models(train_csv: str, model_dir: str, config: Optional[GITrainConfig] = None) -> GIModelBundle:
+    config = config or GITrainConfig()
+    t_start = time.perf_counter()
+    df = _training_rows(pd.read_csv(train_csv))
+    view = _text_view(df)
+    text_cols = _require_text_cols(view)
+    text_all = _build_text_all(view, text_cols)
+    carbs = _carbs(view)
+    categories = _categories(view)
+    y = df[COL_GI].values
+
+    def _vectorizer() -> TfidfVectorizer:
+        return TfidfVectorizer(
+            analyzer="char_wb",
+            ngram_range=(config.ngram_min, config.ngram_max),
+            min_df=config.min_df,
+            max_features=config.max_features,
+            sublinear_tf=True,
+        )
+
+    # Out-of-fold residuals calibrate the intervals (in-sample residuals are too optimistic),
+    # once as given and once with carbs hidden, as for candidate rows without them
+    oof = np.empty(len(df))
+    oof_no_carbs = np.empty(len(df))
+    no_carbs = np.full(len(df), np.nan)
+    for tr, te in KFold(n_splits=config.cv_folds, shuffle=True, random_state=42).split(text_all):
+        fill = _carbs_fill(carbs[tr], categories[tr])
+        tfidf = _vectorizer().fit(text_all.iloc[tr])
+        reg = Ridge(alpha=config.gi_alpha, random_state=42)
+        reg.fit(_features(tfidf, text_all.iloc[tr], _log_carbs(carbs[tr], categories[tr], fill)), y[tr])
+        for out, c in ((oof, carbs[te]), (oof_no_carbs, no_carbs[te])):
+            X_te = _features(tfidf, text_all.iloc[te], _log_carbs(c, categories[te], fill))
+            out[te] = np.clip(reg.predict(X_te), 0.0, GI_MAX)
+    residuals = np.abs(oof - y)
+    intervals = {
+        "carbs": _interval_widths(residuals, categories, config.coverage),
+        "no_carbs": _interval_widths(np.abs(oof_no_carbs - y), categories, config.coverage),
+    }
+
+    carbs_fill = _carbs_fill(carbs, categories)
+    tfidf = _vectorizer().fit(text_all)
+    X = _features(tfidf, text_all, _log_carbs(carbs, categories, carbs_fill))
+    gi_reg = Ridge(alpha=config.gi_alpha, random_state=42).fit(X, y)
+
+    gl_cat = df[COL_GL_CATEGORY].astype(str).str.strip().values if COL_GL_CATEGORY in df.columns else np.array([])
+    has_cat = np.isin(gl_cat, GL_CATEGORIES) if len(gl_cat) else np.zeros(len(df), dtype=bool)
+    gl_clf = LogisticRegression(C=config.clf_C, max_iter=config.clf_max_iter, solver="lbfgs")
+    gl_clf.fit(X[has_cat], gl_cat[has_cat])
+
+    conf = pd.to_numeric(df[COL_CONF], errors="coerce") if COL_CONF in df.columns else pd.Series(dtype=float)
+    levels = sorted(conf[(conf >= CONF_MIN) & (conf <= CONF_MAX)].unique().tolist())
+
+    bundle = GIModelBundle(
+        tfidf=tfidf,
+        gi_reg=gi_reg,
+        gl_clf=gl_clf,
+        carbs_fill=carbs_fill,
+        intervals=intervals,
+        coverage=config.coverage,
+        allowed_conf_levels=levels or [CONF_MIN, CONF_MAX],
+        text_cols=text_cols,
+    )
+    report = {
+        "rows": int(len(df)),
+        "cv_mae": float(residuals.mean()),
+        "cv_mae_no_carbs": float(np.abs(oof_no_carbs - y).mean()),
+        "cv_baseline_mae": float(np.abs(y - y.mean()).mean()),
+        "cv_interval_coverage": float(np.mean(residuals <= _widths(intervals["carbs"], categories))),
+        "gl_category_rows": int(has_cat.sum()),
+        "seconds": time.perf_counter() - t_start,
+    }
+    _save_bundle(bundle, model_dir, {"train_config": asdict(config), "train_report": report})
+    print(
+        f"[train] {report['rows']} rows; CV MAE {report['cv_mae']:.2f}, {report['cv_mae_no_carbs']:.2f} without "
+        f"carbs (mean-GI baseline {report['cv_baseline_mae']:.2f}); {config.coverage:.0%} interval covers "
+        f"{report['cv_interval_coverage']:.3f} out of fold; {report['seconds']:.1f}s"
+    )
+    return bundle
+
+
+def _save_bundle(bundle: GIModelBundle, model_dir: str, extra_meta: Dict[str, Any]) -> None:
+    os.makedirs(model_dir, exist_ok=True)
+    dump(bundle.tfidf, os.path.join(model_dir, "gi_text_tfidf.joblib"))
+    dump(bundle.gi_reg, os.path.join(model_dir, "gi_reg.joblib"))
+    dump(bundle.gl_clf, os.path.join(model_dir, "gl_category_clf.joblib"))
+    meta = {
+        "carbs_fill": bundle.carbs_fill,
+        "intervals": bundle.intervals,
+        "coverage": bundle.coverage,
+        "allowed_conf_levels": bundle.allowed_conf_levels,
+        "text_cols_used": bundle.text_cols,
+        "target_cols": TARGET_COLS,
+        **extra_meta,
+    }
+    # round-trip through JSON so the hash matches what load_models sees
+    bundle.bundle_hash = _hash_bundle(model_dir, json.loads(json.dumps(meta)))
+    meta["bundle_hash"] = bundle.bundle_hash
+    with open(os.path.join(model_dir, "metadata.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+
+def load_models(model_dir: str) -> GIModelBundle:
+    with open(os.path.join(model_dir, "metadata.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return GIModelBundle(
+        tfidf=load(os.path.join(model_dir, "gi_text_tfidf.joblib")),
+        gi_reg=load(os.path.join(model_dir, "gi_reg.joblib")),
+        gl_clf=load(os.path.join(model_dir, "gl_category_clf.joblib")),
+        carbs_fill=meta["carbs_fill"],
+        intervals=meta["intervals"],
+        coverage=meta["coverage"],
+        allowed_conf_levels=meta["allowed_conf_levels"],
+        text_cols=meta["text_cols_used"],
+        bundle_hash=meta.get("bundle_hash") or _hash_bundle(model_dir, meta),
+    )
+
+
+def predict_gi(bundle: GIModelBundle, df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Score every row of df and return the target columns, ready to write back.
+    Rows are scored independently, so results do not depend on how rows are batched.
+    """
+    view = _text_view(df)
+    text_all = _build_text_all(view, [c for c in bundle.text_cols if c in view.columns])
+    carbs = _carbs(view)
+    cats = _categories(view)
+    X = _features(bundle.tfidf, text_all, _log_carbs(carbs, cats, bundle.carbs_fill))
+
+    gi = np.clip(bundle.gi_reg.predict(X), 0.0, GI_MAX)
+    no_carbs = np.isnan(carbs)
+    width = np.where(no_carbs, _widths(bundle.intervals["no_carbs"], cats), _widths(bundle.intervals["carbs"], cats))
+    gi_low = np.clip(gi - width, 0.0, GI_MAX)
+    gi_high = np.clip(gi + width, 0.0, GI_MAX)
+
+    # gl_category from GL per 100 g where carbs are known (as in the master), else the classifier
+    gl = np.round(np.round(gi) * carbs / 100.0, 2)
+    gl_cat = _gl_category(gl).astype(object)
+    if no_carbs.any():
+        gl_cat[no_carbs] = bundle.gl_clf.predict(X[no_carbs])
+
+    # narrower interval than the global one -> higher confidence, within the Tier 4 band
+    conf = CONF_MAX * np.minimum(1.0, bundle.intervals["carbs"]["global"] / np.maximum(width, 1e-9))
+    conf = _snap_to_levels(np.clip(conf, CONF_MIN, CONF_MAX), bundle.allowed_conf_levels)
+
+    gi_r, lo_r, hi_r = (pd.Series(np.round(v).astype(int)).astype(str) for v in (gi, gi_low, gi_high))
+    evidence = (
+        f"{MODEL_EVIDENCE_PREFIX}: GI predicted by gi_model.py from name/category/carbs; "
+        f"{bundle.coverage:.0%} interval " + lo_r + "-" + hi_r + " (GI " + gi_r + ")"
+    ).values
+
+    return {
+        COL_GI: np.round(gi, 0),
+        COL_GI_LOW: np.round(gi_low, 0),
+        COL_GI_HIGH: np.round(gi_high, 0),
+        COL_GL: gl,
+        COL_GL_CATEGORY: gl_cat,
+        COL_EVIDENCE: evidence,
+        COL_CONF: conf.astype(float),
+    }
+
+
+def _ensure_target_columns(df: pd.DataFrame) -> pd.DataFrame:
+    for c in TARGET_COLS:
+        if c not in df.columns:
+            df[c] = np.nan
+    for c in (COL_GL_CATEGORY, COL_EVIDENCE, COL_CONF):
+        df[c] = df[c].astype(object)
+    return df
+
+
+def _fill_frame(df: pd.DataFrame, bundle: GIModelBundle, overwrite: bool, stats: Dict[str, float]) -> pd.DataFrame:
+    # Only fill rows without a numeric gi (unless overwrite).
+    if overwrite:
+        mask = np.ones(len(df), dtype=bool)
+    else:
+        mask = pd.to_numeric(df[COL_GI], errors="coerce").isna().values
+    if mask.sum() == 0:
+        return df
+
+    t0 = time.perf_counter()
+    preds = predict_gi(bundle, df.loc[mask])
+    stats["seconds"] += time.perf_counter() - t0
+    stats["rows"] += int(mask.sum())
+
+    # Write back ONLY target cols
+    for col, values in preds.items():
+        df.loc[mask, col] = values
+    return df
+
+
+def apply_models(
+    in_csv: str,
+    out_csv: str,
+    model_dir: str,
+    overwrite: bool = False,
+    chunksize: Optional[int] = None,
+    derive_gl: bool = False,
+) -> None:
+    bundle = load_models(model_dir)
+    stats = {"rows": 0, "seconds": 0.0}
+    if chunksize:
+        # Stream bounded chunks, appending to out_csv as we go.
+        dtypes = _scan_csv_dtypes(in_csv, chunksize)
+        first = True
+        for chunk in pd.read_csv(in_csv, chunksize=chunksize, dtype=dtypes):
+            _require_text_cols(_text_view(chunk))
+            chunk = _fill_frame(_ensure_target_columns(chunk), bundle, overwrite, stats)
+            if derive_gl:
+                chunk = gl_derive.derive_frame(chunk)
+            chunk.to_csv(out_csv, index=False, mode="w" if first else "a", header=first)
+            first = False
+        if first:
+            # Header-only input: still write the (header-only) output.
+            df = _ensure_target_columns(pd.read_csv(in_csv, nrows=0))
+            _require_text_cols(_text_view(df))
+            if derive_gl:
+                df = gl_derive.derive_frame(df)
+            df.to_csv(out_csv, index=False)
+    else:
+        df = _ensure_target_columns(pd.read_csv(in_csv))
+        _require_text_cols(_text_view(df))
+        df = _fill_frame(df, bundle, overwrite, stats)
+        if derive_gl:
+            # per-serving carbs/GL from the (possibly new) gi
+            df = gl_derive.derive_frame(df)
+        df.to_csv(out_csv, index=False)
+
+    if stats["rows"]:
+        print(
+            f"[apply] predicted {stats['rows']} rows in {stats['seconds']:.2f}s "
+            f"({stats['rows'] / max(stats['seconds'], 1e-9):,.0f} rows/s)"
+        )
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Train/apply GI and gl_category models.")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    p_train = sub.add_parser("train", help="Train models from a master CSV with gi values.")
+    p_train.add_argument("--train_csv", required=True, help="Path to training CSV (master sheet).")
+    p_train.add_argument("--model_dir", required=True, help="Directory to write trained models + metadata.")
+    p_train.add_argument(
+        "--coverage",
+        type=float,
+        default=GITrainConfig.coverage,
+        help="Target coverage of the gi_low..gi_high interval (out-of-fold calibrated).",
+    )
+
+    p_apply = sub.add_parser("apply", help="Apply models to a CSV, filling only GI columns.")
+    p_apply.add_argument("--in_csv", required=True, help="Input CSV to fill.")
+    p_apply.add_argument("--out_csv", required=True, help="Output CSV to write.")
+    p_apply.add_argument("--model_dir", required=True, help="Directory containing trained models + metadata.")
+    p_apply.add_argument("--overwrite", action="store_true", help="Predict every row, not only rows without gi.")
+    p_apply.add_argument(
+        "--chunksize",
+        type=int,
+        default=None,
+        help="Stream the input in chunks of N rows (bounded memory) instead of loading it whole.",
+    )
+    p_apply.add_argument(
+        "--derive_gl",
+        action="store_true",
+        help="Append per-100g/per-serving carbs, GL and gl_category recomputed from the filled gi (gl_derive.py).",
+    )
+    return p
+
+
+def main() -> None:
+    args = _build_arg_parser().parse_args()
+
+    if args.cmd == "train":
+        train_models(args.train_csv, args.model_dir, GITrainConfig(coverage=args.coverage))
+        print(f"✅ Trained GI models saved to: {args.model_dir}")
+    elif args.cmd == "apply":
+        apply_models(
+            args.in_csv,
+            args.out_csv,
+            args.model_dir,
+            overwrite=bool(args.overwrite),
+            chunksize=args.chunksize,
+            derive_gl=args.derive_gl,
+        )
+        print(f"✅ Wrote filled CSV to: {args.out_csv}")
+    else:
+        raise RuntimeError("Unknown command")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Vectorized GL recomputation and per-serving derivation (NumPy).
+
+What it does
+- Derives for a whole table in one pass over float arrays (NaN = missing):
+    * available_carbs_per_100g    available_carbs_g, or gl_median * 100 / gi when carbs are
+                                  missing and gi > 0 (the migrate_csv fallback)
+    * gl_per_100g                 gi * carbs / 100
+    * available_carbs_per_serving_{min_g,g,max_g}   carbs * serving size / 100
+    * gl_per_serving_{min,g,max}  gi * carbs per serving / 100
+    * gl_category_derived         from gl_per_serving_g: Low <= 10 < Medium < 20 <= High
+                                  ("" when it cannot be computed)
+    * derive_flags                bitmask, see FLAG_* below
+- Any missing input makes the values that depend on it NaN. Nothing is imputed except the
+  carbs-from-GL fallback, and that is flagged.
+- Callable from migrate_csv (--derive writes <dest>.derived.csv) and from
+  `serving_model.py apply --derive_gl` (appends the columns to the filled CSV).
+
+Usage
+  python gl_derive.py derive --in_csv <master.csv> --out_csv <derived.csv>
+  python gl_derive.py bench --rows 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+GL_LOW_MAX = 10.0
+GL_HIGH_MIN = 20.0
+
+FLAG_MISSING_GI = 1
+FLAG_MISSING_CARBS = 2
+FLAG_MISSING_SERVING = 4
+FLAG_GI_ZERO_WITH_CARBS = 8
+FLAG_CARBS_FROM_GL = 16
+FLAG_SERVING_ORDER = 32  # not min <= g <= max
+
+DERIVED_COLUMNS = [
+    "available_carbs_per_100g",
+    "gl_per_100g",
+    "available_carbs_per_serving_min_g",
+    "available_carbs_per_serving_g",
+    "available_carbs_per_serving_max_g",
+    "gl_per_serving_min",
+    "gl_per_serving_g",
+    "gl_per_serving_max",
+    "gl_category_derived",
+    "derive_flags",
+]
+
+# Input names in the app schema first, then the master/serving_model spellings
+INPUT_COLUMNS = {
+    "gi": ["gi"],
+    "gl_median": ["gl_median"],
+    "carbs": ["available_carbs_g"],
+    "size_min": ["serving_size_min_g", "Serving size min ", "Serving size min"],
+    "size_g": ["serving_size_g", "Serving size G"],
+    "size_max": ["serving_size_max_g", "Serving Size Max"],
+}
+
+# Output rounding used when writing CSVs (the hand-made GLenforced files used the same)
+CSV_DECIMALS = {"available_carbs": 2, "gl_": 4}
+
+
+def derive(
+    gi: np.ndarray,
+    carbs: np.ndarray,
+    size_min: np.ndarray,
+    size_g: np.ndarray,
+    size_max: np.ndarray,
+    gl_median: Optional[np.ndarray] = None,
+) -> Dict[str, np.ndarray]:
+    """All DERIVED_COLUMNS from equal-length float arrays."""
+    gi = np.asarray(gi, dtype=float)
+    carbs = np.asarray(carbs, dtype=float)
+    sizes = [np.asarray(s, dtype=float) for s in (size_min, size_g, size_max)]
+    flags = np.zeros(gi.shape, dtype=np.int64)
+
+    carbs_100 = carbs.copy()
+    if gl_median is not None:
+        gl_median = np.asarray(gl_median, dtype=float)
+        fill = np.isnan(carbs) & ~np.isnan(gl_median) & (gi > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            carbs_100[fill] = gl_median[fill] * 100.0 / gi[fill]
+        flags[fill] |= FLAG_CARBS_FROM_GL
+
+    flags[np.isnan(gi)] |= FLAG_MISSING_GI
+    flags[np.isnan(carbs_100)] |= FLAG_MISSING_CARBS
+    flags[np.isnan(sizes[1])] |= FLAG_MISSING_SERVING
+    flags[(gi == 0) & (carbs_100 > 0)] |= FLAG_GI_ZERO_WITH_CARBS
+    flags[(sizes[0] > sizes[1]) | (sizes[1] > sizes[2])] |= FLAG_SERVING_ORDER
+
+    gl_100 = gi * carbs_100 / 100.0
+    out: Dict[str, np.ndarray] = {
+        "available_carbs_per_100g": carbs_100,
+        "gl_per_100g": gl_100,
+    }
+    for name, size in zip(("min_g", "g", "max_g"), sizes):
+        out[f"available_carbs_per_serving_{name}"] = carbs_100 * size / 100.0
+    for name, size in zip(("min", "g", "max"), sizes):
+        out[f"gl_per_serving_{name}"] = gl_100 * size / 100.0
+
+    gl_serving = out["gl_per_serving_g"]
+    out["gl_category_derived"] = np.select(
+        [gl_serving <= GL_LOW_MAX, gl_serving < GL_HIGH_MIN, gl_serving >= GL_HIGH_MIN],
+        ["Low", "Medium", "High"],
+        default="",
+    )
+    out["derive_flags"] = flags
+    return out
+
+
+def to_float(values: Sequence[Any]) -> np.ndarray:
+    """Float array with NaN for empty or non-numeric cells."""
+    try:
+        return np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        pass
+    out = np.full(len(values), np.nan)
+    for i, v in enumerate(values):
+        try:
+            out[i] = float(v)
+        except (TypeError, ValueError):
+            pass
+    return out
+
+
+def _pick(columns: Sequence[str], key: str) -> Optional[str]:
+    return next((c for c in INPUT_COLUMNS[key] if c in columns), None)
+
+
+def derive_columns(columns: Dict[str, Sequence[Any]], n: int) -> Dict[str, np.ndarray]:
+    """derive() over a {column name: values} table, matching inputs through INPUT_COLUMNS."""
+    arrays = {}
+    for key in INPUT_COLUMNS:
+        name = _pick(list(columns), key)
+        arrays[key] = to_float(columns[name]) if name is not None else np.full(n, np.nan)
+    return derive(arrays["gi"], arrays["carbs"], arrays["size_min"], arrays["size_g"], arrays["size_max"],
+                  gl_median=arrays["gl_median"])
+
+
+def derive_frame(df):
+    """Copy of a pandas DataFrame with DERIVED_COLUMNS appended (replaced if present)."""
+    needed = [c for key in INPUT_COLUMNS for c in INPUT_COLUMNS[key] if c in df.columns]
+    derived = derive_columns({c: df[c].to_numpy() for c in needed}, len(df))
+    out = df.copy()
+    for c in DERIVED_COLUMNS:
+        out[c] = derived[c]
+    return out
+
+
+def _rounded(name: str, values: np.ndarray) -> np.ndarray:
+    for prefix, decimals in CSV_DECIMALS.items():
+        if name.startswith(prefix):
+            return np.round(values, decimals)
+    return values
+
+
+def _cells(name: str, values: np.ndarray) -> List[Any]:
+    if values.dtype.kind == "f":
+        return ["" if np.isnan(v) else v for v in _rounded(name, values).tolist()]
+    return values.tolist()
+
+
+def write_derived(in_csv: str, out_csv: str, key: str = "food_id") -> int:
+    """<key> plus DERIVED_COLUMNS for every row of in_csv. Returns the row count."""
+    with open(in_csv, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = [r for r in reader if r]
+    wanted = {key} | {c for cols in INPUT_COLUMNS.values() for c in cols}
+    columns = {h: [r[j] if j < len(r) else "" for r in rows] for j, h in enumerate(header) if h in wanted}
+    derived = derive_columns(columns, len(rows))
+
+    out_cols = ([key] if key in columns else []) + DERIVED_COLUMNS
+    cells = [columns[key]] if key in columns else []
+    cells += [_cells(c, derived[c]) for c in DERIVED_COLUMNS]
+    tmp_path = out_csv + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(out_cols)
+        writer.writerows(zip(*cells))
+    os.replace(tmp_path, out_csv)
+    return len(rows)
+
+
+def bench(n_rows: int, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    gi = rng.uniform(0, 100, n_rows)
+    carbs = rng.uniform(0, 80, n_rows)
+    size_g = rng.uniform(20, 400, n_rows)
+    size_min = size_g * rng.uniform(0.6, 1.0, n_rows)
+    size_max = size_g * rng.uniform(1.0, 1.5, n_rows)
+    gl = gi * carbs / 100
+    for a, frac in ((gi, 0.01), (carbs, 0.02), (size_g, 0.01)):
+        a[rng.random(n_rows) < frac] = np.nan
+
+    derive(gi[:1000], carbs[:1000], size_min[:1000], size_g[:1000], size_max[:1000], gl_median=gl[:1000])
+    t0 = time.perf_counter()
+    out = derive(gi, carbs, size_min, size_g, size_max, gl_median=gl)
+    seconds = time.perf_counter() - t0
+    flagged = int((out["derive_flags"] != 0).sum())
+    print(f"derived {n_rows} rows in {seconds * 1e3:.1f} ms ({n_rows / seconds:,.0f} rows/s); {flagged} rows flagged")
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Recompute carbs/GL per 100 g and per serving for a master table.")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    d = sub.add_parser("derive", help="Write the input CSV with the derived columns appended.")
+    d.add_argument("--in_csv", required=True, help="Master CSV (app or master schema).")
+    d.add_argument("--out_csv", required=True, help="Output CSV.")
+
+    b = sub.add_parser("bench", help="Time derive() on synthetic arrays.")
+    b.add_argument("--rows", type=int, default=1000000, help="Number of rows.")
+    return p
+
+
+def main() -> None:
+    args = _build_arg_parser().parse_args()
+    if args.cmd == "derive":
+        import pandas as pd
+
+        df = derive_frame(pd.read_csv(args.in_csv))
+        df.to_csv(args.out_csv, index=False)
+        print(f"Wrote {len(df)} rows with derived GL columns to: {args.out_csv}")
+    else:
+        bench(args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Config-driven multi-source merge into the app's gi_gl_master.csv schema.
+
+What it does
+- Reads several source CSVs (the Database/*.csv generations), each with its own header map,
+  and merges them by food_id in one streaming k-way pass:
+    1. each source is mapped to DEST_HEADERS and externally sorted by food_id (sorted runs
+       of --chunk_rows rows in a temp dir, so memory stays bounded)
+    2. heapq.merge walks all sorted sources together; all rows of one food_id arrive
+       together and are combined field by field
+    3. merged rows are written in the configured order, through the same writer as the
+       single-source migration (incremental manifest/delta and sidecar assets included)
+- Precedence: sources are listed highest-precedence first. A field takes the value from
+  the first source that has a non-empty value for it. "field_precedence" can reorder
+  sources per destination column. Within one source the first row of a food_id wins, as
+  in the single-source migration.
+
+Config (JSON; relative paths resolve against the config file)
+  {
+    "dest": "../src/assets/data/gi_gl_master.csv",
+    "order": "source",            # "source": order of the first listed source that has the row
+                                  # (the single-source migration order), "food_id": sorted
+    "chunk_rows": 200000,
+    "sources": [
+      {"name": "master", "path": "../Database/Gi_gl_master_Final_with_search_text.csv"},
+      {"name": "servings", "path": "../Database/gi_gl_master_FINAL_servings_with_type_v2.csv",
+       "fields": ["serving_type", "serving_size_g"],     # columns it may contribute (default: all)
+       "adds_rows": false,                                # only fills rows other sources have
+       "header_map": {"serving_size_g": "serving_size_g"},# source -> destination header
+       "fix_shifted_rows": true}
+    ],
+    "field_precedence": {"serving_type": ["servings", "master"]}
+  }
+  Without "header_map" a source uses HEADER_MAPPING plus destination column names as-is.
+
+Usage
+  python migrate_csv.py merge --config migrate_config.json [--incremental]
+"""
+
+from __future__ import annotations
+
+import csv
+import heapq
+import itertools
+import json
+import os
+import tempfile
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from migrate_csv import DEST_HEADERS, HEADER_MAPPING, _fix_shifted_row, _last_index, find_column
+
+DEFAULT_CHUNK_ROWS = 200000
+_I_ID = DEST_HEADERS.index("food_id")
+
+
+def load_config(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    root = os.path.dirname(os.path.abspath(path))
+
+    def resolve(p: str) -> str:
+        return os.path.normpath(os.path.join(root, p))
+
+    if not config.get("sources"):
+        raise ValueError(f"No sources in {path}")
+    names = set()
+    for i, src in enumerate(config["sources"]):
+        src.setdefault("name", f"source{i}")
+        if src["name"] in names:
+            raise ValueError(f"Duplicate source name: {src['name']}")
+        names.add(src["name"])
+        src["path"] = resolve(src["path"])
+        unknown = set(src.get("fields", [])) - set(DEST_HEADERS)
+        if unknown:
+            raise ValueError(f"Unknown fields for source {src['name']}: {sorted(unknown)}")
+    for col, order in config.get("field_precedence", {}).items():
+        if col not in DEST_HEADERS or set(order) - names:
+            raise ValueError(f"Bad field_precedence entry: {col} -> {order}")
+    if config.get("order", "source") not in ("source", "food_id"):
+        raise ValueError(f"Unknown order: {config['order']}")
+    if "dest" in config:
+        config["dest"] = resolve(config["dest"])
+    return config
+
+
+def resolve_header_map(source_headers: List[str], header_map: Optional[Dict[str, str]]) -> List[Optional[int]]:
+    """Source column index per DEST_HEADERS entry (None if the source lacks it)."""
+    if header_map is None:
+        header_map = {**HEADER_MAPPING, **{d: d for d in DEST_HEADERS if d not in HEADER_MAPPING}}
+    last_index = _last_index(source_headers)
+    indexes: List[Optional[int]] = []
+    for dest in DEST_HEADERS:
+        candidates = [src for src, d in header_map.items() if d == dest]
+        indexes.append(next((i for i in (find_column(last_index, c) for c in candidates) if i is not None), None))
+    return indexes
+
+
+def _source_records(src: Dict[str, Any], rank: int, stats: Dict[str, int]) -> Iterator[list]:
+    """[food_id, rank, seq, values] per source row; values is None for columns the source does not provide."""
+    with open(src["path"], "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            print(f"Warning: empty source {src['path']}")
+            return
+        indexes = resolve_header_map(header, src.get("header_map"))
+        fields = set(src.get("fields", DEST_HEADERS))
+        provided = [j is not None and d in fields for j, d in zip(indexes, DEST_HEADERS)]
+        if indexes[_I_ID] is None:
+            raise ValueError(f"Source {src['name']} has no food_id column")
+        missing = [d for d, j in zip(DEST_HEADERS, indexes) if j is None and d in fields]
+        if missing and "fields" in src:
+            print(f"Warning: {src['name']}: columns not found: {missing}")
+
+        fix = src.get("fix_shifted_rows", True)
+        for seq, row in enumerate(reader):
+            if not row:
+                continue
+            n = len(row)
+            values = [(row[j] if j < n else None) if j is not None else "" for j in indexes]
+            if fix:
+                values = _fix_shifted_row(values)
+            f_id = values[_I_ID]
+            if not f_id:
+                stats["skipped_no_id"] += 1
+                continue
+            yield [f_id, rank, seq, [
+                ("" if v is None else str(v)) if ok else None for v, ok in zip(values, provided)
+            ]]
+
+
+def external_sort(records: Iterable[Any], key: Callable[[Any], Any], chunk_rows: int, tmpdir: str) -> Iterator[Any]:
+    """Sort JSON-serializable records with at most chunk_rows of them in memory (sorted runs + heapq.merge)."""
+    runs: List[str] = []
+    chunk: List[Any] = []
+
+    def flush() -> None:
+        chunk.sort(key=key)
+        fd, path = tempfile.mkstemp(suffix=".jsonl", dir=tmpdir)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for r in chunk:
+                f.write(json.dumps(r, ensure_ascii=False))
+                f.write("\n")
+        runs.append(path)
+        chunk.clear()
+
+    for r in records:
+        chunk.append(r)
+        if len(chunk) >= chunk_rows:
+            flush()
+    if not runs:
+        chunk.sort(key=key)
+        yield from chunk
+        return
+    if chunk:
+        flush()
+
+    def read_run(path: str) -> Iterator[Any]:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    yield from heapq.merge(*(read_run(p) for p in runs), key=key)
+
+
+def _combine(group: List[list], precedence: List[List[int]], adds_rows: List[bool]) -> Optional[list]:
+    """Merge one food_id's records into [order_key, values]; None if no row-adding source has it."""
+    by_rank: Dict[int, list] = {}
+    for rec in group:
+        by_rank.setdefault(rec[1], rec)  # first row of a food_id per source wins
+    adders = [r for r in sorted(by_rank) if adds_rows[r]]
+    if not adders:
+        return None
+    first = by_rank[adders[0]]
+    values = []
+    for j, ranks in enumerate(precedence):
+        v = ""
+        for r in ranks:
+            rec = by_rank.get(r)
+            if rec is not None and rec[3][j]:
+                v = rec[3][j]
+                break
+        values.append(v)
+    return [[first[1], first[2]], values]
+
+
+def merge_rows(config: Dict[str, Any], stats: Dict[str, int], tmpdir: str) -> Iterator[list]:
+    """Merged destination rows (lists in DEST_HEADERS order), streamed in the configured order."""
+    sources = config["sources"]
+    chunk_rows = int(config.get("chunk_rows", DEFAULT_CHUNK_ROWS))
+    names = [s["name"] for s in sources]
+    field_precedence = config.get("field_precedence", {})
+    precedence = []
+    for col in DEST_HEADERS:
+        first = [names.index(n) for n in field_precedence.get(col, [])]
+        precedence.append(first + [r for r in range(len(sources)) if r not in first])
+    adds_rows = [s.get("adds_rows", True) for s in sources]
+
+    stats.setdefault("skipped_no_id", 0)
+    record_key = lambda r: (r[0], r[1], r[2])  # noqa: E731
+    sorted_sources = [
+        external_sort(_source_records(s, rank, stats), record_key, chunk_rows, tmpdir) for rank, s in enumerate(sources)
+    ]
+    merged = heapq.merge(*sorted_sources, key=record_key)
+
+    def combined() -> Iterator[list]:
+        for _, group in itertools.groupby(merged, key=lambda r: r[0]):
+            out = _combine(list(group), precedence, adds_rows)
+            if out is not None:
+                yield out
+
+    rows: Iterable[list] = combined()
+    if config.get("order", "source") == "source":
+        rows = external_sort(rows, lambda r: r[0], chunk_rows, tmpdir)
+    for _, values in rows:
+        stats["rows"] += 1
+        yield values
+
+
+def merge_sources(config_path: str, dest_path: Optional[str] = None, write_assets: bool = True,
+                  incremental: bool = False, derive: bool = False) -> None:
+    from migrate_csv import write_destination
+
+    config = load_config(config_path)
+    dest_path = dest_path or config.get("dest")
+    if not dest_path:
+        raise ValueError("No destination: pass --dest or set \"dest\" in the config")
+    for s in config["sources"]:
+        print(f"Source {s['name']}: {s['path']}")
+        if not os.path.exists(s["path"]):
+            raise FileNotFoundError(f"Source file not found: {s['path']}")
+
+    stats = {"rows": 0, "skipped_no_id": 0}
+    with tempfile.TemporaryDirectory(prefix="migrate_merge_") as tmpdir:
+        write_destination(merge_rows(config, stats, tmpdir), dest_path, stats, write_assets, incremental, derive)
+    if stats["skipped_no_id"]:
+        print(f"Skipped {stats['skipped_no_id']} source rows without a food_id.")
+    print("Merge complete.")
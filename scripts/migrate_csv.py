@@ -1,8 +1,16 @@
+import argparse
+import contextlib
 import csv
+import hashlib
+import json
 import os
 
-SOURCE_PATH = "/Users/ritwikmac/Cutmysugar/Database/Gi_gl_master_Final_with_search_text.csv"
-DEST_PATH = "/Users/ritwikmac/Cutmysugar/src/assets/data/gi_gl_master.csv"
+import food_db_asset
+import food_search_index
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_PATH = os.path.join(REPO_ROOT, "Database", "Gi_gl_master_Final_with_search_text.csv")
+DEST_PATH = os.path.join(REPO_ROOT, "src", "assets", "data", "gi_gl_master.csv")
 
 # Mapping from Source Header -> Destination Header
 # Note: Source headers must match EXACTLY (keys are case sensitive and space sensitive)
@@ -29,94 +37,329 @@ HEADER_MAPPING = {
     "search_text": "search_text"
 }
 
-def migrate_csv():
-    print(f"Reading from: {SOURCE_PATH}")
-    
-    if not os.path.exists(SOURCE_PATH):
-        print(f"Error: Source file not found at {SOURCE_PATH}")
+DEST_HEADERS = list(HEADER_MAPPING.values())
+
+# Positions in the destination row used by the shifted-row patch
+_I_NAME = DEST_HEADERS.index("canonical_name")
+_I_GI = DEST_HEADERS.index("gi")
+_I_GL_MEDIAN = DEST_HEADERS.index("gl_median")
+_I_GL_CATEGORY = DEST_HEADERS.index("gl_category")
+_I_CONFIDENCE = DEST_HEADERS.index("confidence_score")
+_I_CARBS = DEST_HEADERS.index("available_carbs_g")
+
+
+def _last_index(source_headers):
+    # csv.DictReader keeps the value of the last column when a header repeats
+    return {name: idx for idx, name in enumerate(source_headers)}
+
+
+def resolve_columns(source_headers):
+    """
+    Source column index for each HEADER_MAPPING entry (None if missing), resolved once from the header.
+    Same lookup csv.DictReader rows gave: an exact header wins, else the first header equal after strip();
+    with duplicate headers the last column of that name holds the value.
+    """
+    last_index = _last_index(source_headers)
+    indexes = []
+    for src_key in HEADER_MAPPING:
+        match = find_column(last_index, src_key)
+        if match is None:
+            print(f"Warning: Column '{src_key}' not found in source header.")
+        indexes.append(match)
+    return indexes
+
+
+def find_column(last_index, src_key):
+    """Index of src_key in a header (see _last_index), or None."""
+    if src_key in last_index:
+        return last_index[src_key]
+    # Handle slightly messy CSV headers if exact match check failed
+    return next((last_index[k] for k in last_index if k.strip() == src_key.strip()), None)
+
+
+def _fix_shifted_row(new_row):
+    # --- PATCH: Fix shifted rows (e.g., Masala omelette) ---
+    # Issue: gl_category contains a number (8.28), actual category (Low) is in confidence_score
+    gl_cat = new_row[_I_GL_CATEGORY]
+    if gl_cat and gl_cat.replace('.', '', 1).isdigit() and "Low" not in gl_cat and "Medium" not in gl_cat and "High" not in gl_cat:
+        # Detected corrupted row
+        print(f"Fixing corrupted row: {new_row[_I_NAME]} (gl_category='{gl_cat}')")
+
+        # Shift values
+        new_row[_I_GL_CATEGORY] = new_row[_I_CONFIDENCE]  # e.g., "Low"
+        new_row[_I_CONFIDENCE] = new_row[_I_CARBS]  # e.g., "0.45"
+
+        # Recalculate missing carbs: (GL * 100) / GI
+        try:
+            gl_median = float(new_row[_I_GL_MEDIAN])
+            gi = float(new_row[_I_GI])
+            if gi > 0:
+                recalc_carbs = (gl_median * 100) / gi
+                new_row[_I_CARBS] = round(recalc_carbs, 2)
+                print(f"  -> Recalculated carbs: {new_row[_I_CARBS]}g")
+            else:
+                new_row[_I_CARBS] = 0
+        except Exception as e:
+            print(f"  -> Failed to recalculate carbs: {e}")
+    # -------------------------------------------------------
+    return new_row
+
+
+def migrate_rows(reader, source_headers, stats):
+    """
+    Yield destination rows (lists in DEST_HEADERS order) from a csv.reader positioned after the header.
+    Rows are deduplicated by food_id (first wins); stats["rows"] counts what was yielded.
+    """
+    indexes = resolve_columns(source_headers)
+    id_index = _last_index(source_headers).get("food_id")
+
+    seen_ids = set()
+    for row in reader:
+        if not row:
+            continue  # blank line, skipped like csv.DictReader does
+        n = len(row)
+
+        # deduplication check
+        f_id = row[id_index] if id_index is not None and id_index < n else None
+        if f_id in seen_ids:
+            continue
+        if f_id:
+            seen_ids.add(f_id)
+
+        # short rows read as None (DictReader restval), missing columns as ""
+        new_row = [("" if j is None else (row[j] if j < n else None)) for j in indexes]
+        stats["rows"] += 1
+        yield _fix_shifted_row(new_row)
+
+
+MANIFEST_VERSION = 1
+DELTA_HEADERS = ["op"] + DEST_HEADERS
+_I_ID = DEST_HEADERS.index("food_id")
+
+
+def row_hash(new_row):
+    """Content hash of a destination row, over the values as they are written to the CSV."""
+    text = "\x1f".join("" if v is None else str(v) for v in new_row)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def row_key(new_row, digest, seen):
+    """food_id, or the content hash (with an occurrence suffix) for rows without one."""
+    f_id = new_row[_I_ID]
+    if f_id:
+        return f_id
+    key = f"#{digest}"
+    n = 2
+    while key in seen:
+        key = f"#{digest}#{n}"
+        n += 1
+    return key
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != MANIFEST_VERSION or manifest.get("columns") != DEST_HEADERS:
+        print(f"Warning: ignoring manifest with a different format/columns: {path}")
+        return None
+    return manifest
+
+
+def _file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def diff_rows(rows, old_hashes, new_hashes, delta_writer, stats):
+    """
+    Pass rows through, recording key -> hash in new_hashes and writing inserted/updated rows to delta_writer
+    as they stream by. Deleted keys are left for the caller (old_hashes minus new_hashes).
+    """
+    for new_row in rows:
+        digest = row_hash(new_row)
+        key = row_key(new_row, digest, new_hashes)
+        new_hashes[key] = digest
+        old = old_hashes.get(key)
+        if old is None:
+            stats["inserted"] += 1
+            delta_writer.writerow(["insert"] + new_row)
+        elif old != digest:
+            stats["updated"] += 1
+            delta_writer.writerow(["update"] + new_row)
+        yield new_row
+
+
+def write_destination(rows, dest_path, stats, write_assets=True, incremental=False, derive=False):
+    """
+    Stream destination rows into dest_path (swapped in once complete), then write the sidecar assets.
+    stats["rows"] is filled in by the row producer.
+
+    incremental=True keeps a row-hash manifest next to dest_path (<dest>.manifest.json). Each run then
+    writes <dest>.delta.csv with the rows inserted/updated/deleted since the manifest. When nothing
+    changed and the destination is intact, the full file, manifest, delta and sidecar assets are left
+    untouched, so the delta keeps matching the manifest's base_sha256 -> sha256.
+
+    derive=True also writes <dest>.derived.csv: food_id plus the per-100g/per-serving carbs and GL
+    recomputed by gl_derive.py.
+    """
+    print(f"Writing to: {dest_path}")
+
+    os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+
+    stats.update({"inserted": 0, "updated": 0, "deleted": 0})
+    tmp_path = dest_path + ".tmp"
+    base = os.path.splitext(dest_path)[0]
+    manifest_path, delta_path = base + ".manifest.json", base + ".delta.csv"
+    manifest = load_manifest(manifest_path) if incremental else None
+    old_hashes = manifest["rows"] if manifest else {}
+    new_hashes = {}
+
+    with contextlib.ExitStack() as stack:
+        writer = csv.writer(stack.enter_context(open(tmp_path, 'w', encoding='utf-8', newline='')))
+        writer.writerow(DEST_HEADERS)
+        if incremental:
+            delta_writer = csv.writer(stack.enter_context(open(delta_path + ".tmp", 'w', encoding='utf-8', newline='')))
+            delta_writer.writerow(DELTA_HEADERS)
+            rows = diff_rows(rows, old_hashes, new_hashes, delta_writer, stats)
+        writer.writerows(rows)
+        if incremental:
+            for key in old_hashes.keys() - new_hashes.keys():
+                stats["deleted"] += 1
+                # only the key is known; rows without a food_id are deleted by their "#<hash>" key
+                delta_writer.writerow(["delete"] + [key if j == _I_ID else "" for j in range(len(DEST_HEADERS))])
+
+    if not incremental:
+        os.replace(tmp_path, dest_path)
+        print(f"Wrote {stats['rows']} rows.")
+    else:
+        changed = stats["inserted"] + stats["updated"] + stats["deleted"]
+        unchanged = manifest is not None and not changed and os.path.exists(dest_path) \
+            and _file_sha256(dest_path) == manifest.get("sha256")
+        print(f"Changes: {stats['inserted']} inserted, {stats['updated']} updated, {stats['deleted']} deleted "
+              f"({stats['rows']} rows)")
+        if unchanged:
+            # The manifest and delta still describe base -> current release; keep both as they are
+            os.remove(tmp_path)
+            os.remove(delta_path + ".tmp")
+            print("Destination unchanged; skipping rewrite, delta and sidecar assets.")
+            return
+        os.replace(tmp_path, dest_path)
+        print(f"Wrote {stats['rows']} rows.")
+        if manifest is None:
+            # first run: the full file is the baseline, there is nothing to diff against
+            os.remove(delta_path + ".tmp")
+        else:
+            os.replace(delta_path + ".tmp", delta_path)
+            print(f"Wrote delta: {delta_path}")
+        with open(manifest_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump({
+                "format_version": MANIFEST_VERSION,
+                "columns": DEST_HEADERS,
+                "sha256": _file_sha256(dest_path),
+                "base_sha256": manifest.get("sha256") if manifest else None,
+                # what <dest>.delta.csv holds, so a loader can tell a delta from another run apart
+                "changes": {k: stats[k] for k in ("inserted", "updated", "deleted")} if manifest else None,
+                "rows": new_hashes,
+            }, f, separators=(",", ":"))
+        os.replace(manifest_path + ".tmp", manifest_path)
+        print(f"Wrote manifest: {manifest_path}")
+
+    if write_assets:
+        # Sidecars for the app: pre-typed binary copy (food_db_asset.py) and search index (food_search_index.py)
+        # They are derived copies: a failure is reported but never aborts the migration.
+        try:
+            info = food_db_asset.write_asset(dest_path, base + ".bin")
+            food_db_asset.warn_non_numeric(info["non_numeric"])
+            print(f"Wrote binary asset: {base}.bin ({info['bytes']} bytes, {info['strings']} strings)")
+        except (OSError, ValueError) as e:
+            print(f"Warning: binary asset not written: {e}")
+        try:
+            info = food_search_index.write_index(dest_path, base + ".search.bin")
+            print(f"Wrote search index: {base}.search.bin ({info['bytes']} bytes, {info['grams']} grams)")
+        except (OSError, ValueError) as e:
+            print(f"Warning: search index not written: {e}")
+    if derive:
+        import gl_derive
+
+        n = gl_derive.write_derived(dest_path, base + ".derived.csv")
+        print(f"Wrote derived GL columns for {n} rows: {base}.derived.csv")
+
+
+def migrate_csv(source_path=SOURCE_PATH, dest_path=DEST_PATH, write_assets=True, incremental=False, derive=False):
+    """Single-source migration; see write_destination for the incremental mode and sidecar assets."""
+    print(f"Reading from: {source_path}")
+
+    if not os.path.exists(source_path):
+        print(f"Error: Source file not found at {source_path}")
         return
 
-    with open(SOURCE_PATH, 'r', encoding='utf-8') as source_file:
-        reader = csv.DictReader(source_file)
-        
+    with open(source_path, 'r', encoding='utf-8') as source_file:
+        reader = csv.reader(source_file)
+
         # Verify headers
-        source_headers = reader.fieldnames
+        source_headers = next(reader, None)
         if not source_headers:
             print("Error: Empty source CSV")
             return
-            
+
         print(f"Source Headers: {source_headers}")
-        
-        # Prepare destination data
-        rows_to_write = []
-        seen_ids = set()
-        
-        for i, row in enumerate(reader):
-            # deduplication check
-            f_id = row.get("food_id")
-            if f_id in seen_ids:
-                continue
-            if f_id:
-                seen_ids.add(f_id)
-
-            new_row = {}
-            for src_key, dest_key in HEADER_MAPPING.items():
-                if src_key in row:
-                    new_row[dest_key] = row[src_key]
-                else:
-                    # Handle slightly messy CSV headers if exact match check failed
-                    found = False
-                    for k in row.keys():
-                        if k.strip() == src_key.strip():
-                             new_row[dest_key] = row[k]
-                             found = True
-                             break
-                    if not found:
-                        if i == 0: print(f"Warning: Column '{src_key}' not found in source row.")
-                        new_row[dest_key] = "" # Default empty
-            
-            # --- PATCH: Fix shifted rows (e.g., Masala omelette) ---
-            # Issue: gl_category contains a number (8.28), actual category (Low) is in confidence_score
-            gl_cat = new_row.get("gl_category", "")
-            if gl_cat and gl_cat.replace('.', '', 1).isdigit() and "Low" not in gl_cat and "Medium" not in gl_cat and "High" not in gl_cat:
-                # Detected corrupted row
-                print(f"Fixing corrupted row: {new_row.get('canonical_name')} (gl_category='{gl_cat}')")
-                
-                # Shift values
-                real_category = new_row.get("confidence_score") # e.g., "Low"
-                real_confidence = new_row.get("available_carbs_g") # e.g., "0.45"
-                
-                new_row["gl_category"] = real_category
-                new_row["confidence_score"] = real_confidence
-                
-                # Recalculate missing carbs: (GL * 100) / GI
-                try:
-                    gl_median = float(new_row.get("gl_median", 0))
-                    gi = float(new_row.get("gi", 0))
-                    if gi > 0:
-                        recalc_carbs = (gl_median * 100) / gi
-                        new_row["available_carbs_g"] = round(recalc_carbs, 2)
-                        print(f"  -> Recalculated carbs: {new_row['available_carbs_g']}g")
-                    else:
-                        new_row["available_carbs_g"] = 0
-                except Exception as e:
-                    print(f"  -> Failed to recalculate carbs: {e}")
-            # -------------------------------------------------------
-
-            rows_to_write.append(new_row)
-
-    print(f"Writing {len(rows_to_write)} rows to: {DEST_PATH}")
-    
-    dest_headers = list(HEADER_MAPPING.values())
-    
-    os.makedirs(os.path.dirname(DEST_PATH), exist_ok=True)
-    
-    with open(DEST_PATH, 'w', encoding='utf-8', newline='') as dest_file:
-        writer = csv.DictWriter(dest_file, fieldnames=dest_headers)
-        writer.writeheader()
-        writer.writerows(rows_to_write)
-        
+
+        # Rows stream straight from reader to writer
+        stats = {"rows": 0}
+        write_destination(migrate_rows(reader, source_headers, stats), dest_path, stats, write_assets, incremental, derive)
+
     print("Migration complete.")
 
+
+def _build_arg_parser():
+    parser = argparse.ArgumentParser(description="Migrate the GI/GL master into the app's CSV schema (default: migrate).")
+    sub = parser.add_subparsers(dest="cmd")
+
+    p_migrate = sub.add_parser("migrate", help="Write the destination CSV and its sidecar assets.")
+    p_migrate.add_argument("--source", default=SOURCE_PATH, help="Source master CSV.")
+    p_migrate.add_argument("--dest", default=DEST_PATH, help="Destination CSV (sidecars are written next to it).")
+    p_migrate.add_argument("--incremental", action="store_true",
+                           help="Keep a row-hash manifest and write a delta of inserted/updated/deleted rows.")
+    p_migrate.add_argument("--derive", action="store_true", help="Also write <dest>.derived.csv (see gl_derive.py).")
+
+    p_merge = sub.add_parser("merge", help="Merge several source CSVs by food_id as described by a JSON config.")
+    p_merge.add_argument("--config", required=True, help="Merge config (see merge_sources.py).")
+    p_merge.add_argument("--dest", default=None, help="Destination CSV (default: the config's \"dest\").")
+    p_merge.add_argument("--incremental", action="store_true",
+                         help="Keep a row-hash manifest and write a delta of inserted/updated/deleted rows.")
+    p_merge.add_argument("--derive", action="store_true", help="Also write <dest>.derived.csv (see gl_derive.py).")
+
+    p_load = sub.add_parser("load", help="Bulk-load the destination CSV (or its delta) into Postgres.")
+    p_load.add_argument("--dest", default=DEST_PATH, help="Migrated CSV; its manifest/delta are picked up if present.")
+    p_load.add_argument("--dsn", default=os.environ.get("DATABASE_URL"), help="Postgres DSN (default: $DATABASE_URL, else local Supabase).")
+    p_load.add_argument("--batch_rows", type=int, default=None, help="Rows per COPY + upsert transaction.")
+    p_load.add_argument("--workers", type=int, default=1, help="Pooled connections loading batches concurrently.")
+    p_load.add_argument("--full", action="store_true", help="Ignore any delta and reload the whole file.")
+    return parser
+
+
 if __name__ == "__main__":
-    migrate_csv()
+    args = _build_arg_parser().parse_args()
+    if args.cmd == "load":
+        import pg_loader
+
+        pg_loader.load_master(
+            args.dest,
+            dsn=args.dsn or pg_loader.DEFAULT_DSN,
+            batch_rows=args.batch_rows or pg_loader.DEFAULT_BATCH_ROWS,
+            workers=args.workers,
+            full=args.full,
+        )
+    elif args.cmd == "merge":
+        import merge_sources
+
+        merge_sources.merge_sources(args.config, args.dest, incremental=args.incremental, derive=args.derive)
+    elif args.cmd == "migrate":
+        migrate_csv(args.source, args.dest, incremental=args.incremental, derive=args.derive)
+    else:
+        migrate_csv()
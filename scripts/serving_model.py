@@ -21,10 +21,29 @@ It does NOT modify any other columns.
 Usage
   Train:
     python serving_model.py train --train_csv <train.csv> --model_dir <dir>
+    python serving_model.py train --train_csv <train.csv> --model_dir <dir> --search --cv_folds 5 --n_jobs -1
+    python serving_model.py train --train_csv <train.csv> --model_dir <dir> --clf_solver saga
 
   Apply:
     python serving_model.py apply --in_csv <input.csv> --out_csv <output.csv> --model_dir <dir>
     python serving_model.py apply --in_csv <input.csv> --out_csv <output.csv> --model_dir <dir> --overwrite
+    python serving_model.py apply --in_csv <input.csv> --out_csv <output.csv> --model_dir <dir> --chunksize 50000
+    python serving_model.py apply --in_csv <input.csv> --out_csv <output.csv> --model_dir <dir> --workers 16
+    python serving_model.py apply --in_csv <input.csv> --out_csv <output.csv> --model_dir <dir> --overwrite --cache
+    python serving_model.py apply --in_csv <input.csv> --out_csv <output.csv> --model_dir <dir> --derive_gl
+    python serving_model.py apply --in_csv <input.csv> --out_csv <output.csv> --model_dir <dir> --size_mode knn
+
+  Update (incremental refit with new/changed rows, matched by food_id + row hash):
+    python serving_model.py update --update_csv <rows.csv> --model_dir <dir> [--compare_full]
+
+  Export (flat .npz for the NumPy/SciPy-only scorer in serving_scorer.py):
+    python serving_model.py export --model_dir <dir> [--out <bundle.npz>]
+
+Size modes (apply --size_mode)
+- ridge (default): sizes from the Ridge regressor, clipped per serving_type.
+- knn: sizes from the nearest labeled training rows (KnnIndex, knn_index.npz, written by
+  train/update); the neighbours' food_ids and similarities go to serving_size_neighbours.
+  Rows that share no character n-gram with the index keep the Ridge sizes.
 
 Notes
 - Designed to be robust to "extra" columns or missing optional columns.
@@ -34,20 +53,27 @@ Notes
 from __future__ import annotations
 
 import argparse
+import hashlib
 import os
 import json
-from dataclasses import dataclass
-from typing import Dict, List, Tuple, Optional
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, replace
+from typing import Any, Dict, List, Tuple, Optional, Union
 
 import numpy as np
 import pandas as pd
-from joblib import dump, load
+from joblib import Parallel, delayed, dump, load
+from scipy import sparse
+from scipy.sparse.linalg import cg, splu
 
-from sklearn.pipeline import Pipeline
-from sklearn.compose import ColumnTransformer
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.preprocessing import OneHotEncoder
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer, TfidfTransformer, TfidfVectorizer
 from sklearn.linear_model import LogisticRegression, Ridge
+from sklearn.model_selection import KFold
+from sklearn.preprocessing import normalize
+
+import gl_derive
 
 # ---------------------------
 # Column names (keep exact)
@@ -60,6 +86,9 @@ COL_CONF = "Serving size confidence"
 
 TARGET_COLS = [COL_SERVING_TYPE, COL_G, COL_MIN, COL_MAX, COL_CONF]
 
+# Evidence column written by `apply --size_mode knn`: "food_id:similarity|..." per row
+COL_KNN_NEIGHBOURS = "serving_size_neighbours"
+
 # Candidate text columns (we'll use whatever exists)
 TEXT_COL_CANDIDATES = [
     "canonical_name",
@@ -71,15 +100,68 @@ TEXT_COL_CANDIDATES = [
 # Discrete confidence levels observed in training will be learned and persisted.
 DEFAULT_ALLOWED_CONF = [0.50, 0.55, 0.60, 0.70, 0.75, 0.80, 0.85, 0.90]
 
+# Files written by train (metadata.json is written last).
+MODEL_FILES = ["text_tfidf.joblib", "serving_type_clf.joblib", "size_reg.joblib", "conf_reg.joblib"]
+
+# Cached training features + Ridge sufficient statistics used by `update` (see update_models).
+TRAIN_STATE_FILE = "train_state.joblib"
+
+# Flat NumPy export of a bundle for serving_scorer.py (see export_bundle).
+DEFAULT_EXPORT_FILE = "serving_bundle.npz"
+EXPORT_FORMAT_VERSION = 1
+
+# Default on-disk prediction cache (see PredictionCache); lives next to the bundle.
+DEFAULT_CACHE_FILE = "prediction_cache.sqlite"
+DEFAULT_CACHE_MAX_ENTRIES = 1_000_000
+
+# Nearest-neighbour size index (see KnnIndex); written by train/update next to the bundle.
+KNN_INDEX_FILE = "knn_index.npz"
+KNN_NGRAM_RANGE = (4, 4)
+KNN_N_FEATURES = 2**20
+KNN_K = 3  # neighbours per row
+KNN_MAX_DF = 0.02  # grams in more rows than this share (and KNN_MIN_POSTINGS) are not indexed
+KNN_MIN_POSTINGS = 1000
+KNN_BATCH_ROWS = 1024
+
+
+@dataclass
+class TrainConfig:
+    """
+    Hyperparameters for train_models. Defaults are the long-standing hard-coded values, except
+    clf_solver: lbfgs (multinomial) replaced liblinear, which has no multiclass support in
+    current scikit-learn.
+    """
+
+    max_features: int = 6000
+    min_df: int = 2
+    clf_C: float = 1.0
+    clf_solver: str = "lbfgs"
+    clf_max_iter: int = 600
+    size_alpha: float = 3.0
+    conf_alpha: float = 5.0
+
+
+# Candidate settings for `train --search`. max_features is shared (one TF-IDF for all
+# three models); the per-model settings are searched independently on top of it.
+SEARCH_GRID: Dict[str, List[Any]] = {
+    "max_features": [2000, 4000, 6000, 10000],
+    "clf": [{"clf_C": c, "clf_solver": sv} for sv in ("lbfgs", "newton-cg", "saga") for c in (0.5, 1.0, 2.0, 4.0)],
+    "size": [{"size_alpha": a} for a in (0.3, 1.0, 3.0, 10.0)],
+    "conf": [{"conf_alpha": a} for a in (1.0, 2.0, 5.0, 10.0, 20.0)],
+}
+
 
 @dataclass
 class ModelBundle:
-    clf: Pipeline
-    size_reg: Pipeline
-    conf_reg: Pipeline
+    tfidf: TfidfVectorizer  # shared text featurizer for all three models
+    clf: LogisticRegression
+    size_reg: Ridge
+    conf_reg: Ridge
     serving_type_labels: List[str]
     allowed_conf_levels: List[float]
     clip_by_type: Dict[str, Dict[str, Tuple[float, float]]]  # {type: {col: (lo, hi)}}
+    bundle_hash: str = ""  # content hash of the model files + metadata (prediction cache key)
+    knn: Optional["KnnIndex"] = None  # loaded for `apply --size_mode knn`
 
 
 def _normalize_colnames(df: pd.DataFrame) -> pd.DataFrame:
@@ -90,20 +172,45 @@ def _normalize_colnames(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def _build_text_all(row: pd.Series, text_cols: List[str]) -> str:
-    parts: List[str] = []
+def _build_text_all(df: pd.DataFrame, text_cols: List[str]) -> pd.Series:
+    """
+    Column-wise " | " join of the non-empty, stripped text columns of each row.
+    Computed once per frame with pandas string ops (no per-row Series construction).
+    """
+    text_all = pd.Series("", index=df.index, dtype=object)
     for c in text_cols:
-        if c in row and pd.notna(row[c]):
-            v = str(row[c]).strip()
-            if v:
-                parts.append(v)
-    return " | ".join(parts)
+        if c not in df.columns:
+            continue
+        col = df[c]
+        v = col.astype(str).str.strip().where(col.notna(), "")
+        has_v = v != ""
+        joined = v.where(text_all == "", text_all + " | " + v)
+        text_all = joined.where(has_v, text_all)
+    return text_all
 
 
 def _infer_text_cols(df: pd.DataFrame) -> List[str]:
     return [c for c in TEXT_COL_CANDIDATES if c in df.columns]
 
 
+def _onehot_serving_type(types: np.ndarray, labels: List[str]) -> sparse.csr_matrix:
+    """
+    One-hot encode serving types against the master label set.
+    Unknown / missing types become all-zero rows (same as handle_unknown="ignore").
+    """
+    codes = pd.Categorical(types, categories=labels).codes
+    known = np.flatnonzero(codes >= 0)
+    return sparse.csr_matrix(
+        (np.ones(len(known), dtype=float), (known, codes[known])),
+        shape=(len(codes), len(labels)),
+    )
+
+
+def _typed_features(X_text: sparse.spmatrix, types: np.ndarray, labels: List[str]) -> sparse.csr_matrix:
+    """TF-IDF(text_all) + OneHot(serving_type), as used by the size and confidence regressors."""
+    return sparse.hstack([X_text, _onehot_serving_type(types, labels)], format="csr")
+
+
 def _snap_to_levels(x: np.ndarray, levels: List[float]) -> np.ndarray:
     lv = np.array(levels, dtype=float)
     # broadcast abs diff and pick nearest
@@ -111,6 +218,27 @@ def _snap_to_levels(x: np.ndarray, levels: List[float]) -> np.ndarray:
     return lv[idx]
 
 
+def _clip_sizes_by_type(
+    pred_type: np.ndarray,
+    sizes: np.ndarray,
+    clip_by_type: Dict[str, Dict[str, Tuple[float, float]]],
+) -> np.ndarray:
+    """
+    Clip the (min, g, max) columns of sizes to the per-serving_type ranges in one pass.
+    Types are encoded to integer codes and lo/hi bounds gathered from small lookup
+    tables; types without a clip entry (code -1) map to (-inf, inf), i.e. unclipped.
+    """
+    types = list(clip_by_type.keys())
+    cols = [COL_MIN, COL_G, COL_MAX]
+    lo = np.full((len(types) + 1, len(cols)), -np.inf)
+    hi = np.full((len(types) + 1, len(cols)), np.inf)
+    for t, st in enumerate(types):
+        for j, col in enumerate(cols):
+            lo[t, j], hi[t, j] = clip_by_type[st][col]
+    codes = pd.Categorical(pred_type, categories=types).codes  # -1 -> last (unbounded) row
+    return np.clip(sizes, lo[codes], hi[codes])
+
+
 def _compute_clip_ranges(df: pd.DataFrame, serving_labels: List[str]) -> Dict[str, Dict[str, Tuple[float, float]]]:
     """
     Per serving_type, compute robust clipping ranges (5th to 95th percentile)
@@ -133,58 +261,340 @@ def _compute_clip_ranges(df: pd.DataFrame, serving_labels: List[str]) -> Dict[st
     return clip
 
 
-def train_models(train_csv: str, model_dir: str) -> ModelBundle:
-    df = pd.read_csv(train_csv)
-    text_cols = _infer_text_cols(df)
+def _hash_bundle(model_dir: str, meta: Dict) -> str:
+    h = hashlib.sha256()
+    for name in MODEL_FILES:
+        with open(os.path.join(model_dir, name), "rb") as f:
+            h.update(f.read())
+    meta = {k: v for k, v in meta.items() if k != "bundle_hash"}
+    h.update(json.dumps(meta, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
 
-    # Basic training set filters
-    df_clf = df.dropna(subset=[COL_SERVING_TYPE]).copy()
-    df_clf["text_all"] = df_clf.apply(lambda r: _build_text_all(r, text_cols), axis=1)
 
-    serving_type_labels = sorted(df_clf[COL_SERVING_TYPE].dropna().unique().tolist())
+class KnnIndex:
+    """
+    Nearest-neighbour serving sizes over the labeled training rows.
+
+    Rows are hashed character n-grams of text_all (HashingVectorizer, so only arrays are
+    persisted), idf-weighted with sublinear tf and l2-normalized. Grams found in more than
+    max(KNN_MAX_DF * rows, KNN_MIN_POSTINGS) rows get weight 0, as in the dish generator's
+    MasterIndex: they barely separate rows and would make the query product dense at
+    100k+ rows. Queries are one sparse product per batch; a row's sizes are the
+    similarity²-weighted mean of its KNN_K best matches, restricted to those of the
+    predicted serving_type when there are any.
+    """
+
+    def __init__(
+        self,
+        X: sparse.csr_matrix,
+        weights: np.ndarray,
+        types: np.ndarray,
+        sizes: np.ndarray,
+        food_ids: np.ndarray,
+        index_hash: str = "",
+    ) -> None:
+        self.XT = X.T.tocsr()
+        self.weights = weights
+        self.types = types
+        self.sizes = sizes
+        self.food_ids = food_ids
+        self.index_hash = index_hash
+
+    @staticmethod
+    def _hash(text_all: pd.Series) -> sparse.csr_matrix:
+        hv = HashingVectorizer(
+            analyzer="char_wb", ngram_range=KNN_NGRAM_RANGE, n_features=KNN_N_FEATURES, alternate_sign=False, norm=None
+        )
+        return hv.transform(text_all.astype(str))
+
+    @staticmethod
+    def _weigh(H: sparse.csr_matrix, weights: np.ndarray) -> sparse.csr_matrix:
+        X = H.astype(np.float64)
+        X.data = np.log1p(X.data) * weights[X.indices]
+        X.eliminate_zeros()
+        return normalize(X)
+
+    @classmethod
+    def build(cls, text_all: pd.Series, types: np.ndarray, sizes: np.ndarray, food_ids: np.ndarray) -> "KnnIndex":
+        H = cls._hash(text_all)
+        n = H.shape[0]
+        df = np.bincount(H.indices, minlength=KNN_N_FEATURES)
+        weights = (np.log((1.0 + n) / (1.0 + df)) + 1.0).astype(np.float32)
+        weights[df > max(KNN_MAX_DF * n, KNN_MIN_POSTINGS)] = 0.0
+        return cls(
+            cls._weigh(H, weights),
+            weights,
+            np.asarray(types, dtype=str),
+            np.asarray(sizes, dtype=float),
+            np.asarray(food_ids, dtype=str),
+        )
 
-    # 1) serving_type classifier: TF-IDF(text_all) -> LogisticRegression (liblinear for speed)
-    clf = Pipeline(
-        steps=[
-            ("tfidf", TfidfVectorizer(ngram_range=(1, 1), min_df=2, max_features=6000)),
-            ("lr", LogisticRegression(max_iter=600, solver="liblinear")),
-        ]
+    def save(self, path: str) -> None:
+        X = self.XT.T.tocsr()
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            # Most of the 2**20 idf weights belong to grams no row has (all the same, maximal
+            # value): store that value once plus the weights that differ from it.
+            unseen = self.weights.max() if len(self.weights) else np.float32(0.0)
+            nz = np.flatnonzero(self.weights != unseen)
+            np.savez_compressed(
+                f,
+                data=X.data,
+                indices=X.indices,
+                indptr=X.indptr,
+                weight_index=nz.astype(np.int32),
+                weight_value=self.weights[nz],
+                weight_default=np.float32(unseen),
+                types=self.types,
+                sizes=self.sizes,
+                food_ids=self.food_ids,
+            )
+        os.replace(tmp, path)
+        with open(path, "rb") as f:
+            self.index_hash = hashlib.sha256(f.read()).hexdigest()
+
+    @classmethod
+    def load(cls, path: str) -> "KnnIndex":
+        with open(path, "rb") as f:
+            index_hash = hashlib.sha256(f.read()).hexdigest()
+        with np.load(path) as z:
+            sizes = z["sizes"]
+            X = sparse.csr_matrix((z["data"], z["indices"], z["indptr"]), shape=(len(sizes), KNN_N_FEATURES))
+            weights = np.full(KNN_N_FEATURES, z["weight_default"], dtype=np.float32)
+            weights[z["weight_index"]] = z["weight_value"]
+            return cls(X, weights, z["types"], sizes, z["food_ids"], index_hash)
+
+    def query(self, text_all: pd.Series, pred_type: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (sizes (n, 3), neighbour evidence, found) per row; found is False for rows that share
+        no indexed gram with any training row (their sizes are NaN and evidence empty).
+        """
+        Q = self._weigh(self._hash(text_all), self.weights)
+        n = Q.shape[0]
+        sizes = np.full((n, 3), np.nan)
+        evidence = np.full(n, "", dtype=object)
+        pred_type = np.asarray(pred_type, dtype=str)
+        for start in range(0, n, KNN_BATCH_ROWS):
+            S = (Q[start:start + KNN_BATCH_ROWS] @ self.XT).tocsr()
+            for r in range(S.shape[0]):
+                lo, hi = S.indptr[r], S.indptr[r + 1]
+                if lo == hi:
+                    continue
+                cols, sims = S.indices[lo:hi], S.data[lo:hi]
+                if hi - lo > KNN_K:
+                    # candidates at or above the K-th best similarity, then ties -> lower row
+                    kth = np.partition(sims, hi - lo - KNN_K)[hi - lo - KNN_K]
+                    top = sims >= kth
+                    cols, sims = cols[top], sims[top]
+                order = np.lexsort((cols, -sims))[:KNN_K]
+                cols, sims = cols[order], sims[order]
+                same = self.types[cols] == pred_type[start + r]
+                if same.any():
+                    cols, sims = cols[same], sims[same]
+                w = sims**2
+                sizes[start + r] = w @ self.sizes[cols] / w.sum()
+                evidence[start + r] = "|".join(f"{self.food_ids[c]}:{s:.2f}" for c, s in zip(cols, sims))
+        return sizes, evidence, ~np.isnan(sizes[:, 0])
+
+
+def _save_knn_index(model_dir: str, state: Dict[str, Any]) -> None:
+    """KnnIndex over the train state's rows with all three sizes (food_id, or row hash key, as evidence)."""
+    has = ~np.isnan(state["sizes"]).any(axis=1)
+    index = KnnIndex.build(
+        pd.Series(state["text_all"][has]), state["types"][has], state["sizes"][has], state["keys"][has]
     )
-    clf.fit(df_clf["text_all"], df_clf[COL_SERVING_TYPE])
+    index.save(os.path.join(model_dir, KNN_INDEX_FILE))
+
+
+def _limit_tfidf(
+    C_tr: sparse.csr_matrix, C_te: sparse.csr_matrix, max_features: int
+) -> Tuple[sparse.csr_matrix, sparse.csr_matrix]:
+    """
+    TF-IDF for one max_features setting from cached fold counts: keep the top terms by
+    frequency (as TfidfVectorizer does) and reweight, without re-tokenizing the text.
+    """
+    tfs = np.asarray(C_tr.sum(axis=0)).ravel()
+    keep = np.sort((-tfs).argsort()[:max_features])
+    tf = TfidfTransformer()
+    return tf.fit_transform(C_tr[:, keep]), tf.transform(C_te[:, keep])
+
+
+def _eval_fold(
+    fold: int,
+    C_tr: sparse.csr_matrix,
+    C_te: sparse.csr_matrix,
+    tr: np.ndarray,
+    te: np.ndarray,
+    max_features: int,
+    types: np.ndarray,
+    sizes: np.ndarray,
+    conf: np.ndarray,
+    labels: List[str],
+    base: TrainConfig,
+) -> List[Dict[str, Any]]:
+    """Score every per-model candidate on one (fold, max_features) feature matrix."""
+    X_tr, X_te = _limit_tfidf(C_tr, C_te, max_features)
+    T_tr = _typed_features(X_tr, types[tr], labels)
+    T_te = _typed_features(X_te, types[te], labels)
+    sz_tr, sz_te = ~np.isnan(sizes[tr]).any(axis=1), ~np.isnan(sizes[te]).any(axis=1)
+    cf_tr, cf_te = ~np.isnan(conf[tr]), ~np.isnan(conf[te])
+
+    out: List[Dict[str, Any]] = []
+
+    def _record(model: str, params: Dict[str, Any], metric: float, t0: float) -> None:
+        out.append(
+            {
+                "fold": fold,
+                "max_features": max_features,
+                "model": model,
+                "params": params,
+                "metric": float(metric),
+                "seconds": time.perf_counter() - t0,
+            }
+        )
+
+    for params in SEARCH_GRID["clf"]:
+        cfg = replace(base, **params)
+        t0 = time.perf_counter()
+        clf = LogisticRegression(C=cfg.clf_C, max_iter=cfg.clf_max_iter, solver=cfg.clf_solver)
+        try:
+            clf.fit(X_tr, types[tr])
+        except ValueError:
+            # e.g. a solver without multiclass support: score it worst rather than abort the search
+            _record("clf", params, 0.0, t0)
+            continue
+        _record("clf", params, np.mean(clf.predict(X_te) == types[te]), t0)
 
-    # 2) sizes regressor: TF-IDF(text_all) + OneHot(serving_type) -> Ridge (multioutput by default via y being DF)
-    df_sz = df.dropna(subset=[COL_SERVING_TYPE, COL_MIN, COL_G, COL_MAX]).copy()
-    df_sz["text_all"] = df_sz.apply(lambda r: _build_text_all(r, text_cols), axis=1)
+    for params in SEARCH_GRID["size"]:
+        t0 = time.perf_counter()
+        reg = Ridge(alpha=params["size_alpha"], random_state=42).fit(T_tr[sz_tr], sizes[tr][sz_tr])
+        _record("size", params, np.mean(np.abs(reg.predict(T_te[sz_te]) - sizes[te][sz_te])), t0)
 
-    pre_sz = ColumnTransformer(
-        transformers=[
-            ("text", TfidfVectorizer(ngram_range=(1, 1), min_df=2, max_features=6000), "text_all"),
-            ("cat", OneHotEncoder(handle_unknown="ignore"), [COL_SERVING_TYPE]),
-        ]
+    for params in SEARCH_GRID["conf"]:
+        t0 = time.perf_counter()
+        reg = Ridge(alpha=params["conf_alpha"], random_state=42).fit(T_tr[cf_tr], conf[tr][cf_tr])
+        _record("conf", params, np.mean(np.abs(reg.predict(T_te[cf_te]) - conf[te][cf_te])), t0)
+
+    return out
+
+
+def search_train_config(
+    df_clf: pd.DataFrame,
+    labels: List[str],
+    n_splits: int = 5,
+    n_jobs: int = -1,
+    base: Optional[TrainConfig] = None,
+) -> Tuple[TrainConfig, Dict[str, Any]]:
+    """
+    Cross-validated grid search over SEARCH_GRID for all three models.
+
+    Token counts are computed once per fold and every max_features setting is derived
+    from them (_limit_tfidf); each (fold, max_features) matrix is built once and shared
+    by all candidates, and those tasks run in parallel (n_jobs).
+    Metrics: classifier accuracy (higher is better), size / confidence MAE (lower is better).
+    """
+    base = base or TrainConfig()
+    t_start = time.perf_counter()
+    text = df_clf["text_all"].values
+    types = df_clf[COL_SERVING_TYPE].astype(str).values
+    sizes = df_clf[[COL_MIN, COL_G, COL_MAX]].astype(float).values
+    conf = df_clf[COL_CONF].astype(float).values if COL_CONF in df_clf else np.full(len(df_clf), np.nan)
+
+    folds = list(KFold(n_splits=n_splits, shuffle=True, random_state=42).split(text))
+    fold_counts = []
+    for tr, te in folds:
+        cv = CountVectorizer(ngram_range=(1, 1), min_df=base.min_df)
+        fold_counts.append((cv.fit_transform(text[tr]), cv.transform(text[te])))
+
+    tasks = [
+        delayed(_eval_fold)(f, C_tr, C_te, tr, te, k, types, sizes, conf, labels, base)
+        for f, ((tr, te), (C_tr, C_te)) in enumerate(zip(folds, fold_counts))
+        for k in SEARCH_GRID["max_features"]
+    ]
+    results = pd.DataFrame([r for rs in Parallel(n_jobs=n_jobs)(tasks) for r in rs])
+    results["params_key"] = results["params"].map(lambda p: json.dumps(p, sort_keys=True))
+
+    summary = (
+        results.groupby(["max_features", "model", "params_key"], sort=False)
+        .agg(metric=("metric", "mean"), metric_std=("metric", "std"), seconds=("seconds", "mean"))
+        .reset_index()
     )
-    size_reg = Pipeline(steps=[("pre", pre_sz), ("ridge", Ridge(alpha=3.0, random_state=42))])
-    size_reg.fit(df_sz[["text_all", COL_SERVING_TYPE]], df_sz[[COL_MIN, COL_G, COL_MAX]])
+    higher_is_better = {"clf": True, "size": False, "conf": False}
+
+    # Best params per (max_features, model), then the max_features with the lowest rank sum
+    # across the three models (ties -> fewer features, i.e. cheaper).
+    best_rows = []
+    for (k, model), grp in summary.groupby(["max_features", "model"], sort=False):
+        grp = grp.sort_values(["metric", "seconds"], ascending=[not higher_is_better[model], True])
+        best_rows.append(grp.iloc[0])
+    best = pd.DataFrame(best_rows)
+    loss = best["metric"].where(~best["model"].map(higher_is_better), -best["metric"])
+    best["rank"] = loss.groupby(best["model"]).rank(method="min")
+    rank_sum = best.groupby("max_features")["rank"].sum().sort_index()
+    best_k = int(rank_sum.idxmin())
+
+    chosen: Dict[str, Any] = {"max_features": best_k}
+    for _, row in best[best["max_features"] == best_k].iterrows():
+        chosen.update(json.loads(row["params_key"]))
+    config = replace(base, **chosen)
+
+    per_fold: Dict[str, List[Dict[str, Any]]] = {}
+    for _, row in best[best["max_features"] == best_k].iterrows():
+        sel = results[
+            (results["max_features"] == best_k)
+            & (results["model"] == row["model"])
+            & (results["params_key"] == row["params_key"])
+        ].sort_values("fold")
+        per_fold[row["model"]] = sel[["fold", "metric", "seconds"]].to_dict(orient="records")
+
+    report = {
+        "n_splits": n_splits,
+        "metrics": {"clf": "accuracy", "size": "mae_g", "conf": "mae"},
+        "best_config": asdict(config),
+        "best_per_fold": per_fold,
+        "candidates": [
+            {**{k: v for k, v in row.items() if k != "params_key"}, "params": json.loads(row["params_key"])}
+            for row in summary.to_dict(orient="records")
+        ],
+        "wall_seconds": time.perf_counter() - t_start,
+    }
+    return config, report
+
+
+def _fit_bundle(df_clf: pd.DataFrame, config: TrainConfig) -> ModelBundle:
+    """Fit the shared featurizer + three models on labeled rows (text_all already built)."""
+    serving_type_labels = sorted(df_clf[COL_SERVING_TYPE].dropna().unique().tolist())
+
+    # Shared text featurizer: one TF-IDF vocabulary fit once, reused by all three models
+    tfidf = TfidfVectorizer(ngram_range=(1, 1), min_df=config.min_df, max_features=config.max_features)
+    X_text = tfidf.fit_transform(df_clf["text_all"])
+    row_of = pd.Series(np.arange(len(df_clf)), index=df_clf.index)
+
+    # 1) serving_type classifier: TF-IDF(text_all) -> LogisticRegression (lbfgs, multinomial)
+    clf = LogisticRegression(C=config.clf_C, max_iter=config.clf_max_iter, solver=config.clf_solver)
+    clf.fit(X_text, df_clf[COL_SERVING_TYPE])
+
+    # 2) sizes regressor: TF-IDF(text_all) + OneHot(serving_type) -> Ridge (multioutput via 2-D y)
+    df_sz = df_clf.dropna(subset=[COL_MIN, COL_G, COL_MAX])
+    X_sz = _typed_features(X_text[row_of[df_sz.index].values], df_sz[COL_SERVING_TYPE].values, serving_type_labels)
+    size_reg = Ridge(alpha=config.size_alpha, random_state=42)
+    size_reg.fit(X_sz, df_sz[[COL_MIN, COL_G, COL_MAX]].astype(float).values)
 
     # 3) confidence regressor: TF-IDF(text_all) + OneHot(serving_type) -> Ridge
-    df_cf = df.dropna(subset=[COL_SERVING_TYPE, COL_CONF]).copy()
-    df_cf["text_all"] = df_cf.apply(lambda r: _build_text_all(r, text_cols), axis=1)
+    df_cf = df_clf.dropna(subset=[COL_CONF])
 
     allowed_conf = sorted(df_cf[COL_CONF].dropna().astype(float).unique().tolist())
     if not allowed_conf:
         allowed_conf = DEFAULT_ALLOWED_CONF
 
-    pre_cf = ColumnTransformer(
-        transformers=[
-            ("text", TfidfVectorizer(ngram_range=(1, 1), min_df=2, max_features=6000), "text_all"),
-            ("cat", OneHotEncoder(handle_unknown="ignore"), [COL_SERVING_TYPE]),
-        ]
-    )
-    conf_reg = Pipeline(steps=[("pre", pre_cf), ("ridge", Ridge(alpha=5.0, random_state=42))])
-    conf_reg.fit(df_cf[["text_all", COL_SERVING_TYPE]], df_cf[COL_CONF].astype(float))
+    X_cf = _typed_features(X_text[row_of[df_cf.index].values], df_cf[COL_SERVING_TYPE].values, serving_type_labels)
+    conf_reg = Ridge(alpha=config.conf_alpha, random_state=42)
+    conf_reg.fit(X_cf, df_cf[COL_CONF].astype(float).values)
 
     clip_by_type = _compute_clip_ranges(df_sz, serving_type_labels)
 
-    bundle = ModelBundle(
+    return ModelBundle(
+        tfidf=tfidf,
         clf=clf,
         size_reg=size_reg,
         conf_reg=conf_reg,
@@ -193,43 +603,398 @@ def train_models(train_csv: str, model_dir: str) -> ModelBundle:
         clip_by_type=clip_by_type,
     )
 
+
+def _save_bundle(bundle: ModelBundle, model_dir: str, extra_meta: Dict[str, Any]) -> None:
     os.makedirs(model_dir, exist_ok=True)
+    dump(bundle.tfidf, os.path.join(model_dir, "text_tfidf.joblib"))
     dump(bundle.clf, os.path.join(model_dir, "serving_type_clf.joblib"))
     dump(bundle.size_reg, os.path.join(model_dir, "size_reg.joblib"))
     dump(bundle.conf_reg, os.path.join(model_dir, "conf_reg.joblib"))
+    meta = {
+        "serving_type_labels": bundle.serving_type_labels,
+        "allowed_conf_levels": bundle.allowed_conf_levels,
+        "clip_by_type": bundle.clip_by_type,
+        "target_cols": TARGET_COLS,
+        **extra_meta,
+    }
+    # round-trip through JSON so the hash matches what load_models sees
+    bundle.bundle_hash = _hash_bundle(model_dir, json.loads(json.dumps(meta)))
+    meta["bundle_hash"] = bundle.bundle_hash
     with open(os.path.join(model_dir, "metadata.json"), "w", encoding="utf-8") as f:
-        json.dump(
-            {
-                "serving_type_labels": bundle.serving_type_labels,
-                "allowed_conf_levels": bundle.allowed_conf_levels,
-                "clip_by_type": bundle.clip_by_type,
-                "text_cols_used": _infer_text_cols(df),
-                "target_cols": TARGET_COLS,
-            },
-            f,
-            ensure_ascii=False,
-            indent=2,
-        )
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    # A new bundle invalidates any cached predictions kept next to it.
+    cache_path = os.path.join(model_dir, DEFAULT_CACHE_FILE)
+    if os.path.exists(cache_path):
+        os.remove(cache_path)
+
+
+def _row_keys(df: pd.DataFrame, text_cols: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (key, hash) per row for change detection. The hash covers only the columns training
+    reads (text + target columns); the key is food_id, or the hash for rows without one.
+    """
+    cols = [c for c in text_cols + TARGET_COLS if c in df.columns]
+    # numbers as floats so int vs float columns (e.g. with/without NaNs) hash the same
+    canon = df[cols].apply(lambda c: c.astype(float) if pd.api.types.is_numeric_dtype(c) else c).astype(str)
+    hashes = pd.util.hash_pandas_object(canon, index=False).values.astype(np.uint64)
+    hash_keys = np.array([f"hash:{h:016x}" for h in hashes.tolist()], dtype=object)
+    if "food_id" not in df.columns:
+        return hash_keys, hashes
+    ids = df["food_id"]
+    keys = np.where(ids.notna().values, ids.astype(str).values, hash_keys).astype(object)
+    return keys, hashes
 
+
+def _ridge_stats(X_typed: sparse.spmatrix, Y: np.ndarray) -> Tuple[sparse.csr_matrix, np.ndarray]:
+    """Sufficient statistics (Z'Z, Z'Y) of a ridge fit, with Z = [X, 1] for the intercept."""
+    Z = sparse.hstack([X_typed, np.ones((X_typed.shape[0], 1))], format="csr")
+    return (Z.T @ Z).tocsr(), np.asarray(Z.T @ Y)
+
+
+def _solve_ridge(G: sparse.spmatrix, B: np.ndarray, alpha: float, warm: Optional[Ridge] = None) -> Ridge:
+    """
+    Ridge solution from sufficient statistics (intercept unpenalized), as a Ridge.
+    With a previous model, conjugate gradient warm-starts from its coefficients (a small
+    delta moves the solution little); otherwise, or if CG does not converge, solve directly.
+    """
+    penalty = np.full(G.shape[0], float(alpha))
+    penalty[-1] = 0.0
+    A = (G + sparse.diags(penalty)).tocsr()
+    B2 = B.reshape(G.shape[0], -1)
+    W: Optional[np.ndarray] = None
+    if warm is not None and getattr(warm, "n_features_in_", None) == G.shape[0] - 1:
+        x0 = np.vstack([np.atleast_2d(warm.coef_).T, np.atleast_1d(warm.intercept_)])
+        cols = [cg(A, B2[:, j], x0=x0[:, j], rtol=1e-10, maxiter=10 * G.shape[0]) for j in range(B2.shape[1])]
+        if all(info == 0 for _, info in cols):
+            W = np.column_stack([x for x, _ in cols])
+    if W is None:
+        W = splu(A.tocsc()).solve(B2)
+    W = W.reshape((G.shape[0],) + B.shape[1:])
+    reg = Ridge(alpha=alpha, random_state=42)
+    reg.coef_ = np.ascontiguousarray(W[:-1].T)
+    reg.intercept_ = W[-1]
+    reg.n_features_in_ = G.shape[0] - 1
+    return reg
+
+
+def _train_state(df_clf: pd.DataFrame, bundle: ModelBundle, text_cols: List[str]) -> Dict[str, Any]:
+    """Everything `update` needs to refit without re-reading or re-featurizing unchanged rows."""
+    keys, hashes = _row_keys(df_clf, text_cols)
+    state = {
+        "keys": keys,
+        "row_hashes": hashes,
+        "text_all": df_clf["text_all"].values.astype(object),
+        "types": df_clf[COL_SERVING_TYPE].astype(str).values.astype(object),
+        "sizes": df_clf[[COL_MIN, COL_G, COL_MAX]].astype(float).values,
+        "conf": df_clf[COL_CONF].astype(float).values,
+        "X_text": bundle.tfidf.transform(df_clf["text_all"]).tocsr(),
+    }
+    state.update(_state_stats(state, bundle.serving_type_labels))
+    return state
+
+
+def _state_stats(state: Dict[str, Any], labels: List[str], rows: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """Ridge sufficient statistics for the size and confidence models over state rows."""
+    idx = np.arange(len(state["keys"])) if rows is None else rows
+    sizes, conf = state["sizes"][idx], state["conf"][idx]
+    X_typed = _typed_features(state["X_text"][idx], state["types"][idx], labels)
+    sz = ~np.isnan(sizes).any(axis=1)
+    cf = ~np.isnan(conf)
+    return {"size_stats": _ridge_stats(X_typed[sz], sizes[sz]), "conf_stats": _ridge_stats(X_typed[cf], conf[cf])}
+
+
+def _state_frame(state: Dict[str, Any]) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "text_all": state["text_all"],
+            COL_SERVING_TYPE: state["types"],
+            COL_MIN: state["sizes"][:, 0],
+            COL_G: state["sizes"][:, 1],
+            COL_MAX: state["sizes"][:, 2],
+            COL_CONF: state["conf"],
+        }
+    )
+
+
+def train_models(
+    train_csv: str,
+    model_dir: str,
+    config: Optional[TrainConfig] = None,
+    search: bool = False,
+    cv_folds: int = 5,
+    n_jobs: int = -1,
+) -> ModelBundle:
+    df = pd.read_csv(train_csv)
+    text_cols = _infer_text_cols(df)
+    df = _ensure_target_columns(df)
+
+    # text_all is built once for the whole frame and shared by all three models
+    df["text_all"] = _build_text_all(df, text_cols)
+
+    # Basic training set filters
+    df_clf = df.dropna(subset=[COL_SERVING_TYPE]).copy()
+
+    config = config or TrainConfig()
+    search_report: Optional[Dict[str, Any]] = None
+    if search:
+        labels = sorted(df_clf[COL_SERVING_TYPE].unique().tolist())
+        config, search_report = search_train_config(df_clf, labels, n_splits=cv_folds, n_jobs=n_jobs, base=config)
+
+    bundle = _fit_bundle(df_clf, config)
+
+    extra_meta: Dict[str, Any] = {"text_cols_used": text_cols, "train_config": asdict(config)}
+    if search_report is not None:
+        extra_meta["search"] = search_report
+    _save_bundle(bundle, model_dir, extra_meta)
+    state = _train_state(df_clf, bundle, text_cols)
+    dump(state, os.path.join(model_dir, TRAIN_STATE_FILE))
+    _save_knn_index(model_dir, state)
+
+    return bundle
+
+
+def _in_sample_metrics(
+    bundle: ModelBundle, frame: pd.DataFrame, X_text: Optional[sparse.spmatrix] = None
+) -> Dict[str, float]:
+    if X_text is None:
+        X_text = bundle.tfidf.transform(frame["text_all"])
+    types = frame[COL_SERVING_TYPE].values
+    X_typed = _typed_features(X_text, types, bundle.serving_type_labels)
+    sizes = frame[[COL_MIN, COL_G, COL_MAX]].values
+    conf = frame[COL_CONF].values
+    sz = ~np.isnan(sizes).any(axis=1)
+    cf = ~np.isnan(conf)
+    return {
+        "clf_accuracy": float(np.mean(bundle.clf.predict(X_text) == types)),
+        "size_mae_g": float(np.mean(np.abs(bundle.size_reg.predict(X_typed[sz]) - sizes[sz]))),
+        "conf_mae": float(np.mean(np.abs(bundle.conf_reg.predict(X_typed[cf]) - conf[cf]))),
+    }
+
+
+def update_models(update_csv: str, model_dir: str, compare_full: bool = False) -> Optional[ModelBundle]:
+    """
+    Incrementally refit an existing bundle with new/changed labeled rows.
+
+    Rows are matched to the previous training set by food_id and compared by row hash;
+    only the delta is featurized (with the bundle's existing TF-IDF vocabulary). The size
+    and confidence Ridge models are re-solved exactly from cached sufficient statistics
+    (Z'Z, Z'Y) updated by the delta, the classifier is refit on the cached feature matrix
+    (warm-started where the solver supports it), and clip ranges / confidence levels are
+    recomputed. Rows introducing a new serving_type fall back to a full refit.
+    Returns None, leaving the saved models untouched, when there are no new or changed rows.
+    """
+    t_start = time.perf_counter()
+    state_path = os.path.join(model_dir, TRAIN_STATE_FILE)
+    if not os.path.exists(state_path):
+        raise FileNotFoundError(f"{state_path} not found; run `train` once before `update`.")
+    bundle = load_models(model_dir)
+    state = load(state_path)
+    with open(os.path.join(model_dir, "metadata.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    config = TrainConfig(**meta.get("train_config", {}))
+
+    df = _ensure_target_columns(pd.read_csv(update_csv))
+    # same text columns as the original training run, so text_all and row hashes line up
+    text_cols = [c for c in meta.get("text_cols_used", []) if c in df.columns] or _require_text_cols(df)
+    df_lab = df.dropna(subset=[COL_SERVING_TYPE]).copy()
+    df_lab["text_all"] = _build_text_all(df_lab, text_cols)
+
+    keys, hashes = _row_keys(df_lab, text_cols)
+    pos = {k: i for i, k in enumerate(state["keys"].tolist())}
+    old_idx = np.array([pos.get(k, -1) for k in keys.tolist()], dtype=np.int64)
+    is_delta = (old_idx < 0) | (state["row_hashes"][np.maximum(old_idx, 0)] != hashes)
+    # last occurrence wins when a key repeats within the update file
+    is_delta &= ~pd.Series(keys).duplicated(keep="last").values
+    delta = df_lab[is_delta]
+    old_idx, keys, hashes = old_idx[is_delta], keys[is_delta], hashes[is_delta]
+    n_changed, n_new = int((old_idx >= 0).sum()), int((old_idx < 0).sum())
+    print(f"[update] {n_new} new, {n_changed} changed, {len(df_lab) - len(delta)} unchanged labeled rows")
+    if delta.empty:
+        return None
+
+    t_fit = time.perf_counter()
+    labels = bundle.serving_type_labels
+    changed = old_idx[old_idx >= 0]
+    X_delta = bundle.tfidf.transform(delta["text_all"]).tocsr()
+    delta_state = {
+        "keys": keys,
+        "row_hashes": hashes,
+        "text_all": delta["text_all"].values.astype(object),
+        "types": delta[COL_SERVING_TYPE].astype(str).values.astype(object),
+        "sizes": delta[[COL_MIN, COL_G, COL_MAX]].astype(float).values,
+        "conf": delta[COL_CONF].astype(float).values,
+        "X_text": X_delta,
+    }
+
+    full_refit = not set(delta_state["types"]).issubset(labels)
+    if not full_refit:
+        # Remove the old contribution of changed rows, add the delta's.
+        old_stats = _state_stats(state, labels, rows=changed)
+        new_stats = _state_stats(delta_state, labels)
+        for name in ("size_stats", "conf_stats"):
+            G, B = state[name]
+            state[name] = (G - old_stats[name][0] + new_stats[name][0], B - old_stats[name][1] + new_stats[name][1])
+
+    # Merge the delta into the cached state: changed rows in place, new rows appended.
+    n_old = len(state["keys"])
+    take = np.arange(n_old)
+    take[changed] = n_old + np.flatnonzero(old_idx >= 0)
+    take = np.concatenate([take, n_old + np.flatnonzero(old_idx < 0)])
+    for name in ("keys", "row_hashes", "text_all", "types", "sizes", "conf"):
+        state[name] = np.concatenate([state[name], delta_state[name]])[take]
+    state["X_text"] = sparse.vstack([state["X_text"], X_delta], format="csr")[take]
+
+    frame = _state_frame(state)
+    if full_refit:
+        print("[update] new serving_type label(s) in delta; falling back to a full refit")
+        bundle = _fit_bundle(frame, config)
+        state["X_text"] = bundle.tfidf.transform(frame["text_all"]).tocsr()
+        state.update(_state_stats(state, bundle.serving_type_labels))
+    else:
+        if bundle.clf.solver != "liblinear":
+            bundle.clf.set_params(warm_start=True)
+        bundle.clf.fit(state["X_text"], state["types"])
+        bundle.size_reg = _solve_ridge(*state["size_stats"], alpha=config.size_alpha, warm=bundle.size_reg)
+        bundle.conf_reg = _solve_ridge(*state["conf_stats"], alpha=config.conf_alpha, warm=bundle.conf_reg)
+        df_sz = frame.dropna(subset=[COL_MIN, COL_G, COL_MAX])
+        bundle.clip_by_type = _compute_clip_ranges(df_sz, labels)
+        allowed_conf = sorted(frame[COL_CONF].dropna().astype(float).unique().tolist())
+        bundle.allowed_conf_levels = allowed_conf or DEFAULT_ALLOWED_CONF
+    fit_seconds = time.perf_counter() - t_fit
+
+    report: Dict[str, Any] = {
+        "new_rows": n_new,
+        "changed_rows": n_changed,
+        "total_rows": len(state["keys"]),
+        "full_refit": full_refit,
+        "fit_seconds": fit_seconds,
+        "metrics": _in_sample_metrics(bundle, frame, state["X_text"]),
+    }
+    if compare_full:
+        t0 = time.perf_counter()
+        full = _fit_bundle(frame, config)
+        full_seconds = time.perf_counter() - t0
+        ours, theirs = _predict_targets(bundle, frame["text_all"]), _predict_targets(full, frame["text_all"])
+        report["compare_full"] = {
+            "fit_seconds": full_seconds,
+            "metrics": _in_sample_metrics(full, frame),
+            "serving_type_agreement": float(np.mean(ours[COL_SERVING_TYPE] == theirs[COL_SERVING_TYPE])),
+            "size_g_mean_abs_diff": float(np.mean(np.abs(ours[COL_G] - theirs[COL_G]))),
+        }
+
+    report["total_seconds"] = time.perf_counter() - t_start
+    regenerated = ("serving_type_labels", "allowed_conf_levels", "clip_by_type", "target_cols", "bundle_hash")
+    extra_meta = {k: v for k, v in meta.items() if k not in regenerated}
+    extra_meta["last_update"] = report
+    _save_bundle(bundle, model_dir, extra_meta)
+    dump(state, state_path)
+    _save_knn_index(model_dir, state)
+
+    print(f"[update] refit in {fit_seconds:.2f}s (total {report['total_seconds']:.2f}s); in-sample {report['metrics']}")
+    if compare_full:
+        cmp = report["compare_full"]
+        print(
+            f"[update] full retrain: {cmp['fit_seconds']:.2f}s; in-sample {cmp['metrics']}; "
+            f"serving_type agreement {cmp['serving_type_agreement']:.3f}, "
+            f"mean |Δg| {cmp['size_g_mean_abs_diff']:.2f} g"
+        )
     return bundle
 
 
-def load_models(model_dir: str) -> ModelBundle:
+def load_models(model_dir: str, knn: bool = False) -> ModelBundle:
+    tfidf = load(os.path.join(model_dir, "text_tfidf.joblib"))
     clf = load(os.path.join(model_dir, "serving_type_clf.joblib"))
     size_reg = load(os.path.join(model_dir, "size_reg.joblib"))
     conf_reg = load(os.path.join(model_dir, "conf_reg.joblib"))
     with open(os.path.join(model_dir, "metadata.json"), "r", encoding="utf-8") as f:
         meta = json.load(f)
     return ModelBundle(
+        tfidf=tfidf,
         clf=clf,
         size_reg=size_reg,
         conf_reg=conf_reg,
         serving_type_labels=meta["serving_type_labels"],
         allowed_conf_levels=meta["allowed_conf_levels"],
         clip_by_type=meta["clip_by_type"],
+        bundle_hash=meta.get("bundle_hash") or _hash_bundle(model_dir, meta),
+        knn=KnnIndex.load(_knn_index_path(model_dir)) if knn else None,
     )
 
 
+def _knn_index_path(model_dir: str) -> str:
+    path = os.path.join(model_dir, KNN_INDEX_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found; run `train` (or `update`) to build the kNN index.")
+    return path
+
+
+def export_bundle(model_dir: str, out_path: Optional[str] = None) -> str:
+    """
+    Flatten a trained bundle into plain arrays in a single .npz (no pickles):
+    vocabulary + idf, LR coefficients, both Ridge coefficient sets and the clip tables.
+    serving_scorer.py loads it with NumPy/SciPy only and reproduces apply's predictions.
+    """
+    bundle = load_models(model_dir)
+    tfidf, clf = bundle.tfidf, bundle.clf
+
+    # The scorer re-implements the default word analyzer + l2-normalized TF-IDF only.
+    if (
+        tfidf.analyzer != "word"
+        or tuple(tfidf.ngram_range) != (1, 1)
+        or not tfidf.lowercase
+        or tfidf.strip_accents
+        or tfidf.stop_words
+        or tfidf.sublinear_tf
+        or tfidf.norm != "l2"
+        or not tfidf.use_idf
+    ):
+        raise ValueError("export supports only the default unigram l2 TF-IDF featurizer")
+
+    # Same rule LogisticRegression.predict_proba uses to pick one-vs-rest vs softmax.
+    multi_class = getattr(clf, "multi_class", "auto")
+    ovr = multi_class in ("ovr", "warn") or (
+        multi_class in ("auto", "deprecated")
+        and (len(clf.classes_) <= 2 or clf.solver in ("liblinear", "newton-cholesky"))
+    )
+
+    clip_types = list(bundle.clip_by_type.keys())
+    cols = [COL_MIN, COL_G, COL_MAX]
+    clip_lo = np.array([[bundle.clip_by_type[st][c][0] for c in cols] for st in clip_types], dtype=float).reshape(-1, 3)
+    clip_hi = np.array([[bundle.clip_by_type[st][c][1] for c in cols] for st in clip_types], dtype=float).reshape(-1, 3)
+
+    vocab = sorted(tfidf.vocabulary_, key=tfidf.vocabulary_.get)
+    meta = {
+        "format_version": EXPORT_FORMAT_VERSION,
+        "bundle_hash": bundle.bundle_hash,
+        "token_pattern": tfidf.token_pattern,
+        "proba": "ovr" if ovr else "multinomial",
+        "serving_type_labels": bundle.serving_type_labels,
+        "allowed_conf_levels": bundle.allowed_conf_levels,
+        "clip_types": clip_types,
+        "text_col_candidates": TEXT_COL_CANDIDATES,
+        "cols": {"serving_type": COL_SERVING_TYPE, "min": COL_MIN, "g": COL_G, "max": COL_MAX, "conf": COL_CONF},
+    }
+
+    out_path = out_path or os.path.join(model_dir, DEFAULT_EXPORT_FILE)
+    np.savez(
+        out_path,
+        meta_json=np.array(json.dumps(meta, ensure_ascii=False)),
+        vocab=np.array(vocab, dtype=str),
+        idf=np.asarray(tfidf.idf_, dtype=float),
+        clf_classes=np.array([str(c) for c in clf.classes_], dtype=str),
+        clf_coef=np.asarray(clf.coef_, dtype=float),
+        clf_intercept=np.asarray(clf.intercept_, dtype=float),
+        size_coef=np.asarray(bundle.size_reg.coef_, dtype=float),
+        size_intercept=np.asarray(bundle.size_reg.intercept_, dtype=float),
+        conf_coef=np.asarray(bundle.conf_reg.coef_, dtype=float),
+        conf_intercept=np.atleast_1d(np.asarray(bundle.conf_reg.intercept_, dtype=float)),
+        clip_lo=clip_lo,
+        clip_hi=clip_hi,
+    )
+    return out_path
+
+
 def _ensure_target_columns(df: pd.DataFrame) -> pd.DataFrame:
     for c in TARGET_COLS:
         if c not in df.columns:
@@ -237,17 +1002,7 @@ def _ensure_target_columns(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def apply_models(
-    in_csv: str,
-    out_csv: str,
-    model_dir: str,
-    overwrite: bool = False,
-) -> None:
-    bundle = load_models(model_dir)
-
-    df = pd.read_csv(in_csv)
-    df = _ensure_target_columns(df)
-
+def _require_text_cols(df: pd.DataFrame) -> List[str]:
     text_cols = _infer_text_cols(df)
     if not text_cols:
         raise ValueError(
@@ -255,55 +1010,47 @@ def apply_models(
             f"Expected one of: {TEXT_COL_CANDIDATES}. "
             f"Found columns: {list(df.columns)[:50]}..."
         )
+    return text_cols
 
-    # Only fill rows where at least one target col is missing (unless overwrite).
-    if overwrite:
-        mask = np.ones(len(df), dtype=bool)
-    else:
-        mask = df[TARGET_COLS].isna().any(axis=1)
 
-    if mask.sum() == 0:
-        # Nothing to do; still write output to be explicit/consistent.
-        df.to_csv(out_csv, index=False)
-        return
+def _predict_targets(bundle: ModelBundle, text_all: pd.Series) -> Dict[str, np.ndarray]:
+    """
+    Run the three models on text_all and return the target columns, ready to write back.
+    With bundle.knn loaded, sizes come from the nearest training rows where any match and
+    the neighbours are returned under COL_KNN_NEIGHBOURS.
+    Every row is scored independently, so results do not depend on how rows are batched.
+    """
+    n = len(text_all)
 
-    work = df.loc[mask].copy()
-    work["text_all"] = work.apply(lambda r: _build_text_all(r, text_cols), axis=1)
+    # Text features are computed once and shared by all three models
+    X_text = bundle.tfidf.transform(text_all)
 
     # 1) Predict serving_type + probability
     if hasattr(bundle.clf, "predict_proba"):
-        proba = bundle.clf.predict_proba(work["text_all"])
+        proba = bundle.clf.predict_proba(X_text)
         pred_idx = np.argmax(proba, axis=1)
         pred_type = np.array(bundle.clf.classes_)[pred_idx]
-        pred_type_prob = proba[np.arange(len(work)), pred_idx]
+        pred_type_prob = proba[np.arange(n), pred_idx]
     else:
-        pred_type = bundle.clf.predict(work["text_all"])
-        pred_type_prob = np.full(len(work), 0.6, dtype=float)  # fallback
+        pred_type = bundle.clf.predict(X_text)
+        pred_type_prob = np.full(n, 0.6, dtype=float)  # fallback
 
     # Force predictions into the master label set from training.
-    pred_type = np.array([p if p in set(bundle.serving_type_labels) else "portion" for p in pred_type], dtype=object)
+    known = pd.Series(pred_type).isin(bundle.serving_type_labels).values
+    pred_type = np.where(known, np.asarray(pred_type, dtype=object), "portion").astype(object)
 
     # 2) Predict sizes using predicted serving_type
-    X_sz = pd.DataFrame({"text_all": work["text_all"].values, COL_SERVING_TYPE: pred_type})
-    sz_pred = bundle.size_reg.predict(X_sz)
+    X_typed = _typed_features(X_text, pred_type, bundle.serving_type_labels)
+    sz_pred = bundle.size_reg.predict(X_typed)
     sz_pred = np.asarray(sz_pred, dtype=float)
 
-    # enforce positive and clip by serving_type quantiles
-    min_pred = np.maximum(0.0, sz_pred[:, 0])
-    g_pred = np.maximum(0.0, sz_pred[:, 1])
-    max_pred = np.maximum(0.0, sz_pred[:, 2])
-
-    # type-based clipping
-    for i, st in enumerate(pred_type):
-        clip = bundle.clip_by_type.get(st)
-        if not clip:
-            continue
-        lo, hi = clip[COL_MIN]
-        min_pred[i] = float(np.clip(min_pred[i], lo, hi))
-        lo, hi = clip[COL_G]
-        g_pred[i] = float(np.clip(g_pred[i], lo, hi))
-        lo, hi = clip[COL_MAX]
-        max_pred[i] = float(np.clip(max_pred[i], lo, hi))
+    # enforce positive, then type-based clipping by serving_type quantiles
+    sz_pred = _clip_sizes_by_type(pred_type, np.maximum(0.0, sz_pred), bundle.clip_by_type)
+    if bundle.knn is not None:
+        # neighbour sizes are observed servings, so they replace the Ridge values unclipped
+        knn_sizes, neighbours, found = bundle.knn.query(text_all, pred_type)
+        sz_pred[found] = knn_sizes[found]
+    min_pred, g_pred, max_pred = sz_pred[:, 0], sz_pred[:, 1], sz_pred[:, 2]
 
     # consistency: min <= g <= max
     min_pred = np.minimum(min_pred, g_pred)
@@ -311,8 +1058,7 @@ def apply_models(
     max_pred = np.maximum(max_pred, min_pred + 1.0)
 
     # 3) Predict confidence using confidence regressor + derived signal from type probability
-    X_cf = pd.DataFrame({"text_all": work["text_all"].values, COL_SERVING_TYPE: pred_type})
-    conf_pred = bundle.conf_reg.predict(X_cf).astype(float)
+    conf_pred = bundle.conf_reg.predict(X_typed).astype(float)
 
     # derived confidence from classifier probability (maps 0..1 -> 0.50..0.90)
     conf_from_type = 0.50 + 0.40 * np.clip(pred_type_prob, 0.0, 1.0)
@@ -323,14 +1069,356 @@ def apply_models(
     # snap to the discrete confidence levels seen in training
     conf = _snap_to_levels(conf, bundle.allowed_conf_levels)
 
+    preds = {
+        COL_SERVING_TYPE: pred_type,
+        COL_MIN: np.round(min_pred, 0).astype(int),
+        COL_G: np.round(g_pred, 0).astype(int),
+        COL_MAX: np.round(max_pred, 0).astype(int),
+        COL_CONF: conf.astype(float),
+    }
+    if bundle.knn is not None:
+        preds[COL_KNN_NEIGHBOURS] = neighbours
+    return preds
+
+
+def _normalize_text_key(text_all: pd.Series) -> np.ndarray:
+    """
+    Cache key for a row: 64-bit blake2b of text_all lowercased with whitespace runs collapsed.
+    The TF-IDF featurizer lowercases and tokenizes on word characters, so rows with
+    the same normalized text always get the same features (and therefore the same predictions).
+    """
+    def _key(t: str) -> int:
+        digest = hashlib.blake2b(" ".join(t.lower().split()).encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big", signed=True)
+
+    return np.array([_key(t) for t in text_all.astype(str).tolist()], dtype=np.int64)
+
+
+class PredictionCache:
+    """
+    Persistent (SQLite) LRU cache of predictions keyed by normalized text_all for one bundle.
+    The cache records the bundle hash it was filled with and is cleared when opened with a
+    different bundle, so retraining invalidates it; least recently used entries are evicted
+    beyond max_entries. kNN-mode predictions are cached under the bundle hash + index hash,
+    with their neighbour evidence.
+    """
+
+    def __init__(self, path: str, bundle_hash: str, max_entries: int = DEFAULT_CACHE_MAX_ENTRIES) -> None:
+        self.path = path
+        self.bundle_hash = bundle_hash
+        self.max_entries = int(max_entries)
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            " key INTEGER PRIMARY KEY,"
+            " serving_type TEXT, size_min INTEGER, size_g INTEGER, size_max INTEGER, conf REAL,"
+            " last_used INTEGER NOT NULL, neighbours TEXT)"
+        )
+        columns = {r[1] for r in self.conn.execute("PRAGMA table_info(predictions)")}
+        if "neighbours" not in columns:  # cache files from before --size_mode knn
+            self.conn.execute("ALTER TABLE predictions ADD COLUMN neighbours TEXT")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS predictions_lru ON predictions (last_used)")
+        row = self.conn.execute("SELECT value FROM meta WHERE name = 'bundle_hash'").fetchone()
+        if row is None or row[0] != bundle_hash:
+            self.conn.execute("DELETE FROM predictions")
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('bundle_hash', ?)", (bundle_hash,))
+        self._evict()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def get_many(self, keys: List[int]) -> Dict[int, Tuple]:
+        # Stage the lookup keys in a temp table so the hit query and the LRU touch are single joins.
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS lookup (key INTEGER PRIMARY KEY)")
+        self.conn.execute("DELETE FROM lookup")
+        self.conn.executemany("INSERT OR IGNORE INTO lookup VALUES (?)", ((k,) for k in keys))
+        rows = self.conn.execute(
+            "SELECT p.key, p.serving_type, p.size_min, p.size_g, p.size_max, p.conf, p.neighbours"
+            " FROM lookup l JOIN predictions p ON p.key = l.key"
+        ).fetchall()
+        self.conn.execute(
+            "UPDATE predictions SET last_used = ? WHERE key IN (SELECT key FROM lookup)",
+            (time.time_ns(),),
+        )
+        self.conn.commit()
+        found = {r[0]: r[1:] for r in rows}
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, keys: List[int], preds: Dict[str, np.ndarray]) -> None:
+        now = time.time_ns()
+        neighbours = preds[COL_KNN_NEIGHBOURS].tolist() if COL_KNN_NEIGHBOURS in preds else [None] * len(keys)
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO predictions"
+            " (key, serving_type, size_min, size_g, size_max, conf, last_used, neighbours)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            zip(
+                keys,
+                preds[COL_SERVING_TYPE].tolist(),
+                preds[COL_MIN].tolist(),
+                preds[COL_G].tolist(),
+                preds[COL_MAX].tolist(),
+                preds[COL_CONF].tolist(),
+                [now] * len(keys),
+                neighbours,
+            ),
+        )
+        self._evict()
+
+    def _evict(self) -> None:
+        (n,) = self.conn.execute("SELECT COUNT(*) FROM predictions").fetchone()
+        if n > self.max_entries:
+            self.conn.execute(
+                "DELETE FROM predictions WHERE key IN"
+                " (SELECT key FROM predictions ORDER BY last_used LIMIT ?)",
+                (n - self.max_entries,),
+            )
+        self.conn.commit()
+
+
+# Per-process bundle for parallel apply (loaded once by _init_worker in each pool worker).
+_WORKER_BUNDLE: Optional[ModelBundle] = None
+
+
+def _init_worker(model_dir: str, knn: bool = False) -> None:
+    global _WORKER_BUNDLE
+    _WORKER_BUNDLE = load_models(model_dir, knn=knn)
+
+
+def _worker_predict(text_all: pd.Series) -> Dict[str, np.ndarray]:
+    assert _WORKER_BUNDLE is not None, "worker bundle not initialised"
+    return _predict_targets(_WORKER_BUNDLE, text_all)
+
+
+def predict_frame(
+    model: Union[ModelBundle, "_Predictor"], df: pd.DataFrame, text_cols: Optional[List[str]] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Target predictions (plus COL_KNN_NEIGHBOURS with a kNN index) for the rows of df.
+
+    The public entry point for scoring a frame: serving_server.py calls it with a loaded
+    ModelBundle, apply with its _Predictor (workers / cache). text_cols default to the ones
+    inferred from df; ValueError if df has none.
+    """
+    text_all = _build_text_all(df, text_cols or _require_text_cols(df))
+    if isinstance(model, ModelBundle):
+        return _predict_targets(model, text_all)
+    return model(text_all)
+
+
+class _Predictor:
+    """
+    Scores text_all either in-process or across a pool of worker processes.
+    Parallel mode splits rows into contiguous parts and reassembles them in the
+    original order, so results match the serial path exactly.
+    """
+
+    def __init__(
+        self,
+        model_dir: str,
+        workers: int = 1,
+        cache_path: Optional[str] = None,
+        cache_max_entries: int = DEFAULT_CACHE_MAX_ENTRIES,
+        size_mode: str = "ridge",
+    ) -> None:
+        if size_mode not in ("ridge", "knn"):
+            raise ValueError(f"Unknown size_mode: {size_mode}")
+        self.workers = max(1, int(workers))
+        self.knn = size_mode == "knn"
+        self.rows = 0
+        self.seconds = 0.0
+        self.bundle: Optional[ModelBundle] = None
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.cache: Optional[PredictionCache] = None
+        if self.workers > 1:
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker, initargs=(model_dir, self.knn)
+            )
+        else:
+            self.bundle = load_models(model_dir, knn=self.knn)
+        if cache_path:
+            bundle = self.bundle or load_models(model_dir, knn=self.knn)
+            cache_hash = bundle.bundle_hash + (f":knn:{bundle.knn.index_hash}" if bundle.knn else "")
+            self.cache = PredictionCache(cache_path, cache_hash, max_entries=cache_max_entries)
+
+    def __enter__(self) -> "_Predictor":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.pool is not None:
+            self.pool.shutdown()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __call__(self, text_all: pd.Series) -> Dict[str, np.ndarray]:
+        t0 = time.perf_counter()
+        if self.cache is None:
+            preds = self._predict(text_all)
+        else:
+            preds = self._predict_cached(text_all)
+        self.seconds += time.perf_counter() - t0
+        self.rows += len(text_all)
+        return preds
+
+    def _predict_cached(self, text_all: pd.Series) -> Dict[str, np.ndarray]:
+        codes, uniq = pd.factorize(_normalize_text_key(text_all))
+        keys = uniq.tolist()
+        found = self.cache.get_many(keys)
+
+        # Score each distinct missing key once (first row carrying it).
+        missing = [i for i, k in enumerate(keys) if k not in found]
+        if missing:
+            first_row = np.unique(codes, return_index=True)[1]
+            new = self._predict(text_all.iloc[first_row[missing]])
+            new_keys = [keys[i] for i in missing]
+            self.cache.put_many(new_keys, new)
+            for j, k in enumerate(new_keys):
+                found[k] = tuple(new[c][j] for c in (COL_SERVING_TYPE, COL_MIN, COL_G, COL_MAX, COL_CONF)) + (
+                    new[COL_KNN_NEIGHBOURS][j] if self.knn else None,
+                )
+
+        vals = [found[k] for k in keys]
+        per_key = {
+            COL_SERVING_TYPE: np.array([v[0] for v in vals], dtype=object),
+            COL_MIN: np.array([v[1] for v in vals], dtype=int),
+            COL_G: np.array([v[2] for v in vals], dtype=int),
+            COL_MAX: np.array([v[3] for v in vals], dtype=int),
+            COL_CONF: np.array([v[4] for v in vals], dtype=float),
+        }
+        if self.knn:
+            per_key[COL_KNN_NEIGHBOURS] = np.array([v[5] for v in vals], dtype=object)
+        return {col: arr[codes] for col, arr in per_key.items()}
+
+    def _predict(self, text_all: pd.Series) -> Dict[str, np.ndarray]:
+        if self.pool is None:
+            preds = _predict_targets(self.bundle, text_all)
+        else:
+            # a few parts per worker keeps the pool balanced without much pickling overhead
+            n_parts = max(1, min(len(text_all), self.workers * 4))
+            bounds = np.linspace(0, len(text_all), n_parts + 1).astype(int)
+            parts = [text_all.iloc[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+            results = list(self.pool.map(_worker_predict, parts))
+            preds = {col: np.concatenate([r[col] for r in results]) for col in results[0]}
+        return preds
+
+
+def _ensure_neighbour_column(df: pd.DataFrame) -> pd.DataFrame:
+    # present in every chunk (also those with nothing to fill) so chunked headers line up
+    if COL_KNN_NEIGHBOURS not in df.columns:
+        df[COL_KNN_NEIGHBOURS] = pd.Series(np.nan, index=df.index, dtype=object)
+    return df
+
+
+def _fill_frame(df: pd.DataFrame, predict: _Predictor, text_cols: List[str], overwrite: bool) -> pd.DataFrame:
+    if predict.knn:
+        df = _ensure_neighbour_column(df)
+    # Only fill rows where at least one target col is missing (unless overwrite).
+    if overwrite:
+        mask = np.ones(len(df), dtype=bool)
+    else:
+        mask = df[TARGET_COLS].isna().any(axis=1)
+
+    if mask.sum() == 0:
+        # Nothing to do; caller still writes the frame to be explicit/consistent.
+        return df
+
+    preds = predict_frame(predict, df.loc[mask], text_cols)
+
     # Write back ONLY target cols
-    df.loc[mask, COL_SERVING_TYPE] = pred_type
-    df.loc[mask, COL_MIN] = np.round(min_pred, 0).astype(int)
-    df.loc[mask, COL_G] = np.round(g_pred, 0).astype(int)
-    df.loc[mask, COL_MAX] = np.round(max_pred, 0).astype(int)
-    df.loc[mask, COL_CONF] = conf.astype(float)
+    for col, values in preds.items():
+        df.loc[mask, col] = values
+    return df
+
+
+def _scan_csv_dtypes(in_csv: str, chunksize: int) -> Dict[str, np.dtype]:
+    """
+    First pass over the CSV in bounded chunks: the dtype each column would get from a
+    single full read (numeric chunks widen to a common numeric type, anything else -> object).
+    Pinning these on the second pass keeps chunked output formatting identical to in-memory.
+    """
+    dtypes: Dict[str, np.dtype] = {}
+    for chunk in pd.read_csv(in_csv, chunksize=chunksize):
+        for c, dt in chunk.dtypes.items():
+            prev = dtypes.get(c)
+            if prev is None or prev == dt:
+                dtypes[c] = dt
+            elif prev.kind in "iuf" and dt.kind in "iuf":
+                dtypes[c] = np.result_type(prev, dt)
+            else:
+                dtypes[c] = np.dtype(object)
+    return dtypes
+
+
+def _apply_chunked(
+    predict: _Predictor, in_csv: str, out_csv: str, overwrite: bool, chunksize: int, derive_gl: bool = False
+) -> None:
+    dtypes = _scan_csv_dtypes(in_csv, chunksize)
+
+    text_cols: Optional[List[str]] = None
+    first = True
+    for chunk in pd.read_csv(in_csv, chunksize=chunksize, dtype=dtypes):
+        chunk = _ensure_target_columns(chunk)
+        if text_cols is None:
+            text_cols = _require_text_cols(chunk)
+        chunk = _fill_frame(chunk, predict, text_cols, overwrite)
+        if derive_gl:
+            chunk = gl_derive.derive_frame(chunk)
+        chunk.to_csv(out_csv, index=False, mode="w" if first else "a", header=first)
+        first = False
+
+    if first:
+        # Header-only input: still write the (header-only) output.
+        df = _ensure_target_columns(pd.read_csv(in_csv, nrows=0))
+        _require_text_cols(df)
+        if predict.knn:
+            df = _ensure_neighbour_column(df)
+        if derive_gl:
+            df = gl_derive.derive_frame(df)
+        df.to_csv(out_csv, index=False)
 
-    df.to_csv(out_csv, index=False)
+
+def apply_models(
+    in_csv: str,
+    out_csv: str,
+    model_dir: str,
+    overwrite: bool = False,
+    chunksize: Optional[int] = None,
+    workers: int = 1,
+    cache_path: Optional[str] = None,
+    cache_max_entries: int = DEFAULT_CACHE_MAX_ENTRIES,
+    derive_gl: bool = False,
+    size_mode: str = "ridge",
+) -> None:
+    predictor = _Predictor(
+        model_dir, workers=workers, cache_path=cache_path, cache_max_entries=cache_max_entries, size_mode=size_mode
+    )
+    with predictor as predict:
+        if chunksize:
+            # Stream bounded chunks through the loaded bundle, appending to out_csv as we go.
+            _apply_chunked(predict, in_csv, out_csv, overwrite, chunksize, derive_gl)
+        else:
+            df = pd.read_csv(in_csv)
+            df = _ensure_target_columns(df)
+
+            text_cols = _require_text_cols(df)
+            df = _fill_frame(df, predict, text_cols, overwrite)
+            if derive_gl:
+                # recompute per-serving carbs/GL from the (possibly new) serving sizes
+                df = gl_derive.derive_frame(df)
+
+            df.to_csv(out_csv, index=False)
+
+    if predict.rows:
+        print(
+            f"[apply] predicted {predict.rows} rows in {predict.seconds:.2f}s "
+            f"({predict.rows / max(predict.seconds, 1e-9):,.0f} rows/s, workers={predict.workers}, sizes={size_mode})"
+        )
+    if predict.cache is not None:
+        print(f"[apply] cache: {predict.cache.hits} hits, {predict.cache.misses} misses ({cache_path})")
 
 
 def _build_arg_parser() -> argparse.ArgumentParser:
@@ -340,12 +1428,75 @@ def _build_arg_parser() -> argparse.ArgumentParser:
     p_train = sub.add_parser("train", help="Train models from a labeled master CSV.")
     p_train.add_argument("--train_csv", required=True, help="Path to training CSV (master sheet).")
     p_train.add_argument("--model_dir", required=True, help="Directory to write trained models + metadata.")
+    p_train.add_argument(
+        "--search",
+        action="store_true",
+        help="Cross-validated hyperparameter search before the final fit (results go to metadata.json).",
+    )
+    p_train.add_argument("--cv_folds", type=int, default=5, help="Number of CV folds for --search.")
+    p_train.add_argument("--n_jobs", type=int, default=-1, help="Parallel jobs for --search (-1 = all cores).")
+    p_train.add_argument(
+        "--clf_solver",
+        default=TrainConfig.clf_solver,
+        choices=["lbfgs", "newton-cg", "sag", "saga"],
+        help="LogisticRegression solver for the serving_type classifier (multiclass-capable solvers only). "
+        "The default changed from liblinear to lbfgs, so models trained with the default differ from older ones. "
+        "--search also searches the solver.",
+    )
 
     p_apply = sub.add_parser("apply", help="Apply models to a new CSV, filling only serving columns.")
     p_apply.add_argument("--in_csv", required=True, help="Input CSV to fill.")
     p_apply.add_argument("--out_csv", required=True, help="Output CSV to write.")
     p_apply.add_argument("--model_dir", required=True, help="Directory containing trained models + metadata.")
     p_apply.add_argument("--overwrite", action="store_true", help="Overwrite existing values in target columns.")
+    p_apply.add_argument(
+        "--chunksize",
+        type=int,
+        default=None,
+        help="Stream the input in chunks of N rows (bounded memory) instead of loading it whole.",
+    )
+    p_apply.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes for prediction (each loads the model bundle once).",
+    )
+    p_apply.add_argument(
+        "--cache",
+        action="store_true",
+        help=f"Reuse cached predictions for unchanged rows (<model_dir>/{DEFAULT_CACHE_FILE}).",
+    )
+    p_apply.add_argument("--cache_path", default=None, help="Prediction cache file (implies --cache).")
+    p_apply.add_argument(
+        "--derive_gl",
+        action="store_true",
+        help="Append per-100g/per-serving carbs, GL and gl_category recomputed from the filled sizes (gl_derive.py).",
+    )
+    p_apply.add_argument(
+        "--size_mode",
+        choices=["ridge", "knn"],
+        default="ridge",
+        help=f"Serving sizes from the Ridge regressor or from the nearest labeled rows ({KNN_INDEX_FILE}).",
+    )
+    p_apply.add_argument(
+        "--cache_max_entries",
+        type=int,
+        default=DEFAULT_CACHE_MAX_ENTRIES,
+        help="Evict least recently used cache entries beyond this size.",
+    )
+
+    p_update = sub.add_parser("update", help="Incrementally refit a trained bundle with new/changed labeled rows.")
+    p_update.add_argument("--update_csv", required=True, help="CSV with new/changed labeled rows (or the whole master).")
+    p_update.add_argument("--model_dir", required=True, help="Directory with a bundle written by `train`.")
+    p_update.add_argument(
+        "--compare_full",
+        action="store_true",
+        help="Also fit a full retrain in memory and report time/accuracy against the incremental update.",
+    )
+
+    p_export = sub.add_parser("export", help="Export a trained bundle to a flat .npz for serving_scorer.py.")
+    p_export.add_argument("--model_dir", required=True, help="Directory containing trained models + metadata.")
+    p_export.add_argument("--out", default=None, help=f"Output .npz path (default: <model_dir>/{DEFAULT_EXPORT_FILE}).")
 
     return p
 
@@ -354,11 +1505,40 @@ def main() -> None:
     args = _build_arg_parser().parse_args()
 
     if args.cmd == "train":
-        train_models(args.train_csv, args.model_dir)
+        train_models(
+            args.train_csv,
+            args.model_dir,
+            config=TrainConfig(clf_solver=args.clf_solver),
+            search=args.search,
+            cv_folds=args.cv_folds,
+            n_jobs=args.n_jobs,
+        )
         print(f"✅ Trained models saved to: {args.model_dir}")
     elif args.cmd == "apply":
-        apply_models(args.in_csv, args.out_csv, args.model_dir, overwrite=bool(args.overwrite))
+        cache_path = args.cache_path
+        if args.cache and not cache_path:
+            cache_path = os.path.join(args.model_dir, DEFAULT_CACHE_FILE)
+        apply_models(
+            args.in_csv,
+            args.out_csv,
+            args.model_dir,
+            overwrite=bool(args.overwrite),
+            chunksize=args.chunksize,
+            workers=args.workers,
+            cache_path=cache_path,
+            cache_max_entries=args.cache_max_entries,
+            derive_gl=args.derive_gl,
+            size_mode=args.size_mode,
+        )
         print(f"✅ Wrote filled CSV to: {args.out_csv}")
+    elif args.cmd == "update":
+        if update_models(args.update_csv, args.model_dir, compare_full=args.compare_full) is None:
+            print(f"✅ No changes; models left as-is in: {args.model_dir}")
+        else:
+            print(f"✅ Updated models saved to: {args.model_dir}")
+    elif args.cmd == "export":
+        out_path = export_bundle(args.model_dir, args.out)
+        print(f"✅ Exported model bundle to: {out_path}")
     else:
         raise RuntimeError("Unknown command")
 
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Lightweight serving size/serving type scorer (NumPy + SciPy only).
+
+What it does
+- Loads the flat .npz written by `serving_model.py export` (plain arrays, no pickles,
+  no sklearn import) and reproduces `serving_model.py apply` predictions:
+  serving_type, Serving size min/G/Max and Serving size confidence.
+
+Usage
+  Python:
+    from serving_scorer import load_scorer
+    scorer = load_scorer("models/serving_bundle.npz")
+    preds = scorer.predict_rows([{"canonical_name": "Masala dosa", "primary_category": "Breakfast"}])
+
+  CLI (writes the input columns plus the five predicted columns; like apply, only rows
+  with a missing target are filled unless --overwrite):
+    python serving_scorer.py --bundle <bundle.npz> --in_csv <input.csv> --out_csv <output.csv>
+    python serving_scorer.py --bundle <bundle.npz> --in_csv <input.csv> --out_csv <output.csv> --overwrite
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Mapping
+
+import numpy as np
+from scipy import sparse
+
+SUPPORTED_FORMAT_VERSION = 1
+
+# pandas.read_csv's default NA strings (keep_default_na), so the CLI sees the same missing cells as apply
+NA_VALUES = frozenset([
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+])
+
+
+def _expit(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _softmax(x: np.ndarray) -> np.ndarray:
+    x = x - x.max(axis=1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=1, keepdims=True)
+    return x
+
+
+def build_text_all(rows: Iterable[Mapping[str, Any]], text_cols: List[str]) -> List[str]:
+    """Same " | " join of non-empty, stripped text columns as serving_model._build_text_all."""
+    out: List[str] = []
+    for row in rows:
+        parts: List[str] = []
+        for c in text_cols:
+            v = row.get(c)
+            if v is None or (isinstance(v, float) and math.isnan(v)):
+                continue
+            v = str(v).strip()
+            if v:
+                parts.append(v)
+        out.append(" | ".join(parts))
+    return out
+
+
+class Scorer:
+    def __init__(self, path: str) -> None:
+        with np.load(path, allow_pickle=False) as z:
+            arrays = {k: z[k] for k in z.files}
+        self.meta: Dict[str, Any] = json.loads(str(arrays["meta_json"]))
+        if self.meta.get("format_version") != SUPPORTED_FORMAT_VERSION:
+            raise ValueError(f"Unsupported bundle format: {self.meta.get('format_version')}")
+
+        self.vocab: Dict[str, int] = {t: i for i, t in enumerate(arrays["vocab"].tolist())}
+        self.idf = arrays["idf"]
+        self.token_re = re.compile(self.meta["token_pattern"])
+        self.classes = arrays["clf_classes"].astype(object)
+        self.clf_coef = arrays["clf_coef"]
+        self.clf_intercept = arrays["clf_intercept"]
+        self.size_coef = arrays["size_coef"]
+        self.size_intercept = arrays["size_intercept"]
+        self.conf_coef = arrays["conf_coef"]
+        self.conf_intercept = arrays["conf_intercept"]
+
+        self.labels: List[str] = self.meta["serving_type_labels"]
+        self.label_index = {st: i for i, st in enumerate(self.labels)}
+        self.conf_levels = np.array(self.meta["allowed_conf_levels"], dtype=float)
+
+        # clip lookup: one row per clip type plus a trailing unbounded row for unknown types
+        self.clip_index = {st: i for i, st in enumerate(self.meta["clip_types"])}
+        self.clip_lo = np.vstack([arrays["clip_lo"], np.full((1, 3), -np.inf)])
+        self.clip_hi = np.vstack([arrays["clip_hi"], np.full((1, 3), np.inf)])
+        self.cols: Dict[str, str] = self.meta["cols"]
+
+    @property
+    def text_cols(self) -> List[str]:
+        return list(self.meta["text_col_candidates"])
+
+    def transform(self, texts: List[str]) -> sparse.csr_matrix:
+        """Unigram counts over the exported vocabulary -> idf weighting -> row l2 normalization."""
+        indptr = [0]
+        indices: List[int] = []
+        data: List[float] = []
+        vocab = self.vocab
+        for t in texts:
+            counts = Counter(i for i in (vocab.get(tok) for tok in self.token_re.findall(t.lower())) if i is not None)
+            indices.extend(counts.keys())
+            data.extend(counts.values())
+            indptr.append(len(indices))
+        X = sparse.csr_matrix(
+            (np.array(data, dtype=float), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+            shape=(len(texts), len(vocab)),
+        )
+        X.sort_indices()
+        X.data *= self.idf[X.indices]
+        norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+        norms[norms == 0.0] = 1.0
+        X.data /= np.repeat(norms, np.diff(X.indptr))
+        return X
+
+    def _typed(self, X: sparse.csr_matrix, types: np.ndarray) -> sparse.csr_matrix:
+        codes = np.array([self.label_index.get(t, -1) for t in types], dtype=np.int64)
+        known = np.flatnonzero(codes >= 0)
+        onehot = sparse.csr_matrix(
+            (np.ones(len(known)), (known, codes[known])), shape=(len(types), len(self.labels))
+        )
+        return sparse.hstack([X, onehot], format="csr")
+
+    def predict_proba(self, X: sparse.csr_matrix) -> np.ndarray:
+        decision = np.asarray(X @ self.clf_coef.T) + self.clf_intercept
+        if self.meta["proba"] == "ovr":
+            if decision.shape[1] == 1:
+                p = _expit(decision.ravel())
+                return np.column_stack([1.0 - p, p])
+            p = _expit(decision)
+            return p / p.sum(axis=1, keepdims=True)
+        if decision.shape[1] == 1:
+            decision = np.column_stack([-decision.ravel(), decision.ravel()])
+        return _softmax(decision)
+
+    def predict_texts(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """Predictions for text_all strings, keyed by the master column names."""
+        n = len(texts)
+        X = self.transform(texts)
+
+        proba = self.predict_proba(X)
+        pred_idx = np.argmax(proba, axis=1)
+        pred_type = self.classes[pred_idx]
+        pred_type_prob = proba[np.arange(n), pred_idx]
+        pred_type = np.array([t if t in self.label_index else "portion" for t in pred_type], dtype=object)
+
+        X_typed = self._typed(X, pred_type)
+        sz = np.maximum(0.0, np.asarray(X_typed @ self.size_coef.T) + self.size_intercept)
+        codes = np.array([self.clip_index.get(t, -1) for t in pred_type], dtype=np.int64)
+        sz = np.clip(sz, self.clip_lo[codes], self.clip_hi[codes])
+        min_pred, g_pred, max_pred = sz[:, 0], sz[:, 1], sz[:, 2]
+        min_pred = np.minimum(min_pred, g_pred)
+        max_pred = np.maximum(max_pred, g_pred)
+        max_pred = np.maximum(max_pred, min_pred + 1.0)
+
+        conf_pred = np.asarray(X_typed @ self.conf_coef.T).ravel() + self.conf_intercept[0]
+        conf = 0.5 * conf_pred + 0.5 * (0.50 + 0.40 * np.clip(pred_type_prob, 0.0, 1.0))
+        conf = np.clip(conf, 0.50, 0.90)
+        conf = self.conf_levels[np.abs(conf.reshape(-1, 1) - self.conf_levels.reshape(1, -1)).argmin(axis=1)]
+
+        return {
+            self.cols["serving_type"]: pred_type,
+            self.cols["min"]: np.round(min_pred, 0).astype(int),
+            self.cols["g"]: np.round(g_pred, 0).astype(int),
+            self.cols["max"]: np.round(max_pred, 0).astype(int),
+            self.cols["conf"]: conf.astype(float),
+        }
+
+    def predict_rows(self, rows: List[Mapping[str, Any]]) -> Dict[str, np.ndarray]:
+        return self.predict_texts(build_text_all(rows, self.text_cols))
+
+
+def load_scorer(path: str) -> Scorer:
+    return Scorer(path)
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Score a CSV with an exported serving bundle (NumPy/SciPy only).")
+    p.add_argument("--bundle", required=True, help="Path to the .npz written by `serving_model.py export`.")
+    p.add_argument("--in_csv", required=True, help="Input CSV.")
+    p.add_argument("--out_csv", required=True, help="Output CSV (input columns + predicted serving columns).")
+    p.add_argument("--overwrite", action="store_true", help="Overwrite existing values in target columns.")
+    return p
+
+
+def main() -> None:
+    args = _build_arg_parser().parse_args()
+    scorer = load_scorer(args.bundle)
+
+    with open(args.in_csv, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        fieldnames = list(reader.fieldnames or [])
+        # NA strings are missing values, as in pandas (and written back empty, as to_csv does)
+        rows = [{k: (None if v is None or v in NA_VALUES else v) for k, v in r.items()} for r in reader]
+
+    # Like apply: only rows with at least one missing target are filled (unless overwrite)
+    targets = [scorer.cols[k] for k in ("serving_type", "g", "min", "max", "conf")]
+    fill = [i for i, r in enumerate(rows) if args.overwrite or any(r.get(c) is None for c in targets)]
+    preds = scorer.predict_rows([rows[i] for i in fill])
+    out_cols = fieldnames + [c for c in preds if c not in fieldnames]
+    with open(args.out_csv, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=out_cols)
+        writer.writeheader()
+        filled = dict(zip(fill, range(len(fill))))
+        for i, r in enumerate(rows):
+            r = {k: ("" if v is None else v) for k, v in r.items()}
+            j = filled.get(i)
+            if j is not None:
+                for c, values in preds.items():
+                    r[c] = values[j]
+            writer.writerow(r)
+    print(f"✅ Scored {len(fill)} of {len(rows)} rows; wrote: {args.out_csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Local long-lived prediction server for the serving size/serving type models.
+
+What it does
+- Loads the ModelBundle from --model_dir once (see serving_model.load_models) and
+  keeps it in memory, so lookups skip the sklearn import + joblib load cost.
+- Hot-reloads the bundle when <model_dir>/metadata.json changes (train writes it last).
+- Tracks per-batch latency and reports p50/p99.
+
+Endpoints (JSON over HTTP, bound to localhost by default)
+  POST /predict   {"rows": [{"canonical_name": "...", "primary_category": "..."}, ...]}
+                  -> {"predictions": [{"serving_type": ..., "serving_size_min_g": ...,
+                                       "serving_size_g": ..., "serving_size_max_g": ...,
+                                       "serving_size_confidence": ...}, ...],
+                      "latency_ms": ...}
+  GET  /health    -> {"ok": true, "model_dir": ..., "loaded_at": ...}
+  GET  /stats     -> batch count, rows served, p50/p99 batch latency (ms)
+
+Usage
+  python serving_server.py --model_dir <dir>
+  python serving_server.py --model_dir <dir> --host 127.0.0.1 --port 8765
+
+Example
+  curl -s localhost:8765/predict -d '{"rows": [{"canonical_name": "Masala dosa", "primary_category": "Breakfast"}]}'
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import serving_model as sm
+
+# Response keys use the app-side column names (see migrate_csv.HEADER_MAPPING).
+RESPONSE_KEYS = {
+    sm.COL_SERVING_TYPE: "serving_type",
+    sm.COL_MIN: "serving_size_min_g",
+    sm.COL_G: "serving_size_g",
+    sm.COL_MAX: "serving_size_max_g",
+    sm.COL_CONF: "serving_size_confidence",
+}
+
+LATENCY_WINDOW = 1000  # batches kept for p50/p99
+
+
+class ModelCache:
+    """
+    Holds the loaded ModelBundle and swaps it when metadata.json changes on disk.
+    """
+
+    def __init__(self, model_dir: str) -> None:
+        self.model_dir = model_dir
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self.bundle: Optional[sm.ModelBundle] = None
+        self.loaded_at = 0.0
+        self.reload_if_changed()
+
+    def _meta_mtime(self) -> float:
+        return os.stat(os.path.join(self.model_dir, "metadata.json")).st_mtime
+
+    def reload_if_changed(self) -> sm.ModelBundle:
+        try:
+            mtime = self._meta_mtime()
+        except OSError:
+            # metadata.json briefly missing (e.g. model_dir being replaced); keep the old bundle
+            if self.bundle is None:
+                raise
+            return self.bundle
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    try:
+                        bundle = sm.load_models(self.model_dir)
+                    except (OSError, ValueError) as e:
+                        # e.g. train still writing; keep serving the old bundle and retry next batch
+                        if self.bundle is None:
+                            raise
+                        print(f"[serve] reload failed, keeping previous models: {e}")
+                        return self.bundle
+                    self.bundle = bundle
+                    self._mtime = mtime
+                    self.loaded_at = time.time()
+                    print(f"[serve] loaded models from {self.model_dir}")
+        return self.bundle
+
+
+class LatencyStats:
+    def __init__(self, window: int = LATENCY_WINDOW) -> None:
+        self._lock = threading.Lock()
+        self._ms: Deque[float] = deque(maxlen=window)
+        self.batches = 0
+        self.rows = 0
+
+    def record(self, ms: float, rows: int) -> None:
+        with self._lock:
+            self._ms.append(ms)
+            self.batches += 1
+            self.rows += rows
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            ms = np.array(self._ms, dtype=float)
+            out: Dict[str, Any] = {"batches": self.batches, "rows": self.rows}
+        if len(ms):
+            out["p50_ms"] = round(float(np.percentile(ms, 50)), 3)
+            out["p99_ms"] = round(float(np.percentile(ms, 99)), 3)
+        return out
+
+
+def predict_rows(bundle: sm.ModelBundle, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    if not rows:
+        return []
+    preds = sm.predict_frame(bundle, pd.DataFrame(rows))
+    out: List[Dict[str, Any]] = [{} for _ in range(len(rows))]
+    for col, key in RESPONSE_KEYS.items():
+        for i, v in enumerate(preds[col].tolist()):
+            out[i][key] = v
+    return out
+
+
+def _make_handler(models: ModelCache, stats: LatencyStats):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload: Dict[str, Any]) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:
+            if self.path == "/health":
+                self._send(200, {"ok": True, "model_dir": models.model_dir, "loaded_at": models.loaded_at})
+            elif self.path == "/stats":
+                self._send(200, stats.snapshot())
+            else:
+                self._send(404, {"error": f"unknown path {self.path}"})
+
+        def do_POST(self) -> None:
+            if self.path != "/predict":
+                self._send(404, {"error": f"unknown path {self.path}"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                rows = payload.get("rows") if isinstance(payload, dict) else None
+                if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+                    raise ValueError('expected a JSON object with a "rows" list of objects')
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+                return
+
+            t0 = time.perf_counter()
+            try:
+                predictions = predict_rows(models.reload_if_changed(), rows)
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+                return
+            except Exception as e:  # noqa: BLE001 - answer the client instead of dropping the connection
+                print(f"[serve] predict failed: {e!r}")
+                self._send(500, {"error": f"internal error: {e}"})
+                return
+            ms = 1000.0 * (time.perf_counter() - t0)
+            stats.record(ms, len(rows))
+            self._send(200, {"predictions": predictions, "latency_ms": round(ms, 3)})
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - BaseHTTPRequestHandler signature
+            pass
+
+    return Handler
+
+
+def serve(model_dir: str, host: str = "127.0.0.1", port: int = 8765) -> None:
+    models = ModelCache(model_dir)
+    stats = LatencyStats()
+    server = ThreadingHTTPServer((host, port), _make_handler(models, stats))
+    print(f"✅ Serving predictions on http://{host}:{port} (model_dir={model_dir})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"[serve] {stats.snapshot()}")
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Serve serving size/type predictions over local HTTP.")
+    p.add_argument("--model_dir", required=True, help="Directory containing trained models + metadata.")
+    p.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: localhost only).")
+    p.add_argument("--port", type=int, default=8765, help="Port to listen on.")
+    return p
+
+
+def main() -> None:
+    args = _build_arg_parser().parse_args()
+    serve(args.model_dir, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
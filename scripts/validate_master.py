@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Schema-shift detection and repair for GI/GL master CSVs (pandas).
+
+What it does
+- Loads each master CSV into one string DataFrame (headers mapped to the app schema through
+  migrate_csv.HEADER_MAPPING) and checks all rows at once:
+    * column_count    records with more or fewer fields than the header
+    * type            non-numeric values in numeric columns, gl_category outside Low/Medium/High
+    * range           gi outside [0, 110], confidences outside [0, 1], negative sizes/GL/carbs
+    * gl_consistency  |gl_median - gi * available_carbs_g / 100| > 0.1 + 2% of the expected GL
+    * order           serving_size_min_g <= serving_size_g <= serving_size_max_g,
+                      gl_min <= gl_median <= gl_max
+- Repairs the known shift patterns, checks the repaired frame again and can write it out:
+    * gl_category_shift  numeric gl_category with the category one column right, in
+                         confidence_score (the "Masala omelette" rows). Same repair as
+                         migrate_csv: shift left and recompute carbs = GL * 100 / GI.
+                         "Moderate" is normalized to "Medium".
+    * comma_split        records with k extra fields where rejoining k+1 neighbouring cells
+                         of one text column with "," makes every numeric column parse again
+- Writes a JSON report (per file: counts plus every flagged record) and runs files in
+  parallel processes.
+
+Usage
+  python validate_master.py                                  # every CSV under Database/
+  python validate_master.py <file.csv|dir> ... --report report.json --repair_dir repaired/ --workers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from food_db_asset import NUMERIC_COLUMNS
+from migrate_csv import HEADER_MAPPING, REPO_ROOT
+
+GL_CATEGORIES = ["Low", "Medium", "High"]
+CATEGORY_ALIASES = {"Moderate": "Medium"}
+# Columns that hold free text and may have been split by an unquoted comma
+TEXT_COLUMNS = ["canonical_name", "canonical_name_original", "primary_category", "gi_evidence", "notes",
+                "aliases_compiled", "search_text"]
+RANGES = {
+    "gi": (0.0, 110.0),
+    "serving_size_confidence": (0.0, 1.0),
+    "confidence_score": (0.0, 1.0),
+    "serving_size_g": (0.0, np.inf),
+    "serving_size_min_g": (0.0, np.inf),
+    "serving_size_max_g": (0.0, np.inf),
+    "gl_median": (0.0, np.inf),
+    "gl_min": (0.0, np.inf),
+    "gl_max": (0.0, np.inf),
+    "available_carbs_g": (0.0, np.inf),
+}
+ORDER_CHECKS = [
+    ("serving_size_min_g", "serving_size_g", "serving_size_max_g"),
+    ("gl_min", "gl_median", "gl_max"),
+]
+GL_ABS_TOL = 0.1
+GL_REL_TOL = 0.02
+_NUMBER_RE = r"[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?"
+MAX_LISTED = 200  # flagged records listed per check in the report (counts are always complete)
+
+_CANONICAL = {k.strip(): v for k, v in HEADER_MAPPING.items()}
+_CANONICAL["Glycemic Index (GI)"] = "gi"
+
+
+def canonical_name(header: str) -> str:
+    h = header.strip()
+    return _CANONICAL.get(h, h)
+
+
+def read_records(path: str) -> Tuple[List[str], List[List[str]]]:
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        records = [r for r in csv.reader(f) if r]
+    return (records[0], records[1:]) if records else ([], [])
+
+
+def build_frame(header: List[str], body: List[List[str]]) -> Tuple[pd.DataFrame, np.ndarray]:
+    """(cells as a str DataFrame with canonical column names, field count per record)."""
+    n_fields = np.fromiter((len(r) for r in body), dtype=np.int64, count=len(body))
+    width = max(len(header), int(n_fields.max()) if len(body) else 0)
+    names = _frame_names(header, width)
+    df = pd.DataFrame(body, columns=range(width), dtype=object).fillna("")
+    df.columns = names
+    # duplicate headers keep the last column, as csv.DictReader does
+    df = df.loc[:, ~df.columns.duplicated(keep="last")]
+    return df, n_fields
+
+
+def _frame_names(header: List[str], width: int) -> List[str]:
+    return [canonical_name(h) for h in header] + [f"_extra_{i}" for i in range(width - len(header))]
+
+
+def write_repaired(out: str, header: List[str], body: List[List[str]], df: pd.DataFrame) -> None:
+    """
+    Original header and cells with df's (repaired) values put back in place. Columns that
+    build_frame dropped as duplicates are written unchanged, so rows stay aligned with the header.
+    """
+    width = max(len(header), max((len(r) for r in body), default=0))
+    keep = np.flatnonzero(~pd.Index(_frame_names(header, width)).duplicated(keep="last"))
+    grid = pd.DataFrame(body, columns=range(width), dtype=object).fillna("")
+    grid.iloc[:, keep] = df.to_numpy()
+    with open(out, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(header)
+        w.writerows(grid.itertuples(index=False, name=None))
+
+
+def _numeric(df: pd.DataFrame) -> Dict[str, pd.Series]:
+    return {c: pd.to_numeric(df[c].str.strip(), errors="coerce")
+            for c in NUMERIC_COLUMNS if c in df.columns}
+
+
+def _listed(mask: np.ndarray, df: pd.DataFrame, **cols: Any) -> Dict[str, Any]:
+    idx = np.flatnonzero(mask)
+    out = []
+    for i in idx[:MAX_LISTED]:
+        item = {"record": int(i) + 1}
+        if "food_id" in df.columns:
+            item["food_id"] = df["food_id"].iat[i]
+        for k, v in cols.items():
+            val = v.iat[i] if isinstance(v, pd.Series) else v[i]
+            item[k] = None if isinstance(val, float) and np.isnan(val) else (val.item() if hasattr(val, "item") else val)
+        out.append(item)
+    return {"count": int(len(idx)), "records": out}
+
+
+def check_frame(df: pd.DataFrame, n_fields: np.ndarray, n_header: int) -> Dict[str, Any]:
+    """All checks as vectorized passes over the frame."""
+    issues: Dict[str, Any] = {}
+    issues["column_count"] = _listed(n_fields != n_header, df, fields=n_fields)
+
+    num = _numeric(df)
+    type_issues: Dict[str, Any] = {}
+    for c, s in num.items():
+        bad = (s.isna() & (df[c].str.strip() != "")).to_numpy()
+        if bad.any():
+            type_issues[c] = _listed(bad, df, value=df[c])
+    if "gl_category" in df.columns:
+        cat = df["gl_category"].str.strip()
+        bad = (~cat.isin(GL_CATEGORIES) & (cat != "")).to_numpy()
+        if bad.any():
+            type_issues["gl_category"] = _listed(bad, df, value=df["gl_category"])
+    issues["type"] = type_issues
+
+    range_issues: Dict[str, Any] = {}
+    for c, (lo, hi) in RANGES.items():
+        if c in num:
+            s = num[c]
+            bad = ((s < lo) | (s > hi)).to_numpy()
+            if bad.any():
+                range_issues[c] = _listed(bad, df, value=s)
+    issues["range"] = range_issues
+
+    if {"gi", "gl_median", "available_carbs_g"} <= num.keys():
+        expected = num["gi"] * num["available_carbs_g"] / 100.0
+        diff = (num["gl_median"] - expected).abs()
+        bad = (diff > GL_ABS_TOL + GL_REL_TOL * expected.abs()).to_numpy()
+        issues["gl_consistency"] = _listed(bad, df, gl_median=num["gl_median"], expected=expected.round(3))
+
+    order_issues: Dict[str, Any] = {}
+    for lo_c, mid_c, hi_c in ORDER_CHECKS:
+        if {lo_c, mid_c, hi_c} <= num.keys():
+            lo, mid, hi = num[lo_c], num[mid_c], num[hi_c]
+            bad = ((lo > mid) | (mid > hi)).to_numpy()
+            if bad.any():
+                order_issues[f"{lo_c}<={mid_c}<={hi_c}"] = _listed(bad, df, min=lo, value=mid, max=hi)
+    issues["order"] = order_issues
+    return issues
+
+
+def _count(issues: Dict[str, Any]) -> Dict[str, int]:
+    out = {}
+    for k, v in issues.items():
+        out[k] = v["count"] if "count" in v else sum(x["count"] for x in v.values())
+    return out
+
+
+def repair_gl_category_shift(df: pd.DataFrame) -> np.ndarray:
+    """Vectorized migrate_csv shift repair; returns the mask of repaired records."""
+    needed = {"gl_category", "confidence_score", "available_carbs_g", "gl_median", "gi"}
+    if not needed <= set(df.columns):
+        return np.zeros(len(df), dtype=bool)
+    cat = df["gl_category"].str.strip()
+    conf = df["confidence_score"].str.strip().replace(CATEGORY_ALIASES)
+    mask = cat.str.fullmatch(_NUMBER_RE) & conf.isin(GL_CATEGORIES)
+    if not mask.any():
+        return mask.to_numpy()
+    gl = pd.to_numeric(df.loc[mask, "gl_median"], errors="coerce")
+    gi = pd.to_numeric(df.loc[mask, "gi"], errors="coerce")
+    # carbs = GL * 100 / GI, 0 when GI <= 0, unchanged when either is not a number
+    carbs = df.loc[mask, "available_carbs_g"].copy()
+    pos, zero = gl.notna() & (gi > 0), gl.notna() & (gi <= 0)
+    carbs[pos] = (gl[pos] * 100.0 / gi[pos]).round(2).astype(str)
+    carbs[zero] = "0"
+    df.loc[mask, "gl_category"] = conf[mask]
+    df.loc[mask, "confidence_score"] = df.loc[mask, "available_carbs_g"]
+    df.loc[mask, "available_carbs_g"] = carbs
+    return mask.to_numpy()
+
+
+def repair_comma_split(records: List[List[str]], header: List[str]) -> Dict[int, List[str]]:
+    """Rejoin unquoted-comma splits in over-long records; {record index: repaired fields}."""
+    names = [canonical_name(h) for h in header]
+    numeric = [j for j, c in enumerate(names) if c in NUMERIC_COLUMNS]
+    text = [j for j, c in enumerate(names) if c in TEXT_COLUMNS]
+    fixed: Dict[int, List[str]] = {}
+    for i, row in enumerate(records):
+        k = len(row) - len(header)
+        if k <= 0:
+            continue
+        for p in text:
+            cand = row[:p] + [",".join(row[p:p + k + 1])] + row[p + k + 1:]
+            ok = True
+            for j in numeric:
+                v = cand[j].strip()
+                if v:
+                    try:
+                        float(v)
+                    except ValueError:
+                        ok = False
+                        break
+            if ok:
+                fixed[i] = cand
+                break
+    return fixed
+
+
+def validate_file(path: str, repair_dir: Optional[str] = None) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    header, body = read_records(path)
+    df, n_fields = build_frame(header, body)
+    report: Dict[str, Any] = {"path": path, "records": int(len(df)), "columns": len(header)}
+    known = {"food_id", "gi", "gl_median", "available_carbs_g"} & set(df.columns)
+    if len(known) < 2:
+        report["skipped"] = "not a GI/GL master schema"
+        report["seconds"] = round(time.perf_counter() - t0, 4)
+        return report
+
+    issues = check_frame(df, n_fields, len(header))
+    report["issues"] = issues
+    report["counts"] = _count(issues)
+
+    # Repairs: comma splits first (they realign the columns), then the gl_category shift
+    repaired: Dict[str, Any] = {}
+    if issues["column_count"]["count"]:
+        fixed = repair_comma_split(body, header)
+        if fixed:
+            for i, cand in fixed.items():
+                body[i] = cand
+            df, n_fields = build_frame(header, body)
+        repaired["comma_split"] = {"count": len(fixed), "records": sorted(i + 1 for i in fixed)[:MAX_LISTED]}
+    shift = repair_gl_category_shift(df)
+    repaired["gl_category_shift"] = _listed(shift, df, gl_category=df["gl_category"]) if shift.any() else {"count": 0, "records": []}
+    report["repaired"] = repaired
+
+    if any(v["count"] for v in repaired.values()):
+        report["counts_after_repair"] = _count(check_frame(df, n_fields, len(header)))
+        if repair_dir:
+            os.makedirs(repair_dir, exist_ok=True)
+            out = os.path.join(repair_dir, os.path.basename(path))
+            # original header names and cells; only repaired cells change
+            write_repaired(out, header, body, df)
+            report["repaired_path"] = out
+    report["seconds"] = round(time.perf_counter() - t0, 4)
+    return report
+
+
+def _expand(paths: List[str]) -> List[str]:
+    out: List[str] = []
+    for p in paths:
+        if os.path.isdir(p):
+            out.extend(sorted(glob.glob(os.path.join(p, "*.csv"))))
+        else:
+            out.append(p)
+    return out
+
+
+def validate_all(paths: List[str], repair_dir: Optional[str] = None, workers: int = 0) -> List[Dict[str, Any]]:
+    files = _expand(paths)
+    workers = workers or min(len(files), os.cpu_count() or 1)
+    if workers <= 1:
+        return [validate_file(p, repair_dir) for p in files]
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(validate_file, files, [repair_dir] * len(files)))
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Validate (and repair) GI/GL master CSVs.")
+    p.add_argument("paths", nargs="*", default=[os.path.join(REPO_ROOT, "Database")],
+                   help="CSV files or directories (default: Database/).")
+    p.add_argument("--report", default=None, help="Write the JSON report here.")
+    p.add_argument("--repair_dir", default=None, help="Write repaired copies of files with repairs here.")
+    p.add_argument("--workers", type=int, default=0, help="Parallel processes (0 = one per file, up to CPU count).")
+    return p
+
+
+def main() -> None:
+    args = _build_arg_parser().parse_args()
+    t0 = time.perf_counter()
+    reports = validate_all(args.paths, args.repair_dir, args.workers)
+    seconds = time.perf_counter() - t0
+
+    checked = [r for r in reports if "skipped" not in r]
+    for r in checked:
+        counts = {k: v for k, v in r["counts"].items() if v}
+        fixed = {k: v["count"] for k, v in r["repaired"].items() if v["count"]}
+        if counts or fixed:
+            print(f"{os.path.basename(r['path'])}: {r['records']} records  issues {counts}  repaired {fixed}")
+    print(f"Checked {len(checked)} master CSVs ({len(reports) - len(checked)} other CSVs skipped) in {seconds:.2f}s")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"files": reports, "seconds": round(seconds, 3)}, f, indent=2, ensure_ascii=False)
+        print(f"Wrote report: {args.report}")
+
+
+if __name__ == "__main__":
+    main()